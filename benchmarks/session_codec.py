@@ -0,0 +1,85 @@
+"""
+Benchmark mã hoá session: JSON (như save_session cũ) so với nhị phân gọn.
+
+Chạy từ thư mục gốc:
+    python benchmarks/session_codec.py [--repeat 2000]
+"""
+import argparse
+import json
+import random
+import sys
+import timeit
+from pathlib import Path
+
+# Đảm bảo thư mục gốc trong PYTHONPATH
+root_dir = Path(__file__).parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.insert(0, str(root_dir))
+
+from src.bot.wheel import create_wheel_session, spin_wheel
+from src.db.sqlite_store import split_session_dict
+from src.models.session_codec import decode_session, encode_session
+
+
+def build_session(players: int, spins: int, seed: int = 1) -> dict:
+    """Session 1-90 với `players` người có vé, `spins` lượt quay, vài người đợi số/thắng."""
+    random.seed(seed)
+    session = create_wheel_session(1, 90)
+    session.game_name = "Ván tối thứ bảy"
+    session.owner_id = 5_000_000_000
+    session.started = True
+    for i in range(players):
+        uid = 6_000_000_000 + i
+        name = f"Người chơi số {i}"
+        session.add_participant(uid, name)
+        session.tickets[f"ve{i}"] = uid
+        session.user_tickets[uid] = f"ve{i}"
+        if i % 3 == 0:
+            session.waiting_numbers.setdefault(random.randint(1, 90), []).append((uid, name))
+    for _ in range(spins):
+        spin_wheel(session)
+    for i in range(min(2, players)):
+        session.winners.append({
+            "user_id": 6_000_000_000 + i,
+            "name": f"Người chơi số {i}",
+            "numbers": sorted(random.sample(range(1, 91), 5)),
+            "time": session.history[-1]["time"] if session.history else "",
+        })
+    return session.to_dict()
+
+
+def measure(label: str, data: dict, repeat: int) -> None:
+    as_json = json.dumps(data, ensure_ascii=False)
+    as_bytes = encode_session(data)
+
+    json_enc = timeit.timeit(lambda: json.dumps(data, ensure_ascii=False), number=repeat) / repeat
+    json_dec = timeit.timeit(lambda: json.loads(as_json), number=repeat) / repeat
+    bin_enc = timeit.timeit(lambda: encode_session(data), number=repeat) / repeat
+    bin_dec = timeit.timeit(lambda: decode_session(as_bytes), number=repeat) / repeat
+
+    json_size = len(as_json.encode("utf-8"))
+    print(
+        f"{label:<22} {json_size:>8} {len(as_bytes):>8} {json_size / len(as_bytes):>6.1f}x"
+        f" {json_enc * 1e6:>9.1f} {bin_enc * 1e6:>9.1f} {json_dec * 1e6:>9.1f} {bin_dec * 1e6:>9.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(
+        f"{'session':<22} {'json B':>8} {'bin B':>8} {'ratio':>7}"
+        f" {'json enc':>9} {'bin enc':>9} {'json dec':>9} {'bin dec':>9}  (µs)"
+    )
+    for players, spins in ((0, 0), (4, 10), (16, 45), (16, 90), (50, 90)):
+        data = build_session(players, spins)
+        measure(f"{players} người/{spins} lượt", data, args.repeat)
+        # Phần meta là phần thực sự ghi vào sessions.session_json mỗi lượt /quay
+        meta = split_session_dict(data)["meta"]
+        measure("  meta", meta, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
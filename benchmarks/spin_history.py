@@ -0,0 +1,95 @@
+"""
+Benchmark lịch sử quay: list dict + pop(0) (cách cũ) so với SpinHistory (ring buffer).
+
+Đo bộ nhớ của phần lịch sử mỗi session (tracemalloc) và số lượt append/giây,
+kể cả khi đã vượt HISTORY_CAPACITY (lúc cách cũ phải pop(0) mỗi lượt).
+
+Chạy từ thư mục gốc:
+    python benchmarks/spin_history.py [--repeat 20000]
+"""
+import argparse
+import random
+import sys
+import time
+import timeit
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+# Đảm bảo thư mục gốc trong PYTHONPATH
+root_dir = Path(__file__).parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.insert(0, str(root_dir))
+
+from src.bot.wheel import create_wheel_session, spin_wheel
+from src.models.spin_history import HISTORY_CAPACITY, SpinHistory
+
+
+def legacy_append(history: list, number: int) -> None:
+    """Đúng như spin_wheel trước đây: dict + ISO string, cắt bằng pop(0)."""
+    history.append({"number": number, "time": datetime.now().isoformat(timespec="seconds")})
+    if len(history) > HISTORY_CAPACITY:
+        history.pop(0)
+
+
+def ring_append(history: SpinHistory, number: int) -> None:
+    history.append(number, int(time.time()))
+
+
+def measure_memory(factory, append, spins: int) -> int:
+    """Số byte còn giữ sau khi tạo một lịch sử `spins` lượt."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    history = factory()
+    for _ in range(spins):
+        append(history, random.randint(1, 90))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del history
+    return size
+
+
+def measure_append(factory, append, prefill: int, repeat: int) -> float:
+    """Số lượt append/giây khi lịch sử đã có `prefill` lượt."""
+    history = factory()
+    for _ in range(prefill):
+        append(history, 1)
+    seconds = timeit.timeit(lambda: append(history, 7), number=repeat)
+    return repeat / seconds
+
+
+def measure_spin_wheel(repeat: int) -> float:
+    """spin_wheel đầy đủ (không loại số) trên session đã có đủ HISTORY_CAPACITY lượt."""
+    session = create_wheel_session(1, 90, remove_after_spin=False)
+    for _ in range(HISTORY_CAPACITY):
+        spin_wheel(session)
+    seconds = timeit.timeit(lambda: spin_wheel(session), number=repeat)
+    return repeat / seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+    random.seed(1)
+
+    print(f"{'lượt':>6} {'list B':>10} {'ring B':>10} {'ratio':>7}")
+    for spins in (10, 90, 1000, 5000):
+        old = measure_memory(list, legacy_append, spins)
+        new = measure_memory(SpinHistory, ring_append, spins)
+        print(f"{spins:>6} {old:>10} {new:>10} {old / max(new, 1):>6.1f}x")
+
+    print()
+    print(f"{'đã có':>6} {'list /s':>12} {'ring /s':>12}")
+    for prefill in (0, HISTORY_CAPACITY):
+        old = measure_append(list, legacy_append, prefill, args.repeat)
+        new = measure_append(SpinHistory, ring_append, prefill, args.repeat)
+        print(f"{prefill:>6} {old:>12,.0f} {new:>12,.0f}")
+
+    print()
+    print(f"spin_wheel (lịch sử đầy): {measure_spin_wheel(args.repeat):,.0f} lượt/s")
+
+
+if __name__ == "__main__":
+    main()
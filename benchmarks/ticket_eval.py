@@ -0,0 +1,55 @@
+"""
+Benchmark đánh giá hàng loạt vé: vòng lặp Python so với NumPy (nếu đã cài).
+
+Mỗi kích thước tạo N vé (mã vé chọn ngẫu nhiên trong 16 vé in sẵn), quay
+ngẫu nhiên `--drawn` số rồi đo thời gian đánh giá toàn bộ vé.
+
+Chạy từ thư mục gốc:
+    python benchmarks/ticket_eval.py [--drawn 40] [--repeat 20]
+"""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+# Đảm bảo thư mục gốc trong PYTHONPATH
+root_dir = Path(__file__).parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.insert(0, str(root_dir))
+
+from src.models.ticket_eval import evaluate_tickets, has_numpy
+from src.models.ticket_layouts import TICKET_ROWS
+
+
+def measure(user_tickets: dict, drawn: list[int], use_numpy: bool, repeat: int) -> float:
+    """Thời gian trung bình (ms) cho một lần đánh giá toàn bộ vé."""
+    seconds = timeit.timeit(lambda: evaluate_tickets(user_tickets, drawn, use_numpy), number=repeat)
+    return seconds / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--drawn", type=int, default=40, help="Số lượng số đã quay")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    random.seed(1)
+
+    codes = list(TICKET_ROWS)
+    drawn = random.sample(range(1, 91), args.drawn)
+    if not has_numpy():
+        print("NumPy chưa được cài đặt: chỉ đo bản Python thuần")
+
+    print(f"{'vé':>6} {'python ms':>10} {'numpy ms':>10} {'ratio':>7}")
+    for size in (16, 100, 1000, 10000):
+        user_tickets = {user_id: random.choice(codes) for user_id in range(size)}
+        py = measure(user_tickets, drawn, False, args.repeat)
+        if has_numpy():
+            np_ms = measure(user_tickets, drawn, True, args.repeat)
+            print(f"{size:>6} {py:>10.3f} {np_ms:>10.3f} {py / np_ms:>6.1f}x")
+        else:
+            print(f"{size:>6} {py:>10.3f} {'-':>10} {'-':>7}")
+
+
+if __name__ == "__main__":
+    main()
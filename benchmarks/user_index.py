@@ -0,0 +1,67 @@
+"""
+Benchmark tra cứu game của một user (inline `@bot kinh ...`): quét mọi session
+so với chỉ mục user -> chat của SessionManager.
+
+Tạo `--groups` nhóm có game đang chạy (mỗi nhóm `--players` người, chọn ngẫu
+nhiên trong `--users` user), rồi đo thời gian trung bình một lần tra cứu.
+
+Chạy từ thư mục gốc:
+    python benchmarks/user_index.py [--groups 1000] [--players 16] [--users 5000]
+"""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+# Đảm bảo thư mục gốc trong PYTHONPATH
+root_dir = Path(__file__).parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.insert(0, str(root_dir))
+
+from src.bot.session_manager import SessionManager, scan_session_members
+from src.db.backends import MemoryBackend
+
+
+def scan_lookup(manager: SessionManager, user_id: int) -> list:
+    """Cách làm cũ: duyệt mọi session trong cache và danh sách người chơi."""
+    return [
+        (chat_id, session) for chat_id, session in manager._sessions.items()
+        if user_id in scan_session_members(session)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--groups", type=int, default=1000)
+    parser.add_argument("--players", type=int, default=16)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+    random.seed(1)
+
+    manager = SessionManager(backend=MemoryBackend(), cache_size=0, cache_ttl=0)
+    for chat_id in range(args.groups):
+        session = manager.create_session(chat_id, 1, 90)
+        members = random.sample(range(args.users), args.players)
+        session.owner_id = members[0]
+        for user_id in members:
+            session.add_participant(user_id, f"U{user_id}")
+        session.started = True
+
+    problems = manager.check_user_index()
+    print(f"Tự kiểm tra chỉ mục: {'OK' if not problems else problems[:3]}")
+
+    users = [random.randrange(args.users) for _ in range(args.lookups)]
+    for user_id in users[:50]:
+        assert scan_lookup(manager, user_id) == manager.get_sessions_containing_user(user_id)
+
+    scan = timeit.timeit(lambda: [scan_lookup(manager, u) for u in users], number=1) / args.lookups
+    index = timeit.timeit(lambda: [manager.get_sessions_containing_user(u) for u in users], number=1) / args.lookups
+    print(f"{args.groups} nhóm x {args.players} người, {args.lookups} lượt tra cứu")
+    print(f"  quét:     {scan * 1e6:10.1f} µs/lượt")
+    print(f"  chỉ mục:  {index * 1e6:10.1f} µs/lượt ({scan / index:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark vòng quay có trọng số: bảng alias so với quét trọng số cộng dồn.
+
+Mỗi kích thước tạo N ô với trọng số ngẫu nhiên (1-100) rồi đo:
+  - choice: rút có hoàn lại (remove_after_spin = False)
+  - draw:   rút không hoàn lại `--draws` ô (remove_after_spin = True); bản
+            quét tuyến tính phải bỏ ô đã rút khỏi danh sách mỗi lượt
+
+Chạy từ thư mục gốc:
+    python benchmarks/weighted_wheel.py [--draws 1000] [--repeat 5]
+"""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+# Đảm bảo thư mục gốc trong PYTHONPATH
+root_dir = Path(__file__).parent.parent
+if str(root_dir) not in sys.path:
+    sys.path.insert(0, str(root_dir))
+
+from src.models.weighted_pool import WeightedDrawPool
+
+
+def scan_pick(weights: list[float], total: float) -> int:
+    """Cách làm thông thường: quét trọng số cộng dồn tới khi vượt ngưỡng ngẫu nhiên."""
+    target = random.random() * total
+    acc = 0.0
+    for i, w in enumerate(weights):
+        acc += w
+        if acc > target:
+            return i
+    return len(weights) - 1
+
+
+def scan_draw(weights: list[float], draws: int) -> None:
+    weights = list(weights)
+    total = sum(weights)
+    for _ in range(min(draws, len(weights))):
+        i = scan_pick(weights, total)
+        total -= weights.pop(i)
+
+
+def alias_draw(weights: list[float], draws: int) -> None:
+    pool = WeightedDrawPool(1, len(weights), weights)
+    for _ in range(min(draws, len(weights))):
+        pool.draw()
+
+
+def measure(fn, repeat: int) -> float:
+    """Thời gian trung bình (ms) của một lần gọi `fn`."""
+    return timeit.timeit(fn, number=repeat) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--draws", type=int, default=1000, help="Số lượt rút mỗi lần đo")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    random.seed(1)
+
+    print(f"{'ô':>7} {'':>6} {'scan ms':>10} {'alias ms':>10} {'ratio':>7}")
+    for size in (10, 100, 1000, 10000):
+        weights = [float(random.randint(1, 100)) for _ in range(size)]
+        total = sum(weights)
+        pool = WeightedDrawPool(1, size, weights)
+        pool.choice()  # dựng bảng alias trước khi đo
+
+        scan = measure(lambda: [scan_pick(weights, total) for _ in range(args.draws)], args.repeat)
+        alias = measure(lambda: [pool.choice() for _ in range(args.draws)], args.repeat)
+        print(f"{size:>7} {'choice':>6} {scan:>10.3f} {alias:>10.3f} {scan / alias:>6.1f}x")
+
+        scan = measure(lambda: scan_draw(weights, args.draws), args.repeat)
+        alias = measure(lambda: alias_draw(weights, args.draws), args.repeat)
+        print(f"{size:>7} {'draw':>6} {scan:>10.3f} {alias:>10.3f} {scan / alias:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
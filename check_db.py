@@ -1,20 +1,42 @@
 import sqlite3
 import os
+import sys
 
-db_path = "src/loto.db"
+db_path = sys.argv[1] if len(sys.argv) > 1 else "src/loto.db"
 if not os.path.exists(db_path):
     print(f"File {db_path} not found.")
 else:
     conn = sqlite3.connect(db_path)
     cur = conn.cursor()
-    
-    tables = ["sessions", "stats", "last_results"]
+
+    try:
+        cur.execute("SELECT MAX(version), MIN(backfill_done) FROM schema_version")
+        version, backfill_done = cur.fetchone()
+        note = "" if backfill_done else " (backfill pending)"
+        print(f"Schema version: {version or 0}{note}")
+    except sqlite3.OperationalError:
+        print("Schema version: 0 (no schema_version table, run init_db or python -m src.db.migrations)")
+
+    # Dung lượng theo bảng (gồm cả index của bảng) từ virtual table dbstat
+    sizes = {}
+    try:
+        cur.execute(
+            "SELECT m.tbl_name, SUM(d.pgsize) FROM dbstat d "
+            "JOIN sqlite_master m ON m.name = d.name GROUP BY m.tbl_name"
+        )
+        sizes = dict(cur.fetchall())
+    except sqlite3.OperationalError:
+        pass  # SQLite build không có dbstat
+
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+    tables = [row[0] for row in cur.fetchall()]
     for table in tables:
         try:
             cur.execute(f"SELECT count(*) FROM {table}")
             count = cur.fetchone()[0]
-            print(f"Table '{table}': {count} rows")
+            size = f"{sizes[table] / 1024:.1f} KiB" if table in sizes else "n/a"
+            print(f"Table '{table}': {count} rows, {size}")
         except sqlite3.OperationalError as e:
             print(f"Table '{table}' error: {e}")
-            
+
     conn.close()
@@ -14,6 +14,15 @@ MAX_NUMBERS = 90  # Giới hạn số lượng số trong danh sách
 DEFAULT_REMOVE_AFTER_SPIN = True  # Mặc định có loại bỏ số sau khi quay
 WEB_APP_URL = os.getenv('WEB_APP_URL', 'https://your-public-url.com')  # URL cho Mini App
 
+# Storage: số file SQLite để chia dữ liệu theo chat_id (1 = một file src/loto.db).
+# Đổi số shard khi đã có dữ liệu sẽ không tự chuyển dữ liệu cũ sang shard mới.
+DB_SHARDS = int(os.getenv('DB_SHARDS', '1'))
+
+# Cache session trong RAM: số nhóm tối đa và số giây rảnh trước khi bỏ khỏi RAM
+# (0 = không giới hạn). Để trống = dùng mặc định trong src/bot/constants.py
+SESSION_CACHE_MAX_SIZE = os.getenv('SESSION_CACHE_MAX_SIZE')
+SESSION_CACHE_TTL_SECONDS = os.getenv('SESSION_CACHE_TTL_SECONDS')
+
 # Messages
 WELCOME_MESSAGE = """
 🎰 *Chào mừng đến với Loto Bot\!*  
@@ -63,7 +72,10 @@ HELP_MESSAGE = """
    • `/moi <tên_game>` \- tạo game mới với dãy mặc định `1 -> {MAX_NUMBERS}`  
      Ví dụ: `/moi Ván 1`  
    • Hoặc: `/pham_vi 1 90` \- tự chọn khoảng số cho game  
+   • `/xo_so <x> <y>` \- bốc thăm/xổ số trên khoảng lớn (tới 10\.000\.000 số), vd: `/xo_so 1 100000`  
+   • `/vong_quay <nhãn>:<trọng số>, ...` \- vòng quay giải thưởng có trọng số, vd: `/vong_quay Jackpot:1, Voucher:5, Chúc may mắn:30`  
    • `/bat_dau` \- host bấm để *bắt đầu* game (sau đó mới được `/quay` và `/kinh`)
+   • `/bat_dau tron` \- bắt đầu và trộn sẵn thứ tự số từ một seed (phát lại được khi cần đối chiếu)
 
 2️⃣ *Người chơi lấy vé và tham gia game*
    • `/lay_ve <mã_vé>` \- lấy vé để tham gia \\(bắt buộc trước khi chơi\\)  
@@ -72,10 +84,13 @@ HELP_MESSAGE = """
 
 3️⃣ *Quay số & kiểm tra vé*
    • `/quay` \- quay số (chỉ khi game đã `/bat_dau`)  
+   • `/quay N` \- quay liên tiếp N số (tối đa 10) trong một tin nhắn  
+   • `/tu_dong N` \- tự động quay mỗi N giây (6\-300) tới khi hết số hoặc có người trúng; `/tu_dong tat` để dừng  
    • `/lich_su` \- xem toàn bộ lịch sử quay của game hiện tại  
    • `/trang_thai` \- xem trạng thái game: khoảng số, đã quay bao nhiêu lần, còn bao nhiêu số,...  
    • `/kinh <dãy_số>` \- kiểm tra vé, ví dụ:
      `/kinh 1 5 10 20 30` hoặc `/kinh 1,5,10,20,30`  
+   • `/kinh` \(không kèm số\) \- bot tự lấy hàng đã đủ số trên vé in sẵn của bạn; bot cũng nhắc ngay khi vé của bạn vừa đủ một hàng  
      → Nếu vé có *ít nhất 5 số* đã quay, không có số ngoài dãy, bot sẽ báo *trúng thưởng* kèm các số khớp
 
 4️⃣ *Kết thúc & xem lại kết quả*
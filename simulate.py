@@ -0,0 +1,232 @@
+"""
+Mô phỏng Monte Carlo các ván loto và đo thông lượng engine quay số.
+
+Mỗi ván: session 1-MAX_NUMBERS, `--players` người giữ các vé in sẵn khác nhau,
+quay bằng `spin_wheel` tới khi có vé đủ một hàng (cùng luật /kinh). Các ván
+được chia thành lô cố định, mỗi lô có seed riêng và chạy trên
+ProcessPoolExecutor, nên cùng `--seed` cho cùng kết quả với mọi `--workers`.
+
+Báo cáo:
+  - phân bố số lượt quay tới khi có người kinh đầu tiên
+  - số người thắng mỗi ván và dòng token theo BET_AMOUNT (như /ket_thuc)
+  - thông lượng: lượt quay/giây trên mỗi core và tổng
+
+Chạy từ thư mục gốc:
+    python simulate.py [--games 100000] [--players 16] [--workers 4] [--seed 1]
+"""
+# -*- coding: utf-8 -*-
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Fix encoding cho Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# Đảm bảo thư mục gốc trong PYTHONPATH
+root_dir = Path(__file__).parent
+if str(root_dir) not in sys.path:
+    sys.path.insert(0, str(root_dir))
+
+from src.bot.constants import BET_AMOUNT, MAX_NUMBERS, TICKET_CODES
+from src.bot.wheel import create_wheel_session, spin_wheel
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def play_game(players: int) -> tuple[int, list[str], list[str]]:
+    """Một ván: trả về (số lượt quay tới khi có người kinh, các mã vé chơi, các mã vé thắng)."""
+    session = create_wheel_session(1, MAX_NUMBERS)
+    codes = random.sample(TICKET_CODES, players)
+    session.tickets = {code: seat for seat, code in enumerate(codes)}
+    while not session.is_empty():
+        number = spin_wheel(session)
+        rows = session.completed_ticket_rows([number])
+        if rows:
+            return session.spin_count, codes, sorted({code for code, _ in rows})
+    return session.spin_count, codes, []
+
+
+def token_flow(players: int, winners: int, bet: float) -> float:
+    """Token mỗi người thắng nhận (cùng công thức zero-sum của /ket_thuc)."""
+    if not winners:
+        return 0.0
+    return players * bet / winners - bet
+
+
+def run_chunk(task: tuple[int, int, int, float]) -> dict:
+    """Chạy một lô ván với seed riêng (chạy trong process con)."""
+    seed, games, players, bet = task
+    random.seed(seed)
+    spins_hist: Counter = Counter()
+    winners_hist: Counter = Counter()
+    payout_hist: Counter = Counter()
+    code_net: Counter = Counter()
+    code_games: Counter = Counter()
+    total_spins = 0
+
+    started = time.process_time()
+    for _ in range(games):
+        spins, codes, winners = play_game(players)
+        total_spins += spins
+        spins_hist[spins] += 1
+        winners_hist[len(winners)] += 1
+        code_games.update(codes)
+        if not winners:
+            continue
+        payout = token_flow(players, len(winners), bet)
+        payout_hist[round(payout, 2)] += 1
+        for code in codes:
+            code_net[code] += payout if code in winners else -bet
+    return {
+        "games": games,
+        "spins": total_spins,
+        "cpu_seconds": time.process_time() - started,
+        "spins_hist": dict(spins_hist),
+        "winners_hist": dict(winners_hist),
+        "payout_hist": dict(payout_hist),
+        "code_net": dict(code_net),
+        "code_games": dict(code_games),
+    }
+
+
+def make_tasks(games: int, players: int, seed: int, chunk_size: int, bet: float) -> list[tuple[int, int, int, float]]:
+    """Chia `games` thành các lô cố định; lô i có seed riêng, không phụ thuộc số worker."""
+    return [
+        (seed * 1_000_003 + i, min(chunk_size, games - start), players, bet)
+        for i, start in enumerate(range(0, games, chunk_size))
+    ]
+
+
+def merge(results: list[dict]) -> dict:
+    total = {"games": 0, "spins": 0, "cpu_seconds": 0.0}
+    hists = {key: Counter() for key in ("spins_hist", "winners_hist", "payout_hist", "code_net", "code_games")}
+    for result in results:
+        for key in total:
+            total[key] += result[key]
+        for key, hist in hists.items():
+            hist.update(result[key])
+    total.update(hists)
+    return total
+
+
+def percentile(hist: Counter, q: float) -> int:
+    """Phân vị q (0-1) của một histogram {giá trị: số lần}."""
+    target = q * (sum(hist.values()) - 1)
+    seen = 0
+    for value in sorted(hist):
+        seen += hist[value]
+        if seen > target:
+            return value
+    return max(hist)
+
+
+def summarize(total: dict, players: int, bet: float, wall_seconds: float, workers: int) -> dict:
+    """Gom kết quả đã merge thành báo cáo (dict, in được dạng JSON)."""
+    games = total["games"]
+    spins_hist = total["spins_hist"]
+    cpu_seconds = total["cpu_seconds"]
+    return {
+        "games": games,
+        "players": players,
+        "bet": bet,
+        "spins_to_first_win": {
+            "mean": round(sum(v * c for v, c in spins_hist.items()) / games, 2),
+            "min": min(spins_hist),
+            "p10": percentile(spins_hist, 0.10),
+            "p50": percentile(spins_hist, 0.50),
+            "p90": percentile(spins_hist, 0.90),
+            "p99": percentile(spins_hist, 0.99),
+            "max": max(spins_hist),
+        },
+        "winners_per_game": {str(k): v for k, v in sorted(total["winners_hist"].items())},
+        "winner_payout": {f"{k:+.2f}": v for k, v in sorted(total["payout_hist"].items(), reverse=True)},
+        # Token ròng trung bình mỗi ván của từng mã vé (luật zero-sum: kỳ vọng ~0)
+        "net_token_per_game_by_code": {
+            code: round(total["code_net"].get(code, 0.0) / total["code_games"][code], 3)
+            for code in TICKET_CODES if total["code_games"].get(code)
+        },
+        "throughput": {
+            "spins": total["spins"],
+            "workers": workers,
+            "wall_seconds": round(wall_seconds, 3),
+            "spins_per_sec_per_core": round(total["spins"] / cpu_seconds) if cpu_seconds else None,
+            "spins_per_sec_total": round(total["spins"] / wall_seconds) if wall_seconds else None,
+        },
+    }
+
+
+def simulate(games: int, players: int, workers: int, seed: int = 1,
+             chunk_size: int = DEFAULT_CHUNK_SIZE, bet: float = BET_AMOUNT) -> dict:
+    """Chạy `games` ván trên `workers` process (1 = chạy ngay trong process hiện tại)."""
+    if not 1 <= players <= len(TICKET_CODES):
+        raise ValueError(f"Số người chơi phải từ 1 đến {len(TICKET_CODES)}")
+    if games < 1:
+        raise ValueError("Số ván phải >= 1")
+    tasks = make_tasks(games, players, seed, chunk_size, bet)
+    started = time.perf_counter()
+    if workers <= 1:
+        results = [run_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_chunk, tasks))
+    wall_seconds = time.perf_counter() - started
+    return summarize(merge(results), players, bet, wall_seconds, workers)
+
+
+def print_report(report: dict) -> None:
+    print("=" * 50)
+    print(f"LOTO SIMULATOR - {report['games']:,} ván, {report['players']} người, cược {report['bet']}")
+    print("=" * 50)
+
+    spins = report["spins_to_first_win"]
+    print("\n[SPINS] Số lượt quay tới khi có người kinh:")
+    print("  " + "  ".join(f"{key}={value}" for key, value in spins.items()))
+
+    print("\n[WINNERS] Số người thắng mỗi ván:")
+    for winners, count in report["winners_per_game"].items():
+        print(f"  {winners:>2}: {count:>10,} ({count / report['games']:6.2%})")
+
+    print("\n[TOKEN] Token mỗi người thắng nhận:")
+    for payout, count in report["winner_payout"].items():
+        print(f"  {payout:>8}: {count:>10,}")
+    print("\n[TOKEN] Token ròng trung bình mỗi ván theo mã vé:")
+    for code, net in report["net_token_per_game_by_code"].items():
+        print(f"  {code:>7}: {net:+.3f}")
+
+    tp = report["throughput"]
+    print("\n[PERF] Thông lượng engine:")
+    print(f"  {tp['spins']:,} lượt quay, {tp['workers']} worker, {tp['wall_seconds']}s")
+    print(f"  {tp['spins_per_sec_per_core']:,} lượt/s mỗi core, {tp['spins_per_sec_total']:,} lượt/s tổng")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=len(TICKET_CODES))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--bet", type=float, default=BET_AMOUNT)
+    parser.add_argument("--json", action="store_true", help="In báo cáo dạng JSON")
+    args = parser.parse_args()
+
+    try:
+        report = simulate(args.games, args.players, args.workers, args.seed, args.chunk_size, args.bet)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
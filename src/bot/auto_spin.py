@@ -0,0 +1,191 @@
+"""
+Lịch tự động quay số (/tu_dong N) cho mọi nhóm.
+
+Thay vì mỗi nhóm một task ngủ `asyncio.sleep(N)`, toàn bot dùng một heap
+(thời điểm đến hạn, chat_id) và một job lặp duy nhất trên JobQueue gọi
+`pop_due` mỗi nhịp. Huỷ lịch không cần tìm trong heap: mỗi lần bật/tắt tăng
+`generation` của chat, mục cũ trong heap bị bỏ qua khi lấy ra (xoá lười).
+
+Lịch được lưu qua backend (bảng `auto_spins`) và nạp lại bằng `restore()` khi
+bot khởi động. Bật/tắt chỉ ghi nhận thay đổi trong RAM; `flush_writes()` (gọi ở
+mỗi nhịp của job và khi tắt bot) ghi chúng xuống backend trong thread riêng, nên
+không có lệnh DB nào chạy trên event loop. Module này không phụ thuộc telegram;
+phần gửi tin nằm ở `src.bot.handlers.auto_spin`.
+"""
+import asyncio
+import heapq
+import time
+from typing import Any, Dict, Optional
+
+from src.bot.constants import AUTO_SPIN_MAX_PER_TICK, AUTO_SPIN_MAX_SECONDS, AUTO_SPIN_MIN_SECONDS
+from src.db.backends import StorageBackend, get_backend
+
+
+class AutoSpinScheduler:
+    """Heap các lượt tự động quay đến hạn, dùng chung cho mọi chat."""
+
+    def __init__(self, backend: Optional[StorageBackend] = None, clock=time.monotonic):
+        # Backend lưu trữ; None = dùng backend mặc định tại thời điểm gọi
+        self._backend = backend
+        self._clock = clock
+        # chat_id -> {"interval": float, "game_id": str, "started_by": int | None, "started_at": str}
+        self._schedules: Dict[int, Dict[str, Any]] = {}
+        # chat_id -> generation hiện tại; mục heap khác generation là mục đã huỷ
+        self._generation: Dict[int, int] = {}
+        self._heap: list[tuple[float, int, int]] = []
+        # chat_id -> lịch cần lưu (None = cần xoá), chờ `flush_writes`
+        self._pending_writes: Dict[int, Optional[Dict[str, Any]]] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+        # chat_id -> (game_id, spin_count, numbers): số đã rút nhưng gửi thông báo
+        # lỗi, được gửi lại ở lượt kế tiếp; bỏ đi khi tắt lịch
+        self._unannounced: Dict[int, tuple[str, int, list[int]]] = {}
+
+    @property
+    def backend(self) -> StorageBackend:
+        return self._backend if self._backend is not None else get_backend()
+
+    def __len__(self) -> int:
+        return len(self._schedules)
+
+    def __contains__(self, chat_id: object) -> bool:
+        return chat_id in self._schedules
+
+    def get(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        schedule = self._schedules.get(chat_id)
+        return dict(schedule) if schedule else None
+
+    def _push(self, chat_id: int, due: float) -> None:
+        generation = self._generation.get(chat_id, 0) + 1
+        self._generation[chat_id] = generation
+        heapq.heappush(self._heap, (due, chat_id, generation))
+
+    def start(
+        self,
+        chat_id: int,
+        interval: float,
+        game_id: str = "",
+        started_by: Optional[int] = None,
+        started_at: str = "",
+    ) -> Dict[str, Any]:
+        """
+        Bật (hoặc đổi chu kỳ) tự động quay của chat; lượt đầu sau `interval` giây.
+        `game_id` là id của ván đang chơi: lịch tự hết hiệu lực khi chat sang ván khác.
+        ValueError nếu chu kỳ ngoài [AUTO_SPIN_MIN_SECONDS, AUTO_SPIN_MAX_SECONDS].
+        """
+        interval = float(interval)
+        if not AUTO_SPIN_MIN_SECONDS <= interval <= AUTO_SPIN_MAX_SECONDS:
+            raise ValueError(
+                f"Chu kỳ phải từ {AUTO_SPIN_MIN_SECONDS} đến {AUTO_SPIN_MAX_SECONDS} giây"
+            )
+        schedule = {
+            "interval": interval,
+            "game_id": game_id,
+            "started_by": started_by,
+            "started_at": started_at,
+        }
+        self._schedules[chat_id] = schedule
+        self._pending_writes[chat_id] = dict(schedule)
+        self._push(chat_id, self._clock() + interval)
+        return dict(schedule)
+
+    def stop(self, chat_id: int) -> bool:
+        """Tắt tự động quay của chat (bỏ cả số chưa gửi được). Trả về False nếu chat không bật."""
+        self._unannounced.pop(chat_id, None)
+        if self._schedules.pop(chat_id, None) is None:
+            return False
+        self._generation.pop(chat_id, None)
+        self._pending_writes[chat_id] = None
+        return True
+
+    def set_unannounced(self, chat_id: int, game_id: str, spin_count: int, numbers: list[int]) -> None:
+        """Ghi nhớ số đã rút của lượt tự động mà chưa gửi được thông báo."""
+        if chat_id in self._schedules:
+            self._unannounced[chat_id] = (game_id, spin_count, numbers)
+
+    def pop_unannounced(self, chat_id: int) -> Optional[tuple[str, int, list[int]]]:
+        """Lấy ra (game_id, spin_count, numbers) chưa gửi được của chat, nếu có."""
+        return self._unannounced.pop(chat_id, None)
+
+    def _write(self, batch: list) -> None:
+        backend = self.backend
+        for chat_id, schedule in batch:
+            if schedule is None:
+                backend.delete_auto_spin(chat_id)
+            else:
+                backend.save_auto_spin(chat_id, schedule)
+
+    async def flush_writes(self) -> int:
+        """
+        Ghi các lần bật/tắt đang chờ xuống backend (trong thread riêng).
+        Trả về số chat đã ghi. Ghi lỗi thì đưa lại lô vào hàng chờ (không đè
+        lên thay đổi mới hơn) rồi ném lại lỗi.
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._pending_writes:
+                return 0
+            batch = list(self._pending_writes.items())
+            self._pending_writes.clear()
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception:
+                for chat_id, schedule in batch:
+                    self._pending_writes.setdefault(chat_id, schedule)
+                raise
+            return len(batch)
+
+    def pending_writes(self) -> int:
+        """Số chat có thay đổi lịch chưa ghi xuống backend."""
+        return len(self._pending_writes)
+
+    def reschedule(self, chat_id: int, delay: Optional[float] = None) -> None:
+        """Hẹn lượt kế tiếp sau `delay` giây (mặc định: đúng chu kỳ của chat)."""
+        schedule = self._schedules.get(chat_id)
+        if schedule is None:
+            return
+        self._push(chat_id, self._clock() + (schedule["interval"] if delay is None else delay))
+
+    def pop_due(self, limit: int = AUTO_SPIN_MAX_PER_TICK) -> list[int]:
+        """
+        Lấy tối đa `limit` chat đã đến hạn (sớm nhất trước).
+
+        Chat được lấy ra không còn trong heap cho tới khi gọi `reschedule`;
+        chat vượt `limit` giữ nguyên chỗ và đến lượt ở nhịp sau.
+        """
+        now = self._clock()
+        due: list[int] = []
+        heap = self._heap
+        while heap and len(due) < limit and heap[0][0] <= now:
+            _, chat_id, generation = heapq.heappop(heap)
+            if self._generation.get(chat_id) == generation:
+                due.append(chat_id)
+        return due
+
+    def next_due_in(self) -> Optional[float]:
+        """Số giây tới lượt sớm nhất còn hiệu lực (None nếu không có)."""
+        heap = self._heap
+        while heap and self._generation.get(heap[0][1]) != heap[0][2]:
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        return max(heap[0][0] - self._clock(), 0.0)
+
+    def restore(self) -> int:
+        """Nạp lại các lịch đã lưu (khi khởi động), mỗi chat quay lượt đầu sau một chu kỳ."""
+        restored = 0
+        for chat_id, schedule in self.backend.load_all_auto_spins().items():
+            if chat_id in self._schedules:
+                continue
+            self._schedules[chat_id] = schedule
+            self._push(chat_id, self._clock() + float(schedule["interval"]))
+            restored += 1
+        return restored
+
+    def clear(self) -> None:
+        """Xoá mọi lịch trong RAM (không đụng tới backend, bỏ cả các lần ghi đang chờ)."""
+        self._schedules.clear()
+        self._generation.clear()
+        self._heap.clear()
+        self._pending_writes.clear()
+        self._unannounced.clear()
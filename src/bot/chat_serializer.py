@@ -0,0 +1,192 @@
+"""
+Xử lý tuần tự theo từng chat, song song giữa các chat.
+
+Khi bật `concurrent_updates`, PTB chạy nhiều update cùng lúc; hai lệnh trong
+cùng một nhóm (vd: /quay và /kinh) có thể cùng sửa một `WheelSession` rồi
+`persist_session`. Mỗi chat vì vậy có một `asyncio.Lock` riêng: lock của asyncio
+đánh thức các task chờ theo thứ tự đến (FIFO), nên update trong một chat vẫn
+được xử lý lần lượt đúng thứ tự, còn nhóm chậm (/tong_ket lớn, gửi ảnh ở
+/lay_ve) không làm các nhóm khác phải chờ.
+
+Một số update sửa game của nhóm khác với chat gửi tới: nút điều khiển từ xa
+(`cmd:<lệnh>:<chat_id nhóm>`) và tin reply nhập tên game trong chat riêng
+(`target_chat_id` trong user_data hoặc "nhóm -123" trong tin được reply). Các
+update đó phải giữ lock của nhóm đích, xem `resolve_lock_chat`.
+
+Lock được tạo khi có update đầu tiên và bỏ đi khi chat hết việc; chỉ các bộ đếm
+(độ sâu hàng đợi, thời gian chờ) được giữ lại, cho tối đa `max_chats` chat (LRU:
+bỏ bộ đếm của chat rảnh lâu nhất, chat đang có việc không bao giờ bị bỏ). Module
+này không phụ thuộc telegram; phần nối vào Application nằm ở `src.bot.telegram_bot`.
+"""
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Mapping, Optional
+
+from src.bot.constants import CHAT_STATS_MAX_SIZE
+
+_REPLY_TARGET_RE = re.compile(r"nhóm (-?\d+)")
+
+
+def callback_target_chat(data: Optional[str]) -> Optional[int]:
+    """Chat đích nhúng trong callback data dạng "cmd:<lệnh>:<chat_id>" (None nếu không có)."""
+    if not data or not data.startswith("cmd:"):
+        return None
+    parts = data.split(":")
+    if len(parts) < 3:
+        return None
+    try:
+        return int(parts[2])
+    except ValueError:
+        return None
+
+
+def reply_target_chat(user_data: Optional[Mapping[str, Any]], reply_text: Optional[str]) -> Optional[int]:
+    """
+    Chat đích của tin reply nhập tên Vòng/Game: `target_chat_id` đang chờ trong
+    user_data, hoặc "nhóm <chat_id>" trong tin bot đã gửi (khi mất user_data).
+    """
+    target = (user_data or {}).get("target_chat_id")
+    if target:
+        return target
+    match = _REPLY_TARGET_RE.search(reply_text or "")
+    return int(match.group(1)) if match else None
+
+
+def resolve_lock_chat(
+    chat_id: Optional[int],
+    callback_data: Optional[str] = None,
+    user_data: Optional[Mapping[str, Any]] = None,
+    reply_text: Optional[str] = None,
+) -> Optional[int]:
+    """
+    Chat cần giữ lock khi xử lý một update: nhóm đích của nút điều khiển từ xa
+    hoặc của tin reply (`reply_text` khác None khi tin là reply), nếu không thì
+    chính chat gửi tới. None = update không gắn với chat (inline query).
+    """
+    target = callback_target_chat(callback_data)
+    if target is None and reply_text is not None:
+        target = reply_target_chat(user_data, reply_text)
+    return target if target is not None else chat_id
+
+
+class _ChatLane:
+    """Lock và bộ đếm của một chat."""
+
+    __slots__ = ("lock", "depth", "max_depth", "handled", "total_wait", "max_wait")
+
+    def __init__(self):
+        self.lock: Optional[asyncio.Lock] = None
+        # Số việc đang chạy + đang chờ của chat
+        self.depth = 0
+        self.max_depth = 0
+        self.handled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "handled": self.handled,
+            "avg_wait_ms": round(self.total_wait / self.handled * 1000, 3) if self.handled else None,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+class ChatSerializer:
+    """Một lock FIFO cho mỗi chat, kèm số liệu độ sâu hàng đợi và thời gian chờ."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter, max_chats: int = CHAT_STATS_MAX_SIZE):
+        self._clock = clock
+        # chat_id -> lock + bộ đếm, theo thứ tự dùng gần nhất (cuối = mới nhất)
+        self._lanes: "OrderedDict[int, _ChatLane]" = OrderedDict()
+        self.max_chats = max_chats
+        # Số chat rảnh đã bị bỏ bộ đếm vì vượt `max_chats`
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._lanes)
+
+    @asynccontextmanager
+    async def hold(self, chat_id: int) -> AsyncIterator[None]:
+        """
+        Giữ quyền xử lý độc quyền của chat trong khối `async with`.
+
+        Task gọi sau phải chờ các task gọi trước của cùng chat xong (theo thứ
+        tự gọi); chat khác không bị ảnh hưởng.
+        """
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            lane = self._lanes[chat_id] = _ChatLane()
+        else:
+            self._lanes.move_to_end(chat_id)
+        if lane.lock is None:
+            lane.lock = asyncio.Lock()
+        lock = lane.lock
+        lane.depth += 1
+        lane.max_depth = max(lane.max_depth, lane.depth)
+        queued_at = self._clock()
+        try:
+            async with lock:
+                wait = self._clock() - queued_at
+                lane.handled += 1
+                lane.total_wait += wait
+                lane.max_wait = max(lane.max_wait, wait)
+                yield
+        finally:
+            lane.depth -= 1
+            if lane.depth == 0:
+                # Hết việc: bỏ lock, chỉ giữ bộ đếm
+                lane.lock = None
+                self._trim()
+
+    def _trim(self) -> None:
+        """Bỏ bộ đếm của các chat rảnh lâu nhất cho tới khi không vượt `max_chats`."""
+        while len(self._lanes) > self.max_chats:
+            # Chat đang có việc vừa được đưa về cuối khi vào `hold`, nên thường
+            # chỉ phải bước qua vài chat ở đầu
+            for chat_id, lane in self._lanes.items():
+                if lane.depth == 0:
+                    break
+            else:
+                return
+            del self._lanes[chat_id]
+            self.evicted += 1
+
+    def depth(self, chat_id: int) -> int:
+        """Số việc đang chạy + đang chờ của chat."""
+        lane = self._lanes.get(chat_id)
+        return lane.depth if lane is not None else 0
+
+    def is_busy(self, chat_id: int) -> bool:
+        return self.depth(chat_id) > 0
+
+    def get_chat_stats(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        """Bộ đếm của một chat (None nếu chat chưa từng có update)."""
+        lane = self._lanes.get(chat_id)
+        return lane.to_dict() if lane is not None else None
+
+    def get_stats(self, top: int = 5) -> Dict[str, Any]:
+        """Tổng hợp toàn bot, kèm `top` chat chờ lâu nhất (theo max_wait)."""
+        lanes = self._lanes.items()
+        handled = sum(lane.handled for _, lane in lanes)
+        total_wait = sum(lane.total_wait for _, lane in lanes)
+        slowest = sorted(lanes, key=lambda item: item[1].max_wait, reverse=True)[:top]
+        return {
+            "chats": len(self._lanes),
+            "evicted": self.evicted,
+            "busy_chats": sum(1 for _, lane in lanes if lane.depth),
+            "queued": sum(max(lane.depth - 1, 0) for _, lane in lanes),
+            "handled": handled,
+            "avg_wait_ms": round(total_wait / handled * 1000, 3) if handled else None,
+            "max_depth": max((lane.max_depth for _, lane in lanes), default=0),
+            "slowest": {chat_id: lane.to_dict() for chat_id, lane in slowest},
+        }
+
+    def clear(self) -> None:
+        """Xoá bộ đếm (chỉ dùng khi không còn việc đang chạy, vd: trong test)."""
+        self._lanes.clear()
+        self.evicted = 0
@@ -1,23 +1,71 @@
 from pathlib import Path
 
 # Vòng chơi (vòng mới) đang hoạt động theo chat:
-# {chat_id: {"round_name": str, "owner_id": int, "created_at": str}}
+# {chat_id: {"round_id": str, "round_name": str, "owner_id": int, "created_at": str}}
 active_rounds: dict[int, dict] = {}
 
-# Lịch sử các game trong mỗi vòng chơi:
+# Cache lịch sử các game trong mỗi vòng chơi (nguồn chính là bảng `games`):
 # {chat_id: [{"game_name": str, "winners": list, "participants": list, "ended_at": str}, ...]}
+# Có key nghĩa là đã tải xong từ DB; dùng `get_round_games` thay vì đọc trực tiếp.
 round_history: dict[int, list] = {}
 
+# Cache sổ token cộng dồn của mỗi vòng chơi (nguồn chính là bảng `round_ledger`):
+# {chat_id: {user_id: {"name": str, "token": float}}}
+round_ledgers: dict[int, dict] = {}
+
 # Cấu hình mặc định cho ván game
 MAX_NUMBERS = 90
 DEFAULT_REMOVE_AFTER_SPIN = True
 BET_AMOUNT = 5.0
 
+# Chế độ xổ số/bốc thăm khoảng lớn (/xo_so): pool thưa, lưu trữ theo số lượt rút
+# (không vượt MAX_RANGE_SIZE của WheelSession)
+RAFFLE_MAX_NUMBERS = 10_000_000
+
+# Vòng quay giải thưởng có trọng số (/vong_quay)
+PRIZE_WHEEL_MAX_SEGMENTS = 1000
+
 # Cooldown chống spam
 COOLDOWN_SPIN_SECONDS = 0.5  # Giảm từ 2s xuống 0.5s để tăng tốc
 COOLDOWN_CHECK_SECONDS = 2
 COOLDOWN_GENERAL_SECONDS = 0.3  # Rate limit cho các lệnh thông thường (giảm từ 1s)
 
+# Quay nhiều số một lần (/quay N)
+MAX_SPINS_PER_COMMAND = 10
+MULTI_SPIN_BUTTON_COUNT = 5  # Số lượt của nút "Quay N" trên bảng điều khiển
+STATUS_MAX_LISTED = 200  # /trang_thai chỉ liệt kê tối đa N số đã ra (giới hạn độ dài tin nhắn)
+
+# Tự động quay (/tu_dong N)
+# Mỗi lượt gửi 2 tin (số + bảng điều khiển); Telegram giới hạn ~20 tin/phút mỗi nhóm
+# nên chu kỳ tối thiểu là 6 giây. Toàn bot giới hạn ~30 tin/giây: mỗi nhịp chỉ quay
+# tối đa AUTO_SPIN_MAX_PER_TICK nhóm, phần còn lại dời sang nhịp sau.
+AUTO_SPIN_MIN_SECONDS = 6
+AUTO_SPIN_MAX_SECONDS = 300
+AUTO_SPIN_TICK_SECONDS = 1.0  # Chu kỳ của job dùng chung trên JobQueue
+AUTO_SPIN_MAX_PER_TICK = 10
+
+# Số update xử lý song song (concurrent_updates); update cùng chat vẫn chạy lần lượt.
+# Update đang chờ chat của nó không chiếm chỗ (lock chat được giữ trước).
+CONCURRENT_UPDATES_MAX = 256
+# Số chat được giữ bộ đếm hàng đợi (ChatSerializer); chat rảnh lâu nhất bị bỏ trước
+CHAT_STATS_MAX_SIZE = 10_000
+
+# Ghi trễ session xuống SQLite (write-behind)
+PERSIST_FLUSH_INTERVAL_SECONDS = 0.5  # Chu kỳ flush của task nền
+PERSIST_MAX_DIRTY = 32  # Flush sớm khi số chat chờ ghi vượt ngưỡng
+
+# Cache session trong RAM (LRU + TTL): chat ít dùng nhất / rảnh quá lâu được ghi
+# xuống DB rồi bỏ khỏi RAM, lệnh kế tiếp tự tải lại. 0 = không giới hạn.
+# Ghi đè bằng biến môi trường SESSION_CACHE_MAX_SIZE / SESSION_CACHE_TTL_SECONDS
+SESSION_CACHE_MAX_SIZE = 5000
+SESSION_CACHE_TTL_SECONDS = 6 * 3600
+# Số chat "không có session" được nhớ để khỏi tra DB lại (cache âm)
+NEGATIVE_CACHE_MAX_SIZE = 50_000
+
+# Nạp sẵn cache khi khởi động: chỉ lấy session/kết quả cập nhật trong N giờ gần nhất
+# (0 = nạp tất cả)
+WARM_START_MAX_AGE_HOURS = 24
+
 # Danh sách mã vé (mã màu viết tắt)
 TICKET_CODES = [
     "cam1",
@@ -0,0 +1,175 @@
+"""
+Lệnh /tu_dong và job quay tự động dùng chung trên JobQueue
+"""
+import logging
+from datetime import datetime, timedelta
+from telegram import Update
+from telegram.error import Forbidden, RetryAfter, TelegramError
+from telegram.ext import ContextTypes
+from src.bot.constants import (
+    COOLDOWN_SPIN_SECONDS, AUTO_SPIN_MIN_SECONDS, AUTO_SPIN_MAX_SECONDS, AUTO_SPIN_TICK_SECONDS,
+)
+from src.bot.utils import session_manager, auto_spin_scheduler, chat_serializer, ensure_active_session
+from src.bot.wheel import spin_wheel_many
+from src.bot.handlers.spin import last_spin_time, send_spin_result
+from src.utils.validators import validate_number
+
+logger = logging.getLogger(__name__)
+
+_STOP_WORDS = ("tat", "tắt", "dung", "dừng", "stop", "off")
+
+
+async def auto_spin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler cho lệnh /tu_dong N (quay mỗi N giây) và /tu_dong tat"""
+    chat_id = update.effective_chat.id
+    user_id = update.effective_user.id
+    session = session_manager.get_session(chat_id)
+    args = getattr(context, "args", None) or []
+
+    if args and args[0].lower() in _STOP_WORDS:
+        if auto_spin_scheduler.stop(chat_id):
+            await update.message.reply_text("⏸️ *Đã tắt tự động quay\\.*", parse_mode='Markdown')
+        else:
+            await update.message.reply_text("ℹ️ Chat này chưa bật tự động quay.")
+        return
+
+    if not session:
+        await update.message.reply_text("❌ *Chưa có game nào trong chat\\!*", parse_mode='Markdown')
+        return
+
+    if not await ensure_active_session(update, chat_id, session):
+        return
+
+    owner_id = getattr(session, "owner_id", None)
+    if owner_id is not None and owner_id != user_id:
+        await update.message.reply_text(
+            "❌ Chỉ *host* (người tạo game) mới được bật tự động quay.", parse_mode='Markdown'
+        )
+        return
+
+    if not getattr(session, "started", False):
+        await update.message.reply_text(
+            "⏱️ *Game chưa bắt đầu\\!* \n\nHost cần dùng lệnh `/bat_dau` trước khi bật tự động quay.",
+            parse_mode='Markdown'
+        )
+        return
+
+    usage = (
+        f"❌ Dùng `/tu_dong N` với N từ {AUTO_SPIN_MIN_SECONDS} đến {AUTO_SPIN_MAX_SECONDS} giây, "
+        "hoặc `/tu_dong tat` để tắt."
+    )
+    if not args:
+        await update.message.reply_text(usage, parse_mode='Markdown')
+        return
+    is_valid, interval, error = validate_number(args[0])
+    if not is_valid:
+        await update.message.reply_text(usage, parse_mode='Markdown')
+        return
+
+    try:
+        auto_spin_scheduler.start(
+            chat_id, interval,
+            game_id=session.id,
+            started_by=user_id,
+            started_at=datetime.now().isoformat(timespec="seconds"),
+        )
+    except ValueError:
+        await update.message.reply_text(usage, parse_mode='Markdown')
+        return
+
+    await update.message.reply_text(
+        f"▶️ *Tự động quay mỗi {interval} giây\\.*\n\n"
+        "Dừng khi hết số, khi có người /kinh trúng, hoặc dùng `/tu_dong tat`.",
+        parse_mode='Markdown'
+    )
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+async def auto_spin_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Job lặp của JobQueue: quay một số cho mỗi chat đã đến hạn.
+
+    Mỗi nhịp xử lý tối đa AUTO_SPIN_MAX_PER_TICK chat. Chat vừa có người /quay
+    tay trong COOLDOWN_SPIN_SECONDS được dời lại; RetryAfter của Telegram dời
+    chat đó theo thời gian Telegram yêu cầu; bot bị chặn khỏi nhóm thì tắt lịch.
+    Số đã rút mà chưa gửi được thông báo sẽ được gửi lại ở lượt sau.
+    Lượt quay chạy trong lock của chat như một update; chat đang bận xử lý lệnh
+    khác được dời sang nhịp sau thay vì bắt job chờ. Cuối mỗi nhịp, các lần
+    bật/tắt lịch đang chờ được ghi xuống DB (ngoài event loop).
+    """
+    now = datetime.now()
+    for chat_id in auto_spin_scheduler.pop_due():
+        if chat_serializer.is_busy(chat_id):
+            auto_spin_scheduler.reschedule(chat_id, AUTO_SPIN_TICK_SECONDS)
+            continue
+        try:
+            async with chat_serializer.hold(chat_id):
+                await _auto_spin_chat(context, chat_id, now)
+        except Exception as e:
+            # Chat đã ra khỏi heap: phải hẹn lại, nếu không lịch ngừng mà /tu_dong vẫn báo đang bật
+            logger.error(f"Auto spin chat {chat_id} lỗi: {e}", exc_info=True)
+            auto_spin_scheduler.reschedule(chat_id)
+    try:
+        await auto_spin_scheduler.flush_writes()
+    except Exception as e:
+        # Lần ghi lỗi vẫn nằm trong hàng chờ, thử lại ở nhịp sau
+        logger.error(f"Auto spin: lỗi khi lưu lịch xuống DB: {e}", exc_info=True)
+
+
+async def _auto_spin_chat(context: ContextTypes.DEFAULT_TYPE, chat_id: int, now: datetime) -> None:
+    """Một lượt tự động quay của chat (gọi khi đang giữ lock của chat)."""
+    schedule = auto_spin_scheduler.get(chat_id)
+    session = session_manager.get_session(chat_id)
+    pending = auto_spin_scheduler.pop_unannounced(chat_id)
+    if pending and (not session or pending[:2] != (session.id, session.spin_count)):
+        pending = None  # Ván đã đổi hoặc đã có lượt quay mới hiển thị số này
+    if (
+        not schedule
+        or not session
+        or not getattr(session, "started", False)
+        or session.id != schedule.get("game_id")
+        or (session.is_empty() and not pending)
+    ):
+        auto_spin_scheduler.stop(chat_id)
+        return
+
+    if pending:
+        numbers = pending[2]
+    else:
+        last = last_spin_time.get(chat_id)
+        if last is not None:
+            elapsed = (now - last).total_seconds()
+            if elapsed < COOLDOWN_SPIN_SECONDS:
+                auto_spin_scheduler.reschedule(chat_id, COOLDOWN_SPIN_SECONDS - elapsed)
+                return
+        numbers = spin_wheel_many(session, 1)
+        last_spin_time[chat_id] = now
+        # Số đã rút khỏi pool: lưu ngay, không phụ thuộc việc gửi tin thành công
+        session_manager.persist_session(chat_id)
+
+    try:
+        await send_spin_result(context.bot, chat_id, session, numbers)
+    except RetryAfter as e:
+        auto_spin_scheduler.set_unannounced(chat_id, session.id, session.spin_count, numbers)
+        auto_spin_scheduler.reschedule(chat_id, _retry_after_seconds(e))
+        return
+    except Forbidden:
+        logger.info(f"Auto spin: bot không còn gửi được vào chat {chat_id}, tắt lịch")
+        auto_spin_scheduler.stop(chat_id)
+        return
+    except TelegramError as e:
+        logger.warning(f"Auto spin chat {chat_id}: {e}")
+        auto_spin_scheduler.set_unannounced(chat_id, session.id, session.spin_count, numbers)
+        auto_spin_scheduler.reschedule(chat_id)
+        return
+
+    if session.is_empty():
+        auto_spin_scheduler.stop(chat_id)
+    else:
+        auto_spin_scheduler.reschedule(chat_id)
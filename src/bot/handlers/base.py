@@ -5,6 +5,7 @@ from telegram.ext import ContextTypes
 from telegram.error import RetryAfter, TimedOut, NetworkError
 from config.config import WELCOME_MESSAGE, HELP_MESSAGE
 from src.bot.constants import COOLDOWN_GENERAL_SECONDS
+from src.bot.chat_serializer import callback_target_chat, reply_target_chat
 
 logger = logging.getLogger(__name__)
 
@@ -121,7 +122,7 @@ async def generic_command_callback(update: Update, context: ContextTypes.DEFAULT
     command = parts[1]
     
     # Nếu có target_chat_id nhúng trong nút bấm
-    target_chat_id = int(parts[2]) if len(parts) > 2 else query.message.chat_id
+    target_chat_id = callback_target_chat(data) or query.message.chat_id
     
     class MockMessage:
         def __init__(self, original_msg, target_id):
@@ -155,7 +156,7 @@ async def generic_command_callback(update: Update, context: ContextTypes.DEFAULT
     # Import handlers here to avoid circular dependencies
     from src.bot.handlers.game import vongmoi_command, endround_command, newsession_command, startsession_command, endsession_command
     from src.bot.handlers.player import layve_command, players_command
-    from src.bot.handlers.spin import spin_command, reset_command, leaderboard_command, status_command, lastresult_command
+    from src.bot.handlers.spin import spin_command, reset_command, leaderboard_command, status_command, lastresult_command, check_command
 
     try:
         if command == "lay_ve":
@@ -168,6 +169,14 @@ async def generic_command_callback(update: Update, context: ContextTypes.DEFAULT
             await endsession_command(mock_update, context)
         elif command == "quay":
             await spin_command(mock_update, context)
+        elif command.startswith("quay_"):
+            # Nút "Quay N": cmd:quay_<N>:<chat_id>
+            context.args = [command.split("_", 1)[1]]
+            await spin_command(mock_update, context)
+        elif command == "kinh":
+            # Nút "Kinh ngay": kiểm tra hàng đủ số trên vé của người bấm
+            context.args = []
+            await check_command(mock_update, context)
         elif command == "dat_lai":
             await reset_command(mock_update, context)
         elif command == "xep_hang":
@@ -228,13 +237,10 @@ async def handle_force_reply(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     # Fallback: Nếu mất user_data, thử trích xuất từ text của tin nhắn gốc
     if not action or not target_chat_id:
-        import re
         reply_text = reply_to.text or ""
         
         # Trích xuất chat_id từ text: "nhóm -123456789"
-        chat_id_match = re.search(r"nhóm (-?\d+)", reply_text)
-        if chat_id_match:
-            target_chat_id = int(chat_id_match.group(1))
+        target_chat_id = reply_target_chat(None, reply_text) or target_chat_id
             
         # Xác định hành động dựa trên từ khóa trong text
         if "Vòng mới" in reply_text:
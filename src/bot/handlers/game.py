@@ -1,10 +1,21 @@
+import logging
+import uuid
 from datetime import datetime
+from typing import Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from src.bot.constants import active_rounds, round_history, MAX_NUMBERS, DEFAULT_REMOVE_AFTER_SPIN, last_results, BET_AMOUNT
-from src.bot.utils import escape_markdown, session_manager, get_chat_stats
-from src.utils.validators import validate_range, validate_number
-from src.db.sqlite_store import save_stats, save_last_result, save_active_round, delete_active_round_row
+from src.bot.constants import active_rounds, round_history, round_ledgers, MAX_NUMBERS, RAFFLE_MAX_NUMBERS, PRIZE_WHEEL_MAX_SEGMENTS, DEFAULT_REMOVE_AFTER_SPIN, last_results, BET_AMOUNT
+from src.bot.utils import (
+    escape_markdown, session_manager, update_chat_stats, reset_chat_stats,
+    record_round_game, get_round_ledger, check_round_ledger, auto_spin_scheduler,
+    ticket_display_name
+)
+from src.utils.validators import validate_range, validate_number, parse_segments
+from src.models.ticket_eval import evaluate_session
+from src.models.draw_pool import seed_commitment
+from src.db.backends import get_backend
+
+logger = logging.getLogger(__name__)
 
 async def vongmoi_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler cho lệnh /vong_moi <tên_vòng> - tạo vòng chơi mới trong chat."""
@@ -67,20 +78,19 @@ async def vongmoi_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Lưu vào RAM và DB
     active_rounds[chat_id] = {
+        "round_id": uuid.uuid4().hex,
         "round_name": round_name,
         "owner_id": user_id,
         "created_at": datetime.now().isoformat(timespec="seconds"),
     }
-    save_active_round(chat_id, active_rounds[chat_id])
+    get_backend().save_active_round(chat_id, active_rounds[chat_id])
     
-    # Khởi tạo lịch sử game cho vòng mới
+    # Vòng mới chưa có game nào, khỏi phải tải từ DB
     round_history[chat_id] = []
+    round_ledgers[chat_id] = {}
     
     # Reset thống kê của chat cho vòng mới (để token tính từ 0)
-    chat_stats = get_chat_stats(chat_id)
-    chat_stats["wins"] = {}
-    chat_stats["participations"] = {}
-    save_stats(chat_id, chat_stats)
+    reset_chat_stats(chat_id)
 
     target_chat_id = chat_id
     suffix = f":{target_chat_id}"
@@ -135,10 +145,11 @@ async def endround_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Hiển thị BXH cuối cùng của vòng trước khi xoá
-    games = round_history.get(chat_id, [])
-    if games:
-        from src.bot.utils import calculate_round_tokens, get_round_leaderboard_text
-        user_tokens = calculate_round_tokens(games)
+    # Đối chiếu sổ token với lịch sử game (chỉ log nếu lệch)
+    check_round_ledger(chat_id)
+    user_tokens = get_round_ledger(chat_id)
+    if user_tokens:
+        from src.bot.utils import get_round_leaderboard_text
         leaderboard_msg = get_round_leaderboard_text(round_name, user_tokens)
         await update.message.reply_text(
             f"🏁 *KẾT THÚC VÒNG CHƠI: {escape_markdown(round_name)}*\n\n" + leaderboard_msg,
@@ -147,11 +158,11 @@ async def endround_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # 3. Xoá vòng chơi khỏi active_rounds (RAM) và DB
     del active_rounds[chat_id]
-    delete_active_round_row(chat_id)
+    get_backend().delete_active_round_row(chat_id)
     
-    # Xóa lịch sử game của vòng
-    if chat_id in round_history:
-        del round_history[chat_id]
+    # Bỏ cache lịch sử game và sổ token của vòng (bảng trong DB vẫn giữ lại)
+    round_history.pop(chat_id, None)
+    round_ledgers.pop(chat_id, None)
     
     target_chat_id = chat_id
     suffix = f":{target_chat_id}"
@@ -266,10 +277,40 @@ async def newsession_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 async def setrange_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler cho lệnh /pham_vi <x> <y>"""
+    await _create_range_game(update, context, "pham_vi", "1 100", MAX_NUMBERS)
+
+
+async def raffle_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler cho lệnh /xo_so <x> <y>: bốc thăm trên khoảng lớn (tới RAFFLE_MAX_NUMBERS số)"""
+    await _create_range_game(update, context, "xo_so", "1 100000", RAFFLE_MAX_NUMBERS)
+
+
+async def prize_wheel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler cho lệnh /vong_quay <nhãn>:<trọng số>, ... (vòng quay giải thưởng có trọng số)"""
     chat_id = update.effective_chat.id
-    user = update.effective_user
-    user_id = user.id
-    
+    if not await _can_create_game(update, chat_id):
+        return
+
+    text = " ".join(getattr(context, "args", None) or [])
+    if not text:
+        await update.message.reply_text(
+            "❌ *Sai cú pháp\\!*\n\n"
+            "Sử dụng: `/vong_quay <nhãn>:<trọng số>, ...`\n"
+            "Ví dụ: `/vong_quay Jackpot:1, Voucher:5, Chúc may mắn:30`",
+            parse_mode='Markdown'
+        )
+        return
+
+    is_valid, segments, error_msg = parse_segments(text, PRIZE_WHEEL_MAX_SEGMENTS)
+    if not is_valid:
+        await update.message.reply_text(f"❌ Lỗi: {error_msg}")
+        return
+
+    await _create_game(update, chat_id, 1, len(segments), segments)
+
+
+async def _can_create_game(update: Update, chat_id: int) -> bool:
+    """Chat đã có vòng chơi và chưa có game nào đang chạy (nếu không thì nhắc người dùng)"""
     if chat_id not in active_rounds:
         target_chat_id = chat_id
         suffix = f":{target_chat_id}"
@@ -281,7 +322,7 @@ async def setrange_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 [InlineKeyboardButton("🔄 Tạo Vòng mới", callback_data=f"cmd:vong_moi_input{suffix}")]
             ])
         )
-        return
+        return False
 
     if session_manager.has_session(chat_id):
         target_chat_id = chat_id
@@ -296,6 +337,21 @@ async def setrange_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                  InlineKeyboardButton("🛑 Kết thúc Game", callback_data=f"cmd:ket_thuc{suffix}")]
             ])
         )
+        return False
+
+    return True
+
+
+async def _create_range_game(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    command: str,
+    example: str,
+    max_numbers: int,
+):
+    """Tạo game với khoảng số `<x> <y>` của lệnh `command` (tối đa `max_numbers` số)"""
+    chat_id = update.effective_chat.id
+    if not await _can_create_game(update, chat_id):
         return
 
     if not context.args or len(context.args) < 2:
@@ -303,8 +359,8 @@ async def setrange_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         suffix = f":{target_chat_id}"
         await update.message.reply_text(
             "❌ *Sai cú pháp\\!*\n\n"
-            "Sử dụng: `/pham_vi <x> <y>`\n"
-            "Ví dụ: `/pham_vi 1 100`",
+            f"Sử dụng: `/{command} <x> <y>`\n"
+            f"Ví dụ: `/{command} {example}`",
             parse_mode='Markdown',
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("📋 Menu điều khiển", callback_data=f"cmd:menu_fallback{suffix}")]])
         )
@@ -323,17 +379,32 @@ async def setrange_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"❌ Lỗi: {error_end}")
         return
     
-    is_valid, error_msg = validate_range(start_num, end_num)
+    is_valid, error_msg = validate_range(start_num, end_num, max_numbers)
     if not is_valid:
         await update.message.reply_text(f"❌ Lỗi: {error_msg}")
         return
-    
+
+    await _create_game(update, chat_id, start_num, end_num)
+
+
+async def _create_game(
+    update: Update,
+    chat_id: int,
+    start_num: int,
+    end_num: int,
+    segments: Optional[list[tuple[str, float]]] = None,
+):
+    """Tạo session (khoảng số hoặc vòng quay giải thưởng) và thông báo cho chat"""
+    user = update.effective_user
+    user_id = user.id
+
     try:
         session = session_manager.create_session(
             chat_id,
             start_num,
             end_num,
-            DEFAULT_REMOVE_AFTER_SPIN
+            DEFAULT_REMOVE_AFTER_SPIN,
+            segments=segments,
         )
         session.owner_id = user_id
 
@@ -348,11 +419,15 @@ async def setrange_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         suffix = f":{target_chat_id}"
 
         round_name = session.round_name if hasattr(session, 'round_name') else "Không có"
+        if segments is not None:
+            range_line = f"🎡 Vòng quay giải thưởng: `{len(segments)}` ô\n"
+        else:
+            range_line = f"📊 Khoảng số: `{start_num} -> {end_num}`\n"
 
         await update.message.reply_text(
             f"✅ *Đã tạo game mới\\!*\n\n"
             f"🔄 Vòng: `{escape_markdown(round_name)}`\n"
-            f"📊 Khoảng số: `{start_num} -> {end_num}`\n"
+            f"{range_line}"
             f"📊 Tổng số: `{session.get_total_numbers()}`\n"
             f"⚙️ Loại bỏ sau khi quay: `{'Có' if session.remove_after_spin else 'Không'}`\n\n"
             f"Người chơi chọn vé bằng nút bên dưới hoặc `/lay_ve`\\.",
@@ -402,6 +477,22 @@ async def startsession_command(update: Update, context: ContextTypes.DEFAULT_TYP
         )
         return
 
+    # `/bat_dau tron`: sinh trước cả thứ tự rút từ một seed (phát lại được khi cần đối chiếu).
+    # Seed suy ra được mọi số sắp rút nên chỉ công bố mã cam kết; seed công bố khi /ket_thuc
+    args = getattr(context, "args", None) or []
+    shuffled_note = ""
+    if args and args[0].lower() in ("tron", "trộn"):
+        try:
+            seed = session.enable_shuffled_draw()
+            shuffled_note = (
+                "\n\n🔀 Thứ tự số đã được trộn trước. Mã cam kết (SHA-256 của seed):\n"
+                f"`{seed_commitment(seed)}`\n"
+                "Seed sẽ được công bố khi kết thúc game để đối chiếu."
+            )
+        except ValueError as e:
+            await update.message.reply_text(f"⚠️ Không bật được chế độ trộn trước: {e}")
+            return
+
     session.started = True
     session_manager.persist_session(chat_id)
 
@@ -421,6 +512,7 @@ async def startsession_command(update: Update, context: ContextTypes.DEFAULT_TYP
             "• `/quay` để quay số\n"
             "• `/kinh <dãy_số>` để kiểm tra vé"
         )
+    text += shuffled_note
 
     target_chat_id = chat_id
     suffix = f":{target_chat_id}"
@@ -463,30 +555,40 @@ async def endsession_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return
 
+    # Barrier: ghi nốt các lượt quay còn chờ TRƯỚC khi cộng token, lưu kết quả
+    # và ghi lịch sử vòng. Ghi lỗi thì dừng ở đây khi chưa áp dụng gì, để lần
+    # /ket_thuc sau không cộng hai lần
+    try:
+        await session_manager.flush_session(chat_id)
+    except Exception as e:
+        logger.error(f"/ket_thuc chat {chat_id}: không ghi được session: {e}")
+        await update.message.reply_text(
+            "⚠️ Chưa lưu được game xuống cơ sở dữ liệu nên chưa kết thúc. Vui lòng thử lại `/ket_thuc` sau ít phút.",
+            parse_mode='Markdown'
+        )
+        return
+
     game_name = getattr(session, "game_name", None)
-    chat_stats = get_chat_stats(chat_id)
 
     # Đếm số lần tham gia
-    participations = chat_stats["participations"]
     participants = session.get_participants()
     total_players = len(participants)
+    names: dict[int, str] = {}
+    participation_deltas: dict[int, float] = {}
     
     for p in participants:
         uid = p.get("user_id")
         if uid is None: continue
-        name = p.get("name") or str(uid)
-        info = participations.get(uid, {"count": 0.0, "name": name})
-        info["count"] += 1.0
-        info["name"] = name
-        participations[uid] = info
+        names[uid] = p.get("name") or str(uid)
+        participation_deltas[uid] = participation_deltas.get(uid, 0.0) + 1.0
 
     # Tính điểm token theo công thức mới: CHỈ TÍNH KHI CÓ NGƯỜI THẮNG
-    wins = chat_stats["wins"]
     unique_winners = {w.get("user_id"): w.get("name") or str(w.get("user_id")) 
                       for w in getattr(session, "winners", []) if w.get("user_id") is not None}
 
     token_per_winner = 0
     bet_amount = BET_AMOUNT
+    token_deltas: dict[int, float] = {}
 
     if total_players > 0 and unique_winners:
         num_winners = len(unique_winners)
@@ -495,22 +597,23 @@ async def endsession_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         token_per_winner = (total_players * bet_amount / num_winners) - bet_amount
         
         for uid, name in unique_winners.items():
-            info = wins.get(uid, {"count": 0.0, "name": name})
-            info["count"] += token_per_winner
-            info["name"] = name
-            wins[uid] = info
+            names[uid] = name
+            token_deltas[uid] = token_deltas.get(uid, 0.0) + token_per_winner
         
         # Người thua: mất cược
         loser_ids = [p.get("user_id") for p in participants 
                      if p.get("user_id") is not None and p.get("user_id") not in unique_winners]
         
         for uid in loser_ids:
-            p_info = next((p for p in participants if p.get("user_id") == uid), None)
-            name = p_info.get("name") if p_info else str(uid)
-            info = wins.get(uid, {"count": 0.0, "name": name})
-            info["count"] -= bet_amount
-            info["name"] = name
-            wins[uid] = info
+            token_deltas[uid] = token_deltas.get(uid, 0.0) - bet_amount
+
+    # Cập nhật cache RAM + upsert delta xuống DB (không ghi lại cả bảng stats)
+    chat_stats = update_chat_stats(
+        chat_id,
+        {"wins": token_deltas, "participations": participation_deltas},
+        names,
+    )
+    wins = chat_stats["wins"]
 
     # Xây dựng danh sách biến động token ván này
     token_results = []
@@ -545,24 +648,36 @@ async def endsession_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if cumulative_results:
         token_changes_msg += "\n\n🏆 *Tổng Token sau ván này:*\n" + "\n".join(cumulative_results)
 
+    # Đối chiếu mọi vé in sẵn với các số đã quay: vé đủ hàng mà chủ vé chưa kinh
+    unclaimed = [
+        r for r in evaluate_session(session)
+        if r.is_winner and int(r.user_id) not in unique_winners
+    ]
+    if unclaimed:
+        token_changes_msg += "\n\n🔍 *Vé đã đủ hàng nhưng chưa kinh:*\n" + "\n".join(
+            f"   • {escape_markdown(names.get(int(r.user_id), str(r.user_id)))} ({escape_markdown(ticket_display_name(r.code))})"
+            for r in unclaimed
+        )
+
     host_name = user.full_name or (user.username or str(user_id))
     result_data = {
         "game_name": game_name,
         "host_id": user_id,
         "host_name": host_name,
-        "numbers_drawn": list(session.history),
+        # Các số đã quay nằm ở bảng spins, đọc lại theo (chat_id, game_id, seq)
+        "game_id": session.id,
+        "history_base": session.spin_seq - len(session.spin_history),
         "winners": list(getattr(session, "winners", [])),
         "ended_at": datetime.now().isoformat(timespec="seconds"),
     }
+    if session.draw_seed is not None:
+        # Chế độ trộn trước: công bố seed để đối chiếu với mã cam kết lúc /bat_dau
+        result_data["draw_seed"] = session.draw_seed
     last_results[chat_id] = result_data
-    save_stats(chat_id, chat_stats)
-    save_last_result(chat_id, result_data)
+    get_backend().save_last_result(chat_id, result_data)
     
     # Lưu game vào lịch sử vòng chơi
     if chat_id in active_rounds:
-        if chat_id not in round_history:
-            round_history[chat_id] = []
-        
         # Chỉ tính những người thực sự có vé là người tham gia ván này
         ticket_holders = set()
         if hasattr(session, 'user_tickets'):
@@ -581,12 +696,19 @@ async def endsession_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
             "host_name": host_name,
             "winners": list(getattr(session, "winners", [])),
             "participants": actual_participants,
-            "numbers_drawn": len(session.history),
+            "numbers_drawn": len(session.spin_history),
             "ended_at": datetime.now().isoformat(timespec="seconds"),
         }
-        round_history[chat_id].append(game_record)
+        record_round_game(chat_id, game_record)
     
+    auto_spin_scheduler.stop(chat_id)
+    # Token/kết quả đã ghi: luôn xoá session để /ket_thuc lại không áp dụng lần nữa.
+    # Lệnh xoá ghi lỗi vẫn nằm trong hàng đợi và được ghi lại ở lần flush sau
     session_manager.delete_session(chat_id)
+    try:
+        await session_manager.flush()
+    except Exception as e:
+        logger.error(f"/ket_thuc chat {chat_id}: chưa xoá được session khỏi DB: {e}")
 
     target_chat_id = chat_id
     suffix = f":{target_chat_id}"
@@ -595,6 +717,11 @@ async def endsession_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
           "🛑 *Đã kết thúc game hiện tại\\!* \n\n"
     msg += "Bạn có thể tạo ván chơi mới hoặc vòng mới bằng nút bên dưới\\."
     msg += token_changes_msg
+    if "draw_seed" in result_data:
+        msg += (
+            f"\n\n🔀 Seed thứ tự trộn: `{result_data['draw_seed']}`"
+            f"\nMã cam kết: `{seed_commitment(result_data['draw_seed'])}`"
+        )
 
     await update.message.reply_text(
         msg, 
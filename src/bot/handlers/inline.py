@@ -43,30 +43,14 @@ async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYP
             for chat_id, session in active_sessions:
                 game_name = getattr(session, "game_name", "Loto")
                 
-                # Logic check số
-                found = []
-                missing = []
-                invalid = []
-                
-                # History (các số đã ra)
-                drawn_numbers = set()
-                if session.history:
-                    for item in session.history:
-                        drawn_numbers.add(item.get("number"))
-                
                 ticket_code = session.user_tickets.get(user.id)
                 ticket_name = TICKET_DISPLAY_NAMES.get(ticket_code, "Vé tự chọn") if ticket_code else "Vé tự do"
 
-                for arg in args:
-                    if arg.isdigit():
-                        num = int(arg)
-                        # Validate range? (Tạm bỏ qua range check chặt chẽ, chỉ check kết quả)
-                        if num in drawn_numbers:
-                            found.append(num)
-                        else:
-                            missing.append(num)
-                    else:
-                        invalid.append(arg)
+                # Logic check số (so với chỉ mục số đã ra của session, không quét history)
+                # Validate range? (Tạm bỏ qua range check chặt chẽ, chỉ check kết quả)
+                numbers = [int(arg) for arg in args if arg.isdigit()]
+                invalid = [arg for arg in args if not arg.isdigit()]
+                found, missing = session.match(numbers)
                 
                 # Tạo nội dung trả về
                 result_text = f"🧾 *KINH! - {game_name}*\n"
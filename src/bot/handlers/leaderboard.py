@@ -1,8 +1,10 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from src.bot.utils import escape_markdown, get_chat_stats, session_manager
-from src.bot.constants import round_history, active_rounds
-from src.db.sqlite_store import save_stats
+from src.bot.utils import (
+    escape_markdown, get_chat_stats, session_manager, reset_chat_stats, remove_user_stats,
+    get_round_ledger
+)
+from src.bot.constants import active_rounds
 import logging
 
 
@@ -90,14 +92,13 @@ async def leaderboard_round_command(update: Update, context: ContextTypes.DEFAUL
     round_info = active_rounds[chat_id]
     round_name = round_info.get("round_name", "Hiện tại")
     
-    games = round_history.get(chat_id, [])
-    if not games:
+    user_tokens = get_round_ledger(chat_id)
+    if not user_tokens:
         await update.message.reply_text("ℹ️ Chưa có game nào kết thúc trong vòng này.")
         return
         
-    # Tính toán và lấy text BXH
-    from src.bot.utils import calculate_round_tokens, get_round_leaderboard_text
-    user_tokens = calculate_round_tokens(games)
+    # Lấy text BXH từ sổ token của vòng
+    from src.bot.utils import get_round_leaderboard_text
     message = get_round_leaderboard_text(round_name, user_tokens)
     
     target_chat_id = chat_id
@@ -119,10 +120,7 @@ async def show_user_token_command(update: Update, context: ContextTypes.DEFAULT_
     if chat_id in active_rounds:
         round_info = active_rounds[chat_id]
         round_name = round_info.get("round_name", "Hiện tại")
-        games = round_history.get(chat_id, [])
-        
-        from src.bot.utils import calculate_round_tokens
-        user_tokens = calculate_round_tokens(games)
+        user_tokens = get_round_ledger(chat_id)
         
         if not user_tokens:
             await update.message.reply_text(
@@ -182,12 +180,9 @@ async def reset_token_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     # Trong các command khác, owner_id thường được check.
     # Nhưng user yêu cầu reset_token, ta cứ thực hiện.
     
-    chat_stats = get_chat_stats(chat_id)
-    chat_stats["wins"] = {}
     # Giữ lại participations nếu chỉ muốn reset token? 
     # User nói "clear token", nên ta chỉ clear wins.
-    
-    save_stats(chat_id, chat_stats)
+    reset_chat_stats(chat_id, "wins")
     
     await update.message.reply_text(
         "✨ *Đã đặt lại toàn bộ Token về 0\\!*",
@@ -241,17 +236,8 @@ async def xoa_token_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    chat_stats = get_chat_stats(chat_id)
-    wins = chat_stats.get("wins", {})
-    
-    if str(target_user_id) in wins or target_user_id in wins:
-        # Xóa khỏi bảng xếp hạng tổng
-        if str(target_user_id) in wins:
-            del wins[str(target_user_id)]
-        if target_user_id in wins:
-            del wins[target_user_id]
-            
-        save_stats(chat_id, chat_stats)
+    # Xóa khỏi bảng xếp hạng tổng (cache RAM + DB)
+    if remove_user_stats(chat_id, target_user_id, "wins"):
         await update.message.reply_text(
             f"✅ Đã đặt lại Token của {escape_markdown(target_name or str(target_user_id))} về `0.0`.",
             parse_mode='Markdown'
@@ -3,13 +3,20 @@ import logging
 from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from src.bot.constants import COOLDOWN_SPIN_SECONDS, COOLDOWN_CHECK_SECONDS, last_results, WAITING_RESPONSES, SPIN_HEADERS
+from src.bot.constants import (
+    COOLDOWN_SPIN_SECONDS, COOLDOWN_CHECK_SECONDS, last_results, WAITING_RESPONSES, SPIN_HEADERS,
+    MAX_SPINS_PER_COMMAND, MULTI_SPIN_BUTTON_COUNT, STATUS_MAX_LISTED,
+)
 from src.bot.utils import (
     escape_markdown, session_manager, ensure_active_session, 
-    get_chat_stats, get_last_result_for_chat
+    get_chat_stats, get_last_result_for_chat, auto_spin_scheduler, ticket_display_name
 )
-from src.bot.wheel import spin_wheel
+from src.bot.wheel import spin_wheel_many
 from src.utils.validators import validate_number
+from src.models.ticket_layouts import ticket_row
+from src.models.ticket_eval import is_winning_claim
+from src.models.draw_pool import seed_commitment
+from src.db.backends import get_backend
 
 logger = logging.getLogger(__name__)
 
@@ -17,8 +24,126 @@ logger = logging.getLogger(__name__)
 last_spin_time: dict[int, datetime] = {}
 last_check_time: dict[tuple[int, int], datetime] = {}
 
+def _emoji_digits(number: int) -> str:
+    """Convert số sang Emoji Keycap (0️⃣, 1️⃣...)"""
+    emoji_map = {
+        '0': '0️⃣', '1': '1️⃣', '2': '2️⃣', '3': '3️⃣', '4': '4️⃣',
+        '5': '5️⃣', '6': '6️⃣', '7': '7️⃣', '8': '8️⃣', '9': '9️⃣'
+    }
+    return "".join(emoji_map.get(d, d) for d in str(number))
+
+
+def _pop_waiter_mentions(session, numbers: list[int]) -> list[str]:
+    """Lấy (và xoá) người đang đợi các số vừa quay, mỗi số một dòng tag."""
+    lines = []
+    waiting = getattr(session, 'waiting_numbers', {})
+    for number in numbers:
+        waiters = waiting.pop(number, None)
+        if not waiters:
+            continue
+        mentions_str = ", ".join(f"[{escape_markdown(name)}](tg://user?id={uid})" for uid, name in waiters)
+        response_template = random.choice(WAITING_RESPONSES)
+        lines.append(response_template.format(number=number, mentions=mentions_str))
+    return lines
+
+
+def _ticket_row_mentions(session, numbers: list[int]) -> list[str]:
+    """Báo người giữ vé có hàng vừa đủ số (xác nhận bằng /kinh hoặc nút Kinh)."""
+    lines = []
+    names = {p.get("user_id"): p.get("name") for p in getattr(session, "participants", [])}
+    for code, row in session.completed_ticket_rows(numbers):
+        user_id = session.tickets[code]
+        name = names.get(user_id) or str(user_id)
+        row_text = " ".join(f"`{n}`" for n in ticket_row(code, row))
+        lines.append(
+            f"🔔 [{escape_markdown(name)}](tg://user?id={user_id}) - vé {escape_markdown(ticket_display_name(code))} "
+            f"đã đủ hàng {row_text}! Gõ /kinh để xác nhận."
+        )
+    return lines
+
+
+async def send_spin_result(bot, chat_id: int, session, numbers: list[int]) -> None:
+    """
+    Gửi kết quả các lượt vừa quay và bảng điều khiển mới, rồi persist session.
+
+    Một số: tin emoji số to + tin thống kê như cũ. Nhiều số (/quay N): gộp vào
+    một tin duy nhất, tag mọi người đợi số trong cùng tin đó.
+    """
+    suffix = f":{chat_id}"
+
+    # Xoá bảng điều khiển cũ nếu có để "nhảy" xuống dưới
+    if getattr(session, 'last_control_message_id', None):
+        try:
+            await bot.delete_message(chat_id=chat_id, message_id=session.last_control_message_id)
+        except Exception:
+            pass # Bỏ qua nếu tin nhắn quá cũ hoặc đã bị xoá
+
+    if len(numbers) == 1:
+        # 1. Gửi TOÀN BỘ chuỗi digit emoji trong 1 tin nhắn để hiện to (Big Emoji)
+        await bot.send_message(chat_id=chat_id, text=_emoji_digits(numbers[0]))
+
+    # 2. Phần thống kê và nút bấm (Header + Gần đây)
+    header_text = random.choice(SPIN_HEADERS)
+    stats_msg =  "╔════════════════════╗\n"
+    if len(numbers) == 1:
+        stats_msg += f"   {header_text} `{numbers[0]}`\n"
+        if session.segments is not None:
+            # Vòng quay giải thưởng: kèm nhãn của ô vừa quay
+            stats_msg += f"   🎁 *{escape_markdown(session.segment_label(numbers[0]))}*\n"
+    else:
+        stats_msg += f"   {header_text} ({len(numbers)} số)\n"
+    stats_msg += "╚════════════════════╝\n"
+
+    if len(numbers) > 1 and session.segments is not None:
+        stats_msg += "🎯 " + " ➜ ".join(f"`{n}` {escape_markdown(session.segment_label(n))}" for n in numbers) + "\n\n"
+    elif len(numbers) > 1:
+        stats_msg += "🎯 " + " ➜ ".join(f"`{n}`" for n in numbers) + "\n\n"
+    else:
+        # Hiển thị lịch sử gần đây
+        drawn_numbers = session.spin_history.recent_numbers(5)
+        if drawn_numbers:
+            stats_msg += "📜 *Gần đây:*\n"
+            for num in reversed(drawn_numbers):
+                stats_msg += f"   • `{num}`\n"
+            stats_msg += "\n"
+
+    # Kiểm tra và tag người đang đợi các số này
+    for response in _pop_waiter_mentions(session, numbers):
+        stats_msg += f"{response}\n\n"
+
+    # Vé in sẵn có hàng vừa đủ số: nhắc người giữ vé kinh
+    ticket_lines = _ticket_row_mentions(session, numbers)
+    for line in ticket_lines:
+        stats_msg += f"{line}\n\n"
+
+    stats_msg += f"📊 Còn lại: `{session.get_remaining_count()}/{session.get_total_numbers()}`"
+
+    keyboard = [
+        [InlineKeyboardButton("🎲 Quay tiếp", callback_data=f"cmd:quay{suffix}"),
+         InlineKeyboardButton(f"🎲 Quay {MULTI_SPIN_BUTTON_COUNT}", callback_data=f"cmd:quay_{MULTI_SPIN_BUTTON_COUNT}{suffix}"),
+         InlineKeyboardButton("📜 Các số đã ra", callback_data=f"cmd:trang_thai{suffix}")]
+    ]
+    if session.is_empty():
+        stats_msg += "\n\n⚠️ Danh sách đã hết\\! Sử dụng `/reset` để làm mới\\."
+        keyboard = [[InlineKeyboardButton("🔄 Reset số", callback_data=f"cmd:dat_lai{suffix}")]]
+
+    if ticket_lines:
+        keyboard.append([InlineKeyboardButton("🏆 Kinh ngay", callback_data=f"cmd:kinh{suffix}")])
+    keyboard.append([InlineKeyboardButton("🧾 Kiểm tra vé (/kinh)", switch_inline_query_current_chat="kinh ")])
+    keyboard.append([
+        InlineKeyboardButton("🛑 Kết thúc Game", callback_data=f"cmd:ket_thuc{suffix}"),
+        InlineKeyboardButton("🕹️ Game mới", callback_data=f"cmd:moi_input{suffix}")
+    ])
+
+    # Gửi message thống kê và nút điều khiển
+    sent_msg = await bot.send_message(chat_id=chat_id, text=stats_msg, parse_mode='Markdown', reply_markup=InlineKeyboardMarkup(keyboard))
+    session.last_control_message_id = sent_msg.message_id
+
+    session_manager.persist_session(chat_id)
+
+
 async def spin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handler cho lệnh /quay"""
+    """Handler cho lệnh /quay và /quay N (quay N số một lần)"""
     chat_id = update.effective_chat.id
     session = session_manager.get_session(chat_id)
     
@@ -40,86 +165,20 @@ async def spin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode='Markdown'
         )
         return
+
+    count = 1
+    args = getattr(context, "args", None) or []
+    if args:
+        is_valid, count, error = validate_number(args[0])
+        if not is_valid or not 1 <= count <= MAX_SPINS_PER_COMMAND:
+            await update.message.reply_text(f"❌ Dùng `/quay` hoặc `/quay N` với N từ 1 đến {MAX_SPINS_PER_COMMAND}.", parse_mode='Markdown')
+            return
     
     try:
         # Phát sinh số và hiển thị kết quả ngay
-        number = spin_wheel(session)
+        numbers = spin_wheel_many(session, count)
         last_spin_time[chat_id] = now
-        
-        target_chat_id = chat_id
-        suffix = f":{target_chat_id}"
-
-        # Hiển thị kết quả
-        drawn_numbers = [item.get("number") for item in session.history[-5:]]
-        
-        # Convert số sang Emoji Keycap (0️⃣, 1️⃣...)
-        def get_emoji_digit(d):
-            emoji_map = {
-                '0': '0️⃣', '1': '1️⃣', '2': '2️⃣', '3': '3️⃣', '4': '4️⃣',
-                '5': '5️⃣', '6': '6️⃣', '7': '7️⃣', '8': '8️⃣', '9': '9️⃣'
-            }
-            return emoji_map.get(d, d)
-
-        # 1. Gửi TOÀN BỘ chuỗi digit emoji trong 1 tin nhắn để hiện to (Big Emoji)
-        str_num = str(number)
-        full_emoji_str = "".join(get_emoji_digit(d) for d in str_num)
-        
-        # Xoá bảng điều khiển cũ nếu có để "nhảy" xuống dưới
-        if getattr(session, 'last_control_message_id', None):
-            try:
-                await context.bot.delete_message(chat_id=chat_id, message_id=session.last_control_message_id)
-            except Exception:
-                pass # Bỏ qua nếu tin nhắn quá cũ hoặc đã bị xoá
-
-        await context.bot.send_message(chat_id=chat_id, text=full_emoji_str)
-        
-        # 2. Phần thống kê và nút bấm (Header + Gần đây)
-        header_text = random.choice(SPIN_HEADERS)
-        stats_msg =  "╔════════════════════╗\n"
-        stats_msg += f"   {header_text} `{number}`\n"
-        stats_msg += "╚════════════════════╝\n"
-        
-        # Hiển thị lịch sử gần đây
-        if drawn_numbers:
-            stats_msg += "📜 *Gần đây:*\n"
-            for num in reversed(drawn_numbers):
-                stats_msg += f"   • `{num}`\n"
-            stats_msg += "\n"
-        
-        # Kiểm tra và tag người đang đợi số này
-        if hasattr(session, 'waiting_numbers') and number in session.waiting_numbers:
-            waiters = session.waiting_numbers.pop(number)
-            if waiters:
-                mentions = []
-                for uid, name in waiters:
-                    mentions.append(f"[{escape_markdown(name)}](tg://user?id={uid})")
-                
-                mentions_str = ", ".join(mentions)
-                response_template = random.choice(WAITING_RESPONSES)
-                response = response_template.format(number=number, mentions=mentions_str)
-                stats_msg += f"{response}\n\n"
-        
-        stats_msg += f"📊 Còn lại: `{session.get_remaining_count()}/{session.get_total_numbers()}`"
-        
-        keyboard = [
-            [InlineKeyboardButton("🎲 Quay tiếp", callback_data=f"cmd:quay{suffix}"),
-             InlineKeyboardButton("📜 Các số đã ra", callback_data=f"cmd:trang_thai{suffix}")]
-        ]
-        if session.is_empty():
-            stats_msg += "\n\n⚠️ Danh sách đã hết\\! Sử dụng `/reset` để làm mới\\."
-            keyboard = [[InlineKeyboardButton("🔄 Reset số", callback_data=f"cmd:dat_lai{suffix}")]]
-        
-        keyboard.append([InlineKeyboardButton("🧾 Kiểm tra vé (/kinh)", switch_inline_query_current_chat="kinh ")])
-        keyboard.append([
-            InlineKeyboardButton("🛑 Kết thúc Game", callback_data=f"cmd:ket_thuc{suffix}"),
-            InlineKeyboardButton("🕹️ Game mới", callback_data=f"cmd:moi_input{suffix}")
-        ])
-
-        # Gửi message thống kê và nút điều khiển
-        sent_msg = await context.bot.send_message(chat_id=chat_id, text=stats_msg, parse_mode='Markdown', reply_markup=InlineKeyboardMarkup(keyboard))
-        session.last_control_message_id = sent_msg.message_id
-        
-        session_manager.persist_session(chat_id)
+        await send_spin_result(context.bot, chat_id, session, numbers)
     except ValueError as e:
         await update.message.reply_text(f"❌ {str(e)}")
 
@@ -133,10 +192,18 @@ async def reset_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     from src.bot.wheel import reset_session
+    old_seed = session.draw_seed
     reset_session(session)
     session_manager.persist_session(chat_id)
 
-    await update.message.reply_text("🔄 *Đã làm mới danh sách số quay\\!* \n\nGiờ bạn có thể bắt đầu quay từ đầu.", parse_mode='Markdown')
+    msg = "🔄 *Đã làm mới danh sách số quay\\!* \n\nGiờ bạn có thể bắt đầu quay từ đầu."
+    if old_seed is not None:
+        # Chế độ trộn trước: thứ tự cũ đã bỏ nên công bố seed cũ, thứ tự mới chỉ công bố mã cam kết
+        msg += (
+            f"\n\n🔀 Seed của lượt trước: `{old_seed}`"
+            f"\nMã cam kết của thứ tự mới: `{seed_commitment(session.draw_seed)}`"
+        )
+    await update.message.reply_text(msg, parse_mode='Markdown')
 
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler cho lệnh /trang_thai"""
@@ -147,16 +214,20 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ *Chưa có game nào đang chạy\\!*", parse_mode='Markdown')
         return
     
-    drawn = [item.get("number") for item in session.history]
+    drawn = session.drawn_sorted()
     total = session.get_total_numbers()
     remaining = session.get_remaining_count()
+    # Khoảng lớn (/xo_so) có thể đã quay rất nhiều số: chỉ liệt kê một phần
+    listed = ", ".join(f"`{n}`" for n in drawn[:STATUS_MAX_LISTED])
+    if len(drawn) > STATUS_MAX_LISTED:
+        listed += f" … (+{len(drawn) - STATUS_MAX_LISTED} số)"
     
     msg = (
         f"📊 *Trạng thái game hiện tại:*\n\n"
         f"🕹️ Game: `{escape_markdown(getattr(session, 'game_name', 'Không tên'))}`\n"
         f"🔄 Vòng: `{escape_markdown(getattr(session, 'round_name', 'Không có'))}`\n"
         f"🔢 Đã quay: `{total - remaining}` / `{total}` số\n"
-        f"🎯 Các số đã ra: " + (", ".join(f"`{n}`" for n in sorted(drawn)) if drawn else "_Chưa có_")
+        f"🎯 Các số đã ra: " + (listed if drawn else "_Chưa có_")
     )
     target_chat_id = chat_id
     suffix = f":{target_chat_id}"
@@ -187,7 +258,7 @@ async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     session = session_manager.get_session(chat_id)
 
-    if not session or not session.history:
+    if not session or not session.spin_history:
         target_chat_id = chat_id
         suffix = f":{target_chat_id}"
         await update.message.reply_text(
@@ -200,16 +271,16 @@ async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     lines = []
-    for idx, item in enumerate(session.history, start=1):
-        num = item.get("number")
-        time_str = item.get("time", "").split("T")[-1] # Lấy giờ:phút:giây
+    for idx, record in enumerate(session.spin_history, start=1):
+        num = record.number
+        time_str = record.time.split("T")[-1] # Lấy giờ:phút:giây
         lines.append(f"{idx}. Số `{num}` _({time_str})_")
 
     target_chat_id = chat_id
     suffix = f":{target_chat_id}"
 
     await update.message.reply_text(
-        f"📜 *Lịch sử quay số ({len(session.history)} lượt):*\n\n" + "\n".join(lines),
+        f"📜 *Lịch sử quay số ({len(session.spin_history)} lượt):*\n\n" + "\n".join(lines),
         parse_mode='Markdown',
         reply_markup=InlineKeyboardMarkup([
             [InlineKeyboardButton("🎲 Quay tiếp", callback_data=f"cmd:quay{suffix}"),
@@ -220,6 +291,7 @@ async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def clear_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler cho lệnh /xoa - xoá hoàn toàn session"""
     chat_id = update.effective_chat.id
+    auto_spin_scheduler.stop(chat_id)
     session_manager.delete_session(chat_id)
     target_chat_id = chat_id
     suffix = f":{target_chat_id}"
@@ -249,11 +321,18 @@ async def lastresult_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     game_name = data.get("game_name") or "Không đặt tên"
     host_name = data.get("host_name") or "Host"
     ended_at = data.get("ended_at") or ""
-    numbers_drawn = data.get("numbers_drawn") or []
+    numbers_drawn = data.get("numbers_drawn")
     winners = data.get("winners") or []
 
-    drawn_list = [item.get("number") for item in numbers_drawn if item.get("number") is not None]
-    total_spins = len(drawn_list)
+    if numbers_drawn is None and data.get("game_id"):
+        # Đọc theo index từ bảng spins, chỉ lấy 20 lượt gần nhất
+        since_seq = data.get("history_base", 0)
+        total_spins = get_backend().count_spins(chat_id, data["game_id"], since_seq)
+        drawn_list = [item["number"] for item in get_backend().load_spins(chat_id, data["game_id"], since_seq, limit=20)]
+    else:
+        # Kết quả cũ còn lưu nguyên danh sách số đã quay
+        drawn_list = [item.get("number") for item in (numbers_drawn or []) if item.get("number") is not None]
+        total_spins = len(drawn_list)
     numbers_str = ", ".join(f"`{n}`" for n in drawn_list[-20:]) if drawn_list else "_Chưa quay số nào_"
     if total_spins > 20: numbers_str = f"... , {numbers_str}"
 
@@ -275,6 +354,12 @@ async def lastresult_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     else:
         msg += "🏆 *Không có ai trúng thưởng\\.*\n"
 
+    if data.get("draw_seed") is not None:
+        msg += (
+            f"\n🔀 Seed thứ tự trộn: `{data['draw_seed']}`"
+            f"\nMã cam kết: `{seed_commitment(data['draw_seed'])}`\n"
+        )
+
     target_chat_id = chat_id
     suffix = f":{target_chat_id}"
 
@@ -355,16 +440,20 @@ async def check_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("🎟️ *Bạn cần lấy vé trước khi chơi!*", parse_mode='Markdown')
         return
 
-    if not context.args:
-        await update.message.reply_text("❌ *Sai cú pháp!* /kinh <danh_sách_số>", parse_mode='Markdown')
-        return
+    args = getattr(context, "args", None) or []
+    if not args:
+        # Không nhập số: dùng hàng đủ số trên vé in sẵn của người chơi (nếu có)
+        code = user_tickets[user.id]
+        row = session.row_tracker.first_complete_row(code)
+        if row is None:
+            await update.message.reply_text("❌ *Sai cú pháp!* /kinh <danh_sách_số>", parse_mode='Markdown')
+            return
+        args = [str(n) for n in ticket_row(code, row)]
 
-    raw_text = " ".join(context.args)
+    raw_text = " ".join(args)
     for ch in [",", ";", "|"]: raw_text = raw_text.replace(ch, " ")
     tokens = [t for t in raw_text.split() if t.strip()]
 
-    drawn_numbers = {item.get("number") for item in session.history}
-    remaining_numbers = set(session.available_numbers)
 
     matched, not_drawn, invalid = [], [], []
 
@@ -372,14 +461,14 @@ async def check_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         is_valid, number, error = validate_number(token)
         if not is_valid or number < session.start_number or number > session.end_number:
             invalid.append(token)
-        elif number in drawn_numbers:
+        elif session.is_drawn(number):
             matched.append(number)
-        elif number in remaining_numbers:
+        elif session.is_available(number):
             not_drawn.append(number)
         else:
             invalid.append(token)
 
-    is_winner = len(set(matched)) >= 5 and not not_drawn and not invalid
+    is_winner = is_winning_claim(matched, not_drawn, invalid)
     lines = []
     if matched: lines.append(f"✅ *Số đã quay*: " + ", ".join(f"`{n}`" for n in sorted(set(matched))))
     if not_drawn: lines.append(f"⭕ *Số chưa quay*: " + ", ".join(f"`{n}`" for n in sorted(set(not_drawn))))
@@ -391,6 +480,8 @@ async def check_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not hasattr(session, "winners"): session.winners = []
         session.winners.append({"user_id": user.id, "name": display_name, "numbers": winner_set, "time": now.isoformat(timespec="seconds")})
         session_manager.persist_session(chat_id)
+        if auto_spin_scheduler.stop(chat_id):
+            lines.append("⏸️ Đã tắt tự động quay.")
         lines.append(f"\n🏆 *Chúc mừng* {escape_markdown(display_name)} *!* \nVé trúng thưởng: " + ", ".join(f"`{n}`" for n in winner_set))
 
     target_chat_id = chat_id
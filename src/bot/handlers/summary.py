@@ -1,8 +1,8 @@
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from src.bot.utils import escape_markdown, session_manager, get_chat_stats
-from src.bot.constants import active_rounds, round_history, BET_AMOUNT
+from src.bot.utils import escape_markdown, session_manager, get_chat_stats, get_round_games
+from src.bot.constants import active_rounds, BET_AMOUNT
 
 logger = logging.getLogger(__name__)
 
@@ -25,7 +25,7 @@ async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     created_at = round_info.get("created_at", "Không rõ")
     
     # Lấy lịch sử các game trong vòng
-    games = round_history.get(chat_id, [])
+    games = get_round_games(chat_id)
     
     if not games:
         await update.message.reply_text(
@@ -27,12 +27,6 @@ async def wait_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         invalid_list = []
         already_drawn = []
         
-        # Lấy danh sách số đã xổ
-        drawn_numbers = set()
-        if session.history:
-            for item in session.history:
-                drawn_numbers.add(item.get("number"))
-        
         for arg in args:
             if arg.isdigit():
                 num = int(arg)
@@ -41,7 +35,7 @@ async def wait_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     continue
                     
                 # Kiểm tra xem số đã quay chưa
-                if num in drawn_numbers:
+                if session.is_drawn(num):
                     already_drawn.append(num)
                     continue
                     
@@ -0,0 +1,182 @@
+"""
+Cache LRU + TTL cho các session trong RAM của SessionManager.
+
+Mỗi chat giữ (session, lần truy cập cuối) trong một OrderedDict theo thứ tự
+truy cập, nên cả LRU lẫn TTL đều chỉ cần xét từ đầu danh sách: vượt
+`max_size` thì bỏ chat ít dùng nhất, chat không được truy cập quá `ttl` giây
+thì bị bỏ khi gọi `expire()`. Trước khi bỏ, cache gọi `on_evict(chat_id,
+session)`; hàm này ghi session xuống DB nếu cần và có thể trả về False để giữ
+lại chat (vd: đang được ghi dở).
+"""
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from ..models.wheel_session import WheelSession
+
+# Số session lấy mẫu khi ước lượng bộ nhớ
+MEMORY_SAMPLE_SIZE = 32
+
+
+def _deep_sizeof(obj: Any, seen: set) -> int:
+    """Ước lượng số byte của obj và các object nó giữ (bỏ qua object đã đếm)."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool, array)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(_deep_sizeof(item, seen) for item in obj)
+    if hasattr(obj, "__dict__"):
+        size += _deep_sizeof(vars(obj), seen)
+    for name in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, name):
+            size += _deep_sizeof(getattr(obj, name), seen)
+    return size
+
+
+class SessionCache:
+    """Các session đang giữ trong RAM, giới hạn theo số lượng và thời gian rảnh."""
+
+    def __init__(
+        self,
+        max_size: int = 0,
+        ttl: float = 0,
+        on_evict: Optional[Callable[[int, WheelSession], bool]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_size: Số session tối đa (0 = không giới hạn)
+            ttl: Số giây rảnh tối đa trước khi bị bỏ (0 = không hết hạn)
+            on_evict: Gọi trước khi bỏ một chat; trả về False để giữ lại
+            clock: Hàm thời gian (thay được trong test)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._on_evict = on_evict
+        self._clock = clock
+        # chat_id -> [session, lần truy cập cuối], cũ nhất ở đầu
+        self._entries: "OrderedDict[int, list]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.refused = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, chat_id: object) -> bool:
+        return chat_id in self._entries
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._entries))
+
+    def items(self) -> list[tuple[int, WheelSession]]:
+        return [(chat_id, entry[0]) for chat_id, entry in self._entries.items()]
+
+    def configure(self, max_size: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        """Đổi giới hạn (vd: theo biến môi trường khi khởi động) và áp dụng ngay."""
+        if max_size is not None:
+            self.max_size = max_size
+        if ttl is not None:
+            self.ttl = ttl
+        self.expire()
+        self._shrink()
+
+    def get(self, chat_id: int) -> Optional[WheelSession]:
+        """Lấy session và đánh dấu vừa dùng (đếm hit/miss)."""
+        entry = self._entries.get(chat_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry[1] = self._clock()
+        self._entries.move_to_end(chat_id)
+        return entry[0]
+
+    def peek(self, chat_id: int) -> Optional[WheelSession]:
+        """Lấy session mà không đổi thứ tự LRU và không đếm (dùng khi ghi DB)."""
+        entry = self._entries.get(chat_id)
+        return entry[0] if entry is not None else None
+
+    def put(self, chat_id: int, session: WheelSession) -> None:
+        """Thêm/thay session của chat, rồi bỏ bớt chat cũ nếu vượt max_size."""
+        self._entries[chat_id] = [session, self._clock()]
+        self._entries.move_to_end(chat_id)
+        self._shrink()
+
+    def pop(self, chat_id: int) -> Optional[WheelSession]:
+        """Bỏ chat khỏi cache mà không gọi on_evict (vd: session đã bị xoá)."""
+        entry = self._entries.pop(chat_id, None)
+        return entry[0] if entry is not None else None
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _evict(self, chat_id: int) -> bool:
+        session = self._entries[chat_id][0]
+        if self._on_evict is not None and not self._on_evict(chat_id, session):
+            # Giữ lại, coi như vừa dùng để lần sau thử chat khác trước
+            self.refused += 1
+            self._entries[chat_id][1] = self._clock()
+            self._entries.move_to_end(chat_id)
+            return False
+        del self._entries[chat_id]
+        return True
+
+    def _shrink(self) -> None:
+        if not self.max_size:
+            return
+        # Mỗi chat chỉ thử một lần, tránh lặp mãi khi mọi chat đều bị từ chối
+        for _ in range(len(self._entries)):
+            if len(self._entries) <= self.max_size:
+                return
+            if self._evict(next(iter(self._entries))):
+                self.evictions += 1
+
+    def expire(self) -> int:
+        """Bỏ các chat rảnh quá ttl giây (chỉ xét từ đầu danh sách). Trả về số chat đã bỏ."""
+        if not self.ttl:
+            return 0
+        deadline = self._clock() - self.ttl
+        expired = 0
+        for _ in range(len(self._entries)):
+            chat_id, entry = next(iter(self._entries.items()))
+            if entry[1] > deadline:
+                break
+            if self._evict(chat_id):
+                expired += 1
+        self.expirations += expired
+        return expired
+
+    def memory_estimate(self, sample: int = MEMORY_SAMPLE_SIZE) -> int:
+        """Ước lượng số byte các session đang giữ (lấy mẫu các chat dùng gần nhất)."""
+        if not self._entries:
+            return 0
+        sessions = [entry[0] for entry in list(reversed(self._entries.values()))[:sample]]
+        per_session = sum(_deep_sizeof(s, set()) for s in sessions) / len(sessions)
+        return int(per_session * len(self._entries))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Các bộ đếm của cache (kèm ước lượng bộ nhớ)."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "refused": self.refused,
+            "memory_bytes": self.memory_estimate(),
+        }
@@ -1,58 +1,185 @@
 """
 Quản lý wheel sessions cho Telegram bot (theo từng chat).
 
-Session được lưu trong bộ nhớ và có thể đồng bộ xuống SQLite thông qua
-`src.db.sqlite_store`.
+Session được lưu trong bộ nhớ và đồng bộ xuống backend lưu trữ
+(`src.db.backends`, mặc định là SQLite). Việc ghi đi qua hàng đợi
+write-behind (`src.db.write_behind`) để không chặn event loop.
+
+Cache RAM có giới hạn (`SessionCache`: LRU + thời gian rảnh tối đa): session
+bị bỏ khỏi cache được ghi xuống DB trước nếu còn thay đổi, lần `get_session`
+sau sẽ tự tải lại.
+
+Chỉ mục ngược user_id -> các chat có game đang chạy mà user tham gia (cho
+inline `@bot kinh ...`) được cập nhật qua `WheelSession.on_members_changed`
+khi thêm/bớt người chơi hoặc bắt đầu game, và khi session vào/ra khỏi cache.
+
+Chat đã biết là không có session (tra DB không thấy, hoặc vừa xoá) được nhớ
+trong cache âm, nên nhóm không có game gọi /moi, /menu... liên tục không chạm
+DB; `create_session` xoá mục tương ứng. Warm start (`preload`) thì ngược lại:
+bỏ qua chat đang nằm trong cache âm, vì mục âm mới hơn bản vừa tải từ DB
+(vd: game kết thúc trong lúc đang tải).
 """
-from typing import Dict, Optional
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
 from ..models.wheel_session import WheelSession
-from src.db.sqlite_store import load_session, save_session, delete_session_row
+from src.bot.constants import (
+    PERSIST_FLUSH_INTERVAL_SECONDS, PERSIST_MAX_DIRTY,
+    SESSION_CACHE_MAX_SIZE, SESSION_CACHE_TTL_SECONDS, NEGATIVE_CACHE_MAX_SIZE,
+)
+from src.bot.session_cache import SessionCache
+from src.db.backends import StorageBackend, get_backend
+from src.db.sqlite_store import build_session_write
+from src.db.write_behind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+
+def session_write(session: WheelSession, previous: Optional[Dict[str, Any]] = None) -> tuple:
+    """
+    `build_session_write` cho một session: lượt quay mới lấy thẳng từ ring
+    buffer, không dựng lại toàn bộ `history` dạng dict ở mỗi lần persist.
+    """
+    return build_session_write(session.to_dict(include_history=False), previous, session.spin_history)
 
 
 class SessionManager:
     """Quản lý wheel sessions cho nhiều chat"""
     
-    def __init__(self):
-        # Key: chat_id, Value: WheelSession
-        self._sessions: Dict[int, WheelSession] = {}
+    def __init__(
+        self,
+        flush_interval: float = PERSIST_FLUSH_INTERVAL_SECONDS,
+        max_dirty: int = PERSIST_MAX_DIRTY,
+        backend: Optional[StorageBackend] = None,
+        cache_size: int = SESSION_CACHE_MAX_SIZE,
+        cache_ttl: float = SESSION_CACHE_TTL_SECONDS,
+    ):
+        # Backend lưu trữ; None = dùng backend mặc định tại thời điểm gọi
+        self._backend = backend
+        # Cache RAM: chat_id -> WheelSession (LRU + TTL, ghi xuống DB khi bỏ)
+        self._sessions = SessionCache(cache_size, cache_ttl, on_evict=self._on_evict)
+        # Số session bị bỏ khỏi cache phải ghi xuống DB trước
+        self.write_backs = 0
+        # Chỉ mục ngược: user_id -> {chat_id có game đang chạy mà user tham gia}
+        self._user_chats: Dict[int, set[int]] = {}
+        # chat_id -> các user_id đang được đánh chỉ mục cho chat đó
+        self._chat_members: Dict[int, frozenset[int]] = {}
+        # Cache âm: các chat đã biết là không có session (LRU, tối đa NEGATIVE_CACHE_MAX_SIZE)
+        self._absent: "OrderedDict[int, None]" = OrderedDict()
+        self.negative_hits = 0
+        # Các chat được tạo/tải/xoá/bỏ khỏi cache trong lúc warm start đang tải
+        # (None = không có warm start nào đang chạy)
+        self._preload_touched: Optional[set[int]] = None
+        # Trạng thái đã ghi lần trước của mỗi chat, để chỉ ghi phần thay đổi
+        # (vd: một lượt /quay chỉ là cập nhật meta + một dòng spins)
+        self._persisted_state: Dict[int, Dict[str, Any]] = {}
+        # Hàng đợi ghi trễ: gộp các lần persist cùng chat và ghi theo lô
+        self._writer = WriteBehindQueue(
+            snapshot=self._snapshot,
+            writer=self._write_batch,
+            interval=flush_interval,
+            max_dirty=max_dirty,
+        )
+
+    @property
+    def backend(self) -> StorageBackend:
+        return self._backend if self._backend is not None else get_backend()
 
     def get_session(self, chat_id: int) -> Optional[WheelSession]:
         """
         Lấy session của một chat.
-        Ưu tiên lấy từ cache RAM, nếu không có thì thử load từ SQLite.
+        Ưu tiên lấy từ cache RAM, nếu không có thì thử load từ backend.
         """
         session = self._sessions.get(chat_id)
+        # Dọn các chat rảnh quá lâu (sau khi đã đánh dấu chat này vừa dùng)
+        self._sessions.expire()
         if session:
             return session
 
-        data = load_session(chat_id)
+        if chat_id in self._absent:
+            self.negative_hits += 1
+            self._absent.move_to_end(chat_id)
+            return None
+
+        # Đang chờ xoá trong hàng đợi: bản trong DB đã lỗi thời
+        if self._writer.is_pending_delete(chat_id):
+            return None
+
+        data = self.backend.load_session(chat_id)
         if not data:
+            self._mark_absent(chat_id)
             return None
 
         session = WheelSession.from_dict(data)
-        self._sessions[chat_id] = session
+        # DB đang khớp với bản vừa tải
+        _, self._persisted_state[chat_id] = session_write(session)
+        self._cache_put(chat_id, session)
         return session
 
+    def begin_preload(self) -> None:
+        """Gọi trước khi bắt đầu tải warm start: ghi nhận các chat bị đụng tới từ lúc này."""
+        self._preload_touched = set()
+
+    def preload(self, sessions: Dict[int, Dict[str, Any]]) -> int:
+        """
+        Đưa các session đã tải hàng loạt (warm start) vào cache RAM.
+
+        Bỏ qua chat đã có trong cache, đang chờ xoá, đã biết là không có session
+        hoặc bị đụng tới từ `begin_preload`, vì bản đã tải có thể đã lỗi thời
+        (vd: game kết thúc trong lúc đang tải). Trả về số session được thêm.
+        """
+        touched, self._preload_touched = self._preload_touched or set(), None
+        added = 0
+        for chat_id, data in sessions.items():
+            if (
+                chat_id in self._sessions
+                or chat_id in self._absent
+                or chat_id in touched
+                or self._writer.is_pending_delete(chat_id)
+            ):
+                continue
+            session = WheelSession.from_dict(data)
+            _, self._persisted_state[chat_id] = session_write(session)
+            self._cache_put(chat_id, session)
+            added += 1
+        return added
+
+    def _mark_absent(self, chat_id: int) -> None:
+        """Ghi nhớ chat không có session (bỏ mục cũ nhất khi vượt giới hạn)."""
+        self._absent[chat_id] = None
+        self._absent.move_to_end(chat_id)
+        if len(self._absent) > NEGATIVE_CACHE_MAX_SIZE:
+            self._absent.popitem(last=False)
+
     def create_session(
         self,
         chat_id: int,
         start: int,
         end: int,
         remove_after_spin: bool = True,
+        segments: Optional[list[tuple[str, float]]] = None,
     ) -> WheelSession:
-        """Tạo session mới cho một chat và lưu xuống SQLite."""
-        from ..bot.wheel import create_wheel_session
+        """
+        Tạo session mới cho một chat và đưa vào hàng đợi lưu xuống SQLite.
+        Có `segments` thì tạo vòng quay giải thưởng (bỏ qua start/end).
+        """
+        from ..bot.wheel import create_weighted_session, create_wheel_session
 
-        session = create_wheel_session(start, end, remove_after_spin)
-        self._sessions[chat_id] = session
-        save_session(chat_id, session.to_dict())
+        if segments is not None:
+            session = create_weighted_session(segments, remove_after_spin)
+        else:
+            session = create_wheel_session(start, end, remove_after_spin)
+        self._absent.pop(chat_id, None)
+        self._cache_put(chat_id, session)
+        self._writer.mark_dirty(chat_id)
         return session
 
     def delete_session(self, chat_id: int) -> bool:
         """Xóa session của một chat (cả RAM lẫn DB)."""
-        if chat_id in self._sessions:
-            del self._sessions[chat_id]
-        delete_session_row(chat_id)
+        self._untrack(chat_id, self._sessions.pop(chat_id))
+        self._persisted_state.pop(chat_id, None)
+        self._writer.mark_deleted(chat_id)
+        self._mark_absent(chat_id)
         return True
 
     def has_session(self, chat_id: int) -> bool:
@@ -60,32 +187,169 @@ class SessionManager:
         return self.get_session(chat_id) is not None
 
     def persist_session(self, chat_id: int) -> None:
-        """Lưu lại session của chat hiện tại xuống SQLite."""
-        session = self._sessions.get(chat_id)
+        """
+        Đánh dấu session của chat cần lưu xuống SQLite.
+
+        Việc ghi thực tế do task nền thực hiện theo lô; nếu task nền chưa
+        chạy (script, test) thì ghi đồng bộ ngay.
+        """
+        if chat_id in self._sessions:
+            self._writer.mark_dirty(chat_id)
+
+    def _on_evict(self, chat_id: int, session: WheelSession) -> bool:
+        """
+        Trước khi bỏ session khỏi cache: ghi đồng bộ nếu còn thay đổi chưa lưu.
+        Trả về False (giữ lại) nếu chat đang nằm trong lô ghi dở hoặc ghi lỗi.
+        """
+        if self._writer.is_writing(chat_id):
+            return False
+        if self._writer.is_dirty(chat_id):
+            try:
+                self._writer.write_now(chat_id, self._snapshot(chat_id))
+            except Exception as e:
+                logger.error(f"Không ghi được session chat {chat_id} trước khi bỏ khỏi cache: {e}")
+                return False
+            self.write_backs += 1
+        self._persisted_state.pop(chat_id, None)
+        self._untrack(chat_id, session)
+        return True
+
+    def _cache_put(self, chat_id: int, session: WheelSession) -> None:
+        """Đưa session vào cache (thay session cũ của chat nếu có) và đánh chỉ mục."""
+        if self._preload_touched is not None:
+            self._preload_touched.add(chat_id)
+        old = self._sessions.peek(chat_id)
+        if old is not None and old is not session:
+            self._untrack(chat_id, old)
+        session.on_members_changed = lambda s, chat_id=chat_id: self._index(chat_id, s)
+        self._index(chat_id, session)
+        self._sessions.put(chat_id, session)
+
+    def _untrack(self, chat_id: int, session: Optional[WheelSession]) -> None:
+        if self._preload_touched is not None:
+            self._preload_touched.add(chat_id)
         if session is not None:
-            save_session(chat_id, session.to_dict())
+            session.on_members_changed = None
+        self._set_members(chat_id, ())
+
+    def _index(self, chat_id: int, session: WheelSession) -> None:
+        """Cập nhật chỉ mục user -> chat theo người chơi hiện tại của session."""
+        self._set_members(chat_id, session.member_ids() if session.started else ())
+
+    def _set_members(self, chat_id: int, members: Iterable[int]) -> None:
+        new = frozenset(members)
+        old = self._chat_members.get(chat_id, frozenset())
+        if new == old:
+            return
+        for user_id in old - new:
+            chats = self._user_chats[user_id]
+            chats.discard(chat_id)
+            if not chats:
+                del self._user_chats[user_id]
+        for user_id in new - old:
+            self._user_chats.setdefault(user_id, set()).add(chat_id)
+        if new:
+            self._chat_members[chat_id] = new
+        else:
+            self._chat_members.pop(chat_id, None)
+
+    def _snapshot(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        """Chụp phần thay đổi của session để ghi (chạy trên event loop)."""
+        session = self._sessions.peek(chat_id)
+        if session is None:
+            return None
+        write, self._persisted_state[chat_id] = session_write(session, self._persisted_state.get(chat_id))
+        return write
+
+    def _write_batch(self, batch: list) -> None:
+        """Ghi một lô xuống DB; lỗi thì lần sau ghi đầy đủ lại các chat này."""
+        try:
+            self.backend.save_sessions_batch(batch)
+        except Exception:
+            for chat_id, _ in batch:
+                self._persisted_state.pop(chat_id, None)
+            raise
+
+    async def start_writer(self) -> None:
+        """Khởi động task ghi nền (gọi trong post_init của bot)."""
+        await self._writer.start()
+
+    async def stop_writer(self) -> None:
+        """Dừng task ghi nền và flush toàn bộ thay đổi còn lại."""
+        await self._writer.stop()
+
+    async def flush(self) -> None:
+        """Barrier: chờ mọi thay đổi đang chờ được ghi xuống DB."""
+        await self._writer.flush()
+
+    async def flush_session(self, chat_id: int) -> None:
+        """
+        Barrier cho một chat: đánh dấu rồi ghi ngay session (kể cả các lượt
+        quay còn chờ) xuống DB. Ghi lỗi thì ném lại lỗi, session vẫn còn
+        nguyên trong RAM và được ghi lại ở lần sau.
+        """
+        self.persist_session(chat_id)
+        await self.flush()
+
+    def get_writer_stats(self) -> Dict[str, int]:
+        """Các bộ đếm của hàng đợi ghi."""
+        return self._writer.get_stats()
+
+    def configure_cache(self, max_size: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        """Đổi giới hạn cache (số session tối đa, số giây rảnh tối đa; 0 = không giới hạn)."""
+        self._sessions.configure(max_size, ttl)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Bộ đếm hit/miss/eviction của cache, số lần ghi khi bỏ và ước lượng bộ nhớ."""
+        stats = self._sessions.get_stats()
+        stats["write_backs"] = self.write_backs
+        stats["negative_size"] = len(self._absent)
+        stats["negative_hits"] = self.negative_hits
+        return stats
 
     def clear_all(self) -> None:
         """Xóa tất cả sessions trong RAM (không đụng tới DB)."""
+        for _, session in self._sessions.items():
+            session.on_members_changed = None
         self._sessions.clear()
+        self._persisted_state.clear()
+        self._user_chats.clear()
+        self._chat_members.clear()
+        self._absent.clear()
 
     def get_sessions_containing_user(self, user_id: int) -> list[tuple[int, WheelSession]]:
-        """Lấy danh sách (chat_id, session) mà user_id đang tham gia"""
-        results = []
+        """Lấy danh sách (chat_id, session) có game đang chạy mà user_id tham gia (tra chỉ mục)"""
+        return [(chat_id, self._sessions.peek(chat_id)) for chat_id in sorted(self._user_chats.get(user_id, ()))]
+
+    def check_user_index(self) -> list[str]:
+        """
+        Tự kiểm tra chỉ mục user -> chat so với việc quét toàn bộ cache.
+        Trả về danh sách các chỗ lệch (rỗng = nhất quán).
+        """
+        expected: Dict[int, set[int]] = {}
         for chat_id, session in self._sessions.items():
-            # Chỉ check session active
-            if not getattr(session, "started", False):
-                continue
-                
-            # Check owner
-            if getattr(session, "owner_id", None) == user_id:
-                results.append((chat_id, session))
-                continue
-                
-            # Check participants
-            participants = getattr(session, "participants", [])
-            for p in participants:
-                if p.get("user_id") == user_id:
-                    results.append((chat_id, session))
-                    break
-        return results
+            for user_id in scan_session_members(session):
+                expected.setdefault(user_id, set()).add(chat_id)
+
+        problems = []
+        for user_id in sorted(set(expected) | set(self._user_chats)):
+            want, have = expected.get(user_id, set()), self._user_chats.get(user_id, set())
+            if want != have:
+                problems.append(f"user {user_id}: chỉ mục {sorted(have)} != thực tế {sorted(want)}")
+        for chat_id, session in self._sessions.items():
+            if session.on_members_changed is None:
+                problems.append(f"chat {chat_id}: session không gắn hook chỉ mục")
+        return problems
+
+
+def scan_session_members(session: WheelSession) -> set[int]:
+    """
+    Người chơi của một game đang chạy bằng cách quét trực tiếp session
+    (chủ phòng + participants); dùng để đối chiếu chỉ mục và trong benchmark.
+    """
+    if not getattr(session, "started", False):
+        return set()
+    members = {p.get("user_id") for p in getattr(session, "participants", [])}
+    members.add(getattr(session, "owner_id", None))
+    members.discard(None)
+    return members
@@ -1,12 +1,14 @@
 """ 
 Telegram bot handlers và commands 
 """ 
+import asyncio
 import logging
 import sys
 from pathlib import Path
 from telegram import Update
 from telegram.ext import (
     Application,
+    BaseUpdateProcessor,
     CommandHandler,
     CallbackQueryHandler,
     MessageHandler,
@@ -34,6 +36,8 @@ from src.bot.handlers.game import (
     endround_command,
     newsession_command,
     setrange_command,
+    raffle_command,
+    prize_wheel_command,
     startsession_command,
     endsession_command,
     toggle_remove_command
@@ -63,6 +67,9 @@ from src.bot.handlers.spin import (
     xoakinh_command
 )
 
+# Import auto spin handlers
+from src.bot.handlers.auto_spin import auto_spin_command, auto_spin_job
+
 # Import leaderboard handler
 from src.bot.handlers.leaderboard import leaderboard_command, leaderboard_round_command, show_user_token_command, reset_token_command, xoa_token_command
 
@@ -71,6 +78,10 @@ from src.bot.handlers.wait import wait_command
 
 # Import inline handler
 from src.bot.handlers.inline import inline_query_handler
+from src.bot.utils import session_manager, auto_spin_scheduler, chat_serializer
+from src.bot.chat_serializer import ChatSerializer, resolve_lock_chat
+from src.bot.constants import AUTO_SPIN_TICK_SECONDS, CONCURRENT_UPDATES_MAX
+from src.bot.warm_start import warm_start
 from telegram.ext import InlineQueryHandler
 
 # Setup logging
@@ -101,6 +112,62 @@ async def web_app_data_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     except Exception as e:
         logger.error(f"Error handling Web App data: {e}")
 
+class ChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Xử lý song song giữa các chat, tuần tự trong từng chat (qua ChatSerializer).
+
+    Nút điều khiển từ xa và tin reply nhập tên game trong chat riêng giữ lock
+    của nhóm đích (xem `resolve_lock_chat`), nên không chạy chồng với lệnh của
+    chính nhóm đó. Lock của chat được giữ TRƯỚC khi lấy một chỗ trong
+    `max_concurrent_updates`: update đang chờ chat của nó không chiếm chỗ, nên
+    một nhóm dồn nhiều lệnh không làm các chat khác phải chờ. Update không gắn
+    với chat (inline query) chỉ lấy chỗ chung.
+    """
+
+    def __init__(self, serializer: ChatSerializer, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self.serializer = serializer
+        # application.user_data (gán sau khi build), để đọc target_chat_id đang chờ
+        self.user_data = None
+
+    def lock_chat_id(self, update: object):
+        if not isinstance(update, Update):
+            return None
+        chat = update.effective_chat
+        query = update.callback_query
+        message = update.message
+        reply_text = None
+        user_data = None
+        if message is not None and message.reply_to_message is not None and message.text:
+            reply_text = message.reply_to_message.text or ""
+            user = update.effective_user
+            if user is not None and self.user_data is not None:
+                user_data = self.user_data.get(user.id)
+        return resolve_lock_chat(
+            chat.id if chat is not None else None,
+            query.data if query is not None else None,
+            user_data,
+            reply_text,
+        )
+
+    async def process_update(self, update: object, coroutine) -> None:
+        chat_id = self.lock_chat_id(update)
+        if chat_id is None:
+            await super().process_update(update, coroutine)
+            return
+        async with self.serializer.hold(chat_id):
+            # Chỗ chung (semaphore của BaseUpdateProcessor) chỉ lấy khi đã tới lượt chat
+            await super().process_update(update, coroutine)
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
 def setup_bot(token: str) -> Application:
     """Setup và trả về Application instance"""
     async def post_init(application: Application) -> None:
@@ -110,7 +177,10 @@ def setup_bot(token: str) -> Application:
             ("vong_moi", "Tạo vòng chơi mới"),
             ("ket_thuc_vong", "Kết thúc vòng chơi"),
             ("moi", "Tạo game mới"),
+            ("xo_so", "Bốc thăm khoảng số lớn"),
+            ("vong_quay", "Vòng quay giải thưởng"),
             ("quay", "Quay số"),
+            ("tu_dong", "Tự động quay mỗi N giây"),
             ("kinh", "Kiểm tra vé (Kinh!)"),
             ("danh_sach", "Người chơi"),
             ("lay_ve", "Chọn màu vé"),
@@ -126,8 +196,40 @@ def setup_bot(token: str) -> Application:
             ("doi", "Đợi số"),
             ("tro_giup", "Trợ giúp")
         ])
+        # Task nền ghi session xuống SQLite theo lô
+        await session_manager.start_writer()
+        # Nạp sẵn session/thống kê/kết quả của các nhóm gần đây ở nền,
+        # bot vẫn nhận lệnh trong lúc nạp (chat đã có trong cache sẽ được giữ nguyên)
+        application.bot_data["warm_start_task"] = asyncio.create_task(
+            warm_start(session_manager), name="warm-start"
+        )
+        # Một job lặp duy nhất phục vụ lịch tự động quay của mọi nhóm
+        restored = auto_spin_scheduler.restore()
+        if application.job_queue is None:
+            logger.warning("JobQueue không khả dụng (cài python-telegram-bot[job-queue]), /tu_dong sẽ không chạy")
+        else:
+            application.job_queue.run_repeating(auto_spin_job, interval=AUTO_SPIN_TICK_SECONDS, name="auto-spin")
+            if restored:
+                logger.info(f"Auto spin: khôi phục lịch của {restored} chat")
+
+    async def post_shutdown(application: Application) -> None:
+        # Đảm bảo mọi session còn chờ ghi được flush trước khi thoát
+        await session_manager.stop_writer()
+        logger.info(f"Write-behind: {session_manager.get_writer_stats()}")
+        # Các lần bật/tắt /tu_dong chưa kịp ghi ở nhịp job cuối
+        await auto_spin_scheduler.flush_writes()
+        logger.info(f"Hàng đợi theo chat: {chat_serializer.get_stats()}")
 
-    application = Application.builder().token(token).post_init(post_init).build()
+    update_processor = ChatUpdateProcessor(chat_serializer, CONCURRENT_UPDATES_MAX)
+    application = (
+        Application.builder()
+        .token(token)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .concurrent_updates(update_processor)
+        .build()
+    )
+    update_processor.user_data = application.user_data
     
     # Base commands
     application.add_handler(CommandHandler("start", start_command))
@@ -139,6 +241,8 @@ def setup_bot(token: str) -> Application:
     application.add_handler(CommandHandler("ket_thuc_vong", endround_command))
     application.add_handler(CommandHandler("moi", newsession_command))
     application.add_handler(CommandHandler("pham_vi", setrange_command))
+    application.add_handler(CommandHandler("xo_so", raffle_command))
+    application.add_handler(CommandHandler("vong_quay", prize_wheel_command))
     application.add_handler(CommandHandler("bat_dau", startsession_command))
     application.add_handler(CommandHandler("ket_thuc", endsession_command))
     application.add_handler(CommandHandler("toggle_remove", toggle_remove_command))
@@ -152,6 +256,7 @@ def setup_bot(token: str) -> Application:
 
     # Spin & Status
     application.add_handler(CommandHandler("quay", spin_command))
+    application.add_handler(CommandHandler("tu_dong", auto_spin_command))
     application.add_handler(CommandHandler("kinh", check_command))
     application.add_handler(CommandHandler("xoa_kinh", xoakinh_command))
     application.add_handler(CommandHandler("lich_su", history_command))
@@ -1,10 +1,17 @@
+import logging
 from datetime import datetime, timedelta
 from telegram import Update
-from src.bot.constants import TICKET_DISPLAY_NAMES, stats, last_results, BET_AMOUNT
-from src.db.sqlite_store import load_stats, load_last_result
+from src.bot.constants import TICKET_DISPLAY_NAMES, stats, last_results, BET_AMOUNT, active_rounds, round_history, round_ledgers
+from src.db.backends import StorageBackend, get_backend
 from src.bot.session_manager import SessionManager
+from src.bot.auto_spin import AutoSpinScheduler
+from src.bot.chat_serializer import ChatSerializer
+
+logger = logging.getLogger(__name__)
 
 session_manager = SessionManager()
+auto_spin_scheduler = AutoSpinScheduler()
+chat_serializer = ChatSerializer()
 
 def ticket_display_name(code: str) -> str:
     """Trả về tên hiển thị của vé, hoặc mã gốc nếu không có map."""
@@ -17,16 +24,17 @@ def escape_markdown(text: str) -> str:
         text = text.replace(char, f'\\{char}')
     return text
 
-def get_chat_stats(chat_id: int) -> dict:
+def get_chat_stats(chat_id: int, backend: StorageBackend | None = None) -> dict:
     """
     Lấy thống kê cho một chat.
-    Ưu tiên cache RAM, nếu chưa có thì load từ SQLite.
+    Ưu tiên cache RAM, nếu chưa có thì load từ backend lưu trữ
+    (mặc định là `get_backend()`).
     """
     chat_stats = stats.get(chat_id)
     if chat_stats is not None:
         return chat_stats
 
-    loaded = load_stats(chat_id)
+    loaded = (backend or get_backend()).load_stats(chat_id)
     if loaded:
         stats[chat_id] = loaded
         return loaded
@@ -36,6 +44,49 @@ def get_chat_stats(chat_id: int) -> dict:
     stats[chat_id] = empty
     return empty
 
+def update_chat_stats(chat_id: int, deltas: dict, names: dict | None = None) -> dict:
+    """
+    Cộng dồn biến động thống kê vào cache RAM và ghi xuống SQLite bằng upsert.
+
+    Args:
+        deltas: {"wins": {uid: delta}, "participations": {uid: delta}}
+        names: {uid: tên hiển thị mới nhất}
+    """
+    chat_stats = get_chat_stats(chat_id)
+    names = names or {}
+
+    for stat_type, per_user in deltas.items():
+        target = chat_stats.setdefault(stat_type, {})
+        for uid, delta in per_user.items():
+            info = target.get(uid) or {"count": 0.0, "name": names.get(uid) or str(uid)}
+            info["count"] += delta
+            if names.get(uid):
+                info["name"] = names[uid]
+            target[uid] = info
+
+    get_backend().apply_stat_deltas(chat_id, deltas, names)
+    return chat_stats
+
+def reset_chat_stats(chat_id: int, stat_type: str | None = None) -> dict:
+    """Reset thống kê của chat (tất cả hoặc một loại) ở cả cache RAM lẫn DB."""
+    chat_stats = get_chat_stats(chat_id)
+    for key in ([stat_type] if stat_type else ["wins", "participations"]):
+        chat_stats[key] = {}
+    get_backend().reset_stats(chat_id, stat_type)
+    return chat_stats
+
+def remove_user_stats(chat_id: int, user_id: int, stat_type: str = "wins") -> bool:
+    """Xoá thống kê một user (cache RAM + DB). Trả về True nếu user có dữ liệu."""
+    items = get_chat_stats(chat_id).get(stat_type, {})
+    found = False
+    for key in (user_id, str(user_id)):
+        if key in items:
+            del items[key]
+            found = True
+    if found:
+        get_backend().delete_user_stats(chat_id, user_id, stat_type)
+    return found
+
 def get_last_result_for_chat(chat_id: int) -> dict | None:
     """
     Lấy kết quả game gần nhất cho một chat.
@@ -45,12 +96,49 @@ def get_last_result_for_chat(chat_id: int) -> dict | None:
     if data is not None:
         return data
 
-    loaded = load_last_result(chat_id)
+    loaded = get_backend().load_last_result(chat_id)
     if loaded:
         last_results[chat_id] = loaded
         return loaded
     return None
 
+def get_round_id(round_info: dict) -> str:
+    """ID của vòng chơi (vòng tạo trước khi có round_id thì dùng created_at)."""
+    return round_info.get("round_id") or round_info.get("created_at") or ""
+
+def get_round_games(chat_id: int) -> list:
+    """
+    Lấy danh sách game của vòng chơi đang hoạt động.
+    Ưu tiên cache RAM, nếu chưa có thì tải một lần từ SQLite.
+    """
+    games = round_history.get(chat_id)
+    if games is not None:
+        return games
+
+    round_info = active_rounds.get(chat_id)
+    if round_info is None:
+        return []
+
+    games = get_backend().load_round_games(chat_id, get_round_id(round_info))
+    round_history[chat_id] = games
+    return games
+
+def record_round_game(chat_id: int, game_record: dict) -> None:
+    """
+    Thêm game vừa kết thúc vào vòng chơi hiện tại và cộng token của game
+    vào sổ của vòng (cache RAM + DB).
+    """
+    round_info = active_rounds.get(chat_id)
+    if round_info is None:
+        return
+    # Nạp sổ trước khi thêm game để vòng cũ không bị cộng hai lần
+    ledger = get_round_ledger(chat_id)
+    deltas = game_token_deltas(game_record)
+
+    get_backend().save_game_record(chat_id, get_round_id(round_info), game_record, deltas)
+    get_round_games(chat_id).append(game_record)
+    merge_token_deltas(ledger, deltas)
+
 def is_session_expired(session) -> bool:
     """Kiểm tra session có hết hạn do lâu không hoạt động (không quay số) hay không."""
     if not hasattr(session, "last_activity"):
@@ -76,70 +164,116 @@ async def ensure_active_session(update: Update, chat_id: int, session) -> bool:
         )
         return False
     return True
+def game_token_deltas(game: dict) -> dict:
+    """
+    Token thay đổi của từng người tham gia trong một game.
+    Trả về: {uid: {"name": name, "token": float}} (người không thắng ở game
+    không có ai thắng vẫn có mặt với token 0).
+    """
+    deltas = {}
+    bet_amount = BET_AMOUNT
+
+    partics = game.get("participants", [])
+    winners = game.get("winners", [])
+    total_players = len(partics)
+
+    # Xác định winners ID (ép kiểu int)
+    winner_ids = set()
+    for w in winners:
+        raw_id = w.get("user_id")
+        if raw_id is not None:
+            try:
+                winner_ids.add(int(raw_id))
+            except (ValueError, TypeError):
+                pass
+
+    num_winners = len(winner_ids)
+    token_win = 0
+    if num_winners > 0:
+        token_win = (total_players * bet_amount / num_winners) - bet_amount
+
+    for p in partics:
+        raw_uid = p.get("user_id")
+        if raw_uid is None: continue
+        try:
+            uid = int(raw_uid)
+        except (ValueError, TypeError):
+            continue
+
+        name = p.get("name") or str(uid)
+        entry = deltas.setdefault(uid, {"name": name, "token": 0.0})
+        entry["name"] = name
+
+        if num_winners == 0:
+            # Nếu không có ai thắng, người tham gia vẫn có mặt với token 0
+            continue
+        if uid in winner_ids:
+            entry["token"] += token_win
+        else:
+            entry["token"] -= bet_amount
+
+    return deltas
+
+def merge_token_deltas(user_tokens: dict, deltas: dict) -> None:
+    """Cộng deltas của một game vào tổng token (cập nhật tại chỗ, lấy tên mới nhất)."""
+    for uid, info in deltas.items():
+        entry = user_tokens.setdefault(uid, {"name": info["name"], "token": 0.0})
+        entry["name"] = info["name"]
+        entry["token"] += info["token"]
+
 def calculate_round_tokens(games: list) -> dict:
     """
     Tính toán tổng token của các user trong một danh sách các game (vòng chơi).
     Trả về: {uid: {"name": name, "token": float}}
+
+    Tính lại từ đầu, chỉ dùng để đối chiếu; handler đọc từ `get_round_ledger`.
     """
     user_tokens = {}
-    bet_amount = BET_AMOUNT
-
     for game in games:
-        partics = game.get("participants", [])
-        winners = game.get("winners", [])
-        total_players = len(partics)
-        
-        # Xác định winners ID (ép kiểu int)
-        winner_ids = set()
-        for w in winners:
-            raw_id = w.get("user_id")
-            if raw_id is not None:
-                try:
-                    winner_ids.add(int(raw_id))
-                except (ValueError, TypeError):
-                    pass
-        
-        num_winners = len(winner_ids)
-        token_win = 0
-        if num_winners > 0:
-            token_win = (total_players * bet_amount / num_winners) - bet_amount
-            for p in partics:
-                raw_uid = p.get("user_id")
-                if raw_uid is None: continue
-                try:
-                    uid = int(raw_uid)
-                except (ValueError, TypeError):
-                    continue
-                    
-                name = p.get("name") or str(uid)
-                
-                if uid not in user_tokens:
-                    user_tokens[uid] = {"name": name, "token": 0.0}
-                
-                # Update name mới nhất
-                user_tokens[uid]["name"] = name
-                
-                if uid in winner_ids:
-                    user_tokens[uid]["token"] += token_win
-                else:
-                    user_tokens[uid]["token"] -= bet_amount
-        else:
-            # Nếu không có ai thắng, vẫn khởi tạo user_tokens cho những người tham gia (nếu chưa có)
-            # để đảm bảo họ hiện diện trong danh sách với token là 0
-            for p in partics:
-                raw_uid = p.get("user_id")
-                if raw_uid is None: continue
-                try:
-                    uid = int(raw_uid)
-                except (ValueError, TypeError):
-                    continue
-                name = p.get("name") or str(uid)
-                if uid not in user_tokens:
-                    user_tokens[uid] = {"name": name, "token": 0.0}
-                user_tokens[uid]["name"] = name
-                
+        merge_token_deltas(user_tokens, game_token_deltas(game))
     return user_tokens
 
+def get_round_ledger(chat_id: int) -> dict:
+    """
+    Sổ token cộng dồn của vòng chơi đang hoạt động: {uid: {"name", "token"}}.
+    Ưu tiên cache RAM, nếu chưa có thì tải một lần từ SQLite.
+    """
+    ledger = round_ledgers.get(chat_id)
+    if ledger is not None:
+        return ledger
+
+    round_info = active_rounds.get(chat_id)
+    if round_info is None:
+        return {}
+
+    round_id = get_round_id(round_info)
+    ledger = get_backend().load_round_ledger(chat_id, round_id)
+    if not ledger:
+        # Vòng tạo trước khi có sổ token: dựng sổ từ các game đã lưu
+        ledger = calculate_round_tokens(get_round_games(chat_id))
+        get_backend().apply_round_ledger_deltas(chat_id, round_id, ledger)
+    round_ledgers[chat_id] = ledger
+    return ledger
+
+def check_round_ledger(chat_id: int, tolerance: float = 1e-6) -> dict:
+    """
+    Đối chiếu sổ token của vòng với kết quả tính lại từ các game.
+    Trả về các user bị lệch: {uid: {"ledger": float, "expected": float}}.
+    """
+    ledger = get_round_ledger(chat_id)
+    expected = calculate_round_tokens(get_round_games(chat_id))
+
+    drift = {}
+    for uid in ledger.keys() | expected.keys():
+        got = ledger.get(uid, {}).get("token", 0.0)
+        want = expected.get(uid, {}).get("token", 0.0)
+        if abs(got - want) > tolerance or (uid in ledger) != (uid in expected):
+            drift[uid] = {"ledger": got, "expected": want}
+
+    if drift:
+        logger.warning(f"Sổ token vòng của chat {chat_id} lệch với lịch sử game: {drift}")
+    return drift
+
 def get_round_leaderboard_text(round_name: str, user_tokens: dict) -> str:
     """
     Tạo nội dung text cho bảng xếp hạng vòng chơi.
@@ -0,0 +1,85 @@
+"""
+Nạp sẵn cache khi bot khởi động (warm start).
+
+Sau khi restart, lệnh đầu tiên của mỗi nhóm phải tải session, thống kê và
+kết quả gần nhất từ DB. Module này tải hàng loạt dữ liệu của các nhóm hoạt
+động gần đây bằng vài truy vấn theo tập hợp (ở thread phụ), rồi đổ vào
+`SessionManager` và các cache trong `constants` trên event loop.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from src.bot.constants import stats, last_results, active_rounds, WARM_START_MAX_AGE_HOURS
+from src.bot.session_manager import SessionManager
+from src.db.backends import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+
+def load_warm_data(
+    backend: StorageBackend,
+    max_age_hours: float = WARM_START_MAX_AGE_HOURS,
+    extra_chat_ids: Iterable[int] = (),
+) -> Dict[str, Any]:
+    """
+    Tải session, kết quả gần nhất và thống kê của các chat hoạt động gần đây.
+    Chạy được ở thread phụ (không đụng tới cache RAM).
+    """
+    since = None
+    if max_age_hours:
+        since = (datetime.now() - timedelta(hours=max_age_hours)).isoformat(timespec="seconds")
+
+    sessions = backend.load_all_sessions(since)
+    results = backend.load_all_last_results(since)
+    chat_ids = set(sessions) | set(results) | set(extra_chat_ids)
+    chat_stats = backend.load_all_stats(sorted(chat_ids))
+    return {"sessions": sessions, "last_results": results, "stats": chat_stats}
+
+
+def apply_warm_data(session_manager: SessionManager, data: Dict[str, Any]) -> Dict[str, int]:
+    """Đổ dữ liệu đã tải vào cache (chạy trên event loop). Không ghi đè dữ liệu đã có."""
+    report = {
+        "sessions": session_manager.preload(data["sessions"]),
+        "spins": sum(len(s.get("history") or []) for s in data["sessions"].values()),
+        "last_results": 0,
+        "stats_chats": 0,
+        "stats_rows": 0,
+    }
+    for chat_id, result in data["last_results"].items():
+        if chat_id not in last_results:
+            last_results[chat_id] = result
+            report["last_results"] += 1
+    for chat_id, chat_stats in data["stats"].items():
+        if chat_id not in stats:
+            stats[chat_id] = chat_stats
+            report["stats_chats"] += 1
+            report["stats_rows"] += sum(len(items) for items in chat_stats.values())
+    return report
+
+
+async def warm_start(
+    session_manager: SessionManager,
+    backend: Optional[StorageBackend] = None,
+    max_age_hours: float = WARM_START_MAX_AGE_HOURS,
+) -> Dict[str, Any]:
+    """Tải hàng loạt ở thread phụ, đổ vào cache và log thời gian + số dòng đã nạp."""
+    started = time.perf_counter()
+    session_manager.begin_preload()
+    try:
+        data = await asyncio.to_thread(
+            load_warm_data, backend or session_manager.backend, max_age_hours, list(active_rounds)
+        )
+    except Exception as e:
+        logger.error(f"Warm start thất bại, cache sẽ được nạp dần theo từng lệnh: {e}", exc_info=True)
+        session_manager.preload({})  # kết thúc theo dõi của begin_preload
+        return {}
+    loaded_at = time.perf_counter()
+
+    report: Dict[str, Any] = apply_warm_data(session_manager, data)
+    report["load_ms"] = round((loaded_at - started) * 1000, 1)
+    report["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Warm start: {report}")
+    return report
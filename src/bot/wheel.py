@@ -1,7 +1,7 @@
 """
 Core logic cho random wheel bot
 """
-import random
+import time
 from typing import Optional
 from datetime import datetime
 from ..models.wheel_session import WheelSession
@@ -33,6 +33,53 @@ def create_wheel_session(
     )
 
 
+def create_weighted_session(
+    segments: list[tuple[str, float]],
+    remove_after_spin: bool = True
+) -> WheelSession:
+    """
+    Tạo vòng quay giải thưởng: ô thứ i (số i + 1) có nhãn và trọng số riêng
+    
+    Args:
+        segments: [(nhãn, trọng số), ...], vd [("Jackpot", 1), ("Chúc may mắn", 30)]
+        remove_after_spin: Có loại ô sau khi quay không
+    
+    Returns:
+        WheelSession object (spin_wheel rút theo trọng số, O(1))
+    
+    Raises:
+        ValueError: Nếu không có ô nào hoặc trọng số không hợp lệ
+    """
+    if not segments:
+        raise ValueError("Vòng quay cần ít nhất một ô")
+    return WheelSession(
+        start_number=1,
+        end_number=len(segments),
+        remove_after_spin=remove_after_spin,
+        segments=segments,
+    )
+
+
+def _draw_one(session: WheelSession, ts: int) -> int:
+    """Rút một số và ghi nhận vào session (chưa cập nhật updated_at)."""
+    # Chọn ngẫu nhiên một số, loại khỏi pool nếu remove_after_spin = True
+    if session.remove_after_spin:
+        selected_number = session.pool.draw()
+        session.removed_numbers.append(selected_number)
+    else:
+        selected_number = session.pool.choice()
+
+    # Cập nhật thông tin
+    session.mark_drawn(selected_number)
+    session.last_spin = selected_number
+    session.spin_count += 1
+    # Lưu lịch sử quay
+    session.spin_seq += 1
+    # Ring buffer tự bỏ lượt cũ nhất khi đầy (HISTORY_CAPACITY)
+    session.spin_history.append(selected_number, ts)
+    return selected_number
+
+
 def spin_wheel(session: WheelSession) -> int:
     """
     Quay wheel và chọn ngẫu nhiên một số
@@ -49,30 +96,36 @@ def spin_wheel(session: WheelSession) -> int:
     if session.is_empty():
         raise ValueError("Danh sách số đã hết! Vui lòng reset để tiếp tục.")
     
-    # Chọn ngẫu nhiên một số
-    selected_number = random.choice(session.available_numbers)
+    selected_number = _draw_one(session, int(time.time()))
+    session.updated_at = datetime.now()
+    return selected_number
+
+
+def spin_wheel_many(session: WheelSession, count: int) -> list[int]:
+    """
+    Quay liên tiếp `count` lần trong một lần gọi (dùng cho /quay N)
     
-    # Loại bỏ số nếu remove_after_spin = True
-    if session.remove_after_spin:
-        session.available_numbers.remove(selected_number)
-        session.removed_numbers.append(selected_number)
+    Args:
+        session: WheelSession object
+        count: Số lượt muốn quay (>= 1)
     
-    # Cập nhật thông tin
-    session.last_spin = selected_number
-    session.spin_count += 1
-    session.updated_at = datetime.now()
-    # Lưu lịch sử quay
-    session.history.append(
-        {
-            "number": selected_number,
-            "time": datetime.now().isoformat(timespec="seconds"),
-        }
-    )
-    # Giới hạn lịch sử để tránh phình bộ nhớ
-    if len(session.history) > 1000:
-        session.history.pop(0)
+    Returns:
+        Các số đã quay theo thứ tự; có thể ít hơn `count` nếu hết số
     
-    return selected_number
+    Raises:
+        ValueError: Nếu count < 1 hoặc danh sách số còn lại rỗng
+    """
+    if count < 1:
+        raise ValueError("Số lượt quay phải >= 1")
+    if session.is_empty():
+        raise ValueError("Danh sách số đã hết! Vui lòng reset để tiếp tục.")
+
+    ts = int(time.time())
+    numbers = []
+    while len(numbers) < count and not session.is_empty():
+        numbers.append(_draw_one(session, ts))
+    session.updated_at = datetime.now()
+    return numbers
 
 
 def reset_session(session: WheelSession) -> WheelSession:
@@ -85,9 +138,10 @@ def reset_session(session: WheelSession) -> WheelSession:
     Returns:
         WheelSession object đã được reset
     """
-    # Khôi phục danh sách số
-    session.available_numbers = list(range(session.start_number, session.end_number + 1))
+    # Khôi phục danh sách số (O(1), xem DrawPool.reset)
+    session.pool.reset()
     session.removed_numbers = []
+    session.clear_drawn()
     session.last_spin = None
     session.spin_count = 0
     session.updated_at = __import__('datetime').datetime.now()
@@ -142,8 +196,9 @@ def clear_session(session: WheelSession) -> None:
     Args:
         session: WheelSession object
     """
-    session.available_numbers = []
+    session.pool.clear()
     session.removed_numbers = []
+    session.clear_drawn()
     session.last_spin = None
     session.spin_count = 0
     session.updated_at = __import__('datetime').datetime.now()
@@ -1,6 +1,6 @@
 """
 SQLite persistence layer cho bot.
 
-Module này được khởi tạo qua hàm `init_db` trong `sqlite_store`.
+Module này được khởi tạo qua hàm `init_db` trong `sqlite_store`, hoặc
+`get_backend().init()` khi dùng backend khác (xem `backends`).
 """
-
@@ -0,0 +1,542 @@
+"""
+Các backend lưu trữ dùng chung một giao diện (`StorageBackend`).
+
+- `MemoryBackend`: giữ mọi thứ trong dict, dùng cho test và benchmark.
+- `SQLiteBackend`: một file SQLite (mặc định là `src/loto.db`), dùng lại
+  các hàm của `sqlite_store` với ConnectionManager riêng.
+- `ShardedSQLiteBackend`: chia chat_id ra N file SQLite theo hash, mỗi file
+  có khoá ghi riêng nên một nhóm chơi nhiều không làm các nhóm khác phải
+  chờ commit.
+
+Các module của bot lấy backend qua `get_backend()`; `set_backend()` để đổi
+backend mặc định (vd: bật sharding trong main, hoặc dùng MemoryBackend trong test).
+"""
+import json
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional, Protocol
+
+from src.db import sqlite_store
+from src.db.sqlite_store import ConnectionManager, assemble_session_dict, _epoch_to_iso
+
+
+class StorageBackend(Protocol):
+    """Giao diện lưu trữ session, thống kê, kết quả gần nhất và vòng chơi."""
+
+    def init(self) -> None: ...
+
+    # Session (write lấy từ sqlite_store.build_session_write, None = xoá)
+    def load_session(self, chat_id: int) -> Optional[Dict[str, Any]]: ...
+    def save_sessions_batch(self, writes: list[tuple[int, Optional[Dict[str, Any]]]]) -> None: ...
+    def load_spins(
+        self, chat_id: int, game_id: str, since_seq: int = 0, limit: Optional[int] = None
+    ) -> list[Dict[str, Any]]: ...
+    def count_spins(self, chat_id: int, game_id: str, since_seq: int = 0) -> int: ...
+
+    # Stats
+    def load_stats(self, chat_id: int) -> Dict[str, Dict[int, Dict[str, Any]]]: ...
+    def apply_stat_deltas(
+        self, chat_id: int, deltas: Dict[str, Dict[int, float]], names: Optional[Dict[int, str]] = None
+    ) -> None: ...
+    def reset_stats(self, chat_id: int, stat_type: Optional[str] = None) -> None: ...
+    def delete_user_stats(self, chat_id: int, user_id: int, stat_type: str = "wins") -> None: ...
+
+    # Last result
+    def save_last_result(self, chat_id: int, data: Dict[str, Any]) -> None: ...
+    def load_last_result(self, chat_id: int) -> Optional[Dict[str, Any]]: ...
+
+    # Active rounds (kèm lịch sử game và sổ token của vòng)
+    def save_active_round(self, chat_id: int, round_data: Dict[str, Any]) -> None: ...
+    def load_all_active_rounds(self) -> Dict[int, Dict[str, Any]]: ...
+    def delete_active_round_row(self, chat_id: int) -> None: ...
+
+    # Lịch tự động quay
+    def save_auto_spin(self, chat_id: int, schedule: Dict[str, Any]) -> None: ...
+    def load_all_auto_spins(self) -> Dict[int, Dict[str, Any]]: ...
+    def delete_auto_spin(self, chat_id: int) -> None: ...
+    def save_game_record(
+        self,
+        chat_id: int,
+        round_id: str,
+        record: Dict[str, Any],
+        token_deltas: Optional[Dict[int, Dict[str, Any]]] = None,
+    ) -> None: ...
+    def load_round_games(self, chat_id: int, round_id: str) -> list[Dict[str, Any]]: ...
+    def apply_round_ledger_deltas(self, chat_id: int, round_id: str, deltas: Dict[int, Dict[str, Any]]) -> None: ...
+    def load_round_ledger(self, chat_id: int, round_id: str) -> Dict[int, Dict[str, Any]]: ...
+
+    # Warm start: tải hàng loạt bằng vài truy vấn theo tập hợp
+    def load_all_sessions(self, since: Optional[str] = None) -> Dict[int, Dict[str, Any]]: ...
+    def load_all_stats(self, chat_ids: Optional[list[int]] = None) -> Dict[int, Dict[str, Any]]: ...
+    def load_all_last_results(self, since: Optional[str] = None) -> Dict[int, Dict[str, Any]]: ...
+
+    def get_metrics(self) -> Dict[str, Any]: ...
+    def close(self) -> None: ...
+
+
+def _json_copy(value: Any) -> Any:
+    """Sao chép qua JSON để MemoryBackend trả về dữ liệu giống hệt SQLite."""
+    return json.loads(json.dumps(value, ensure_ascii=False))
+
+
+class MemoryBackend:
+    """Backend trong RAM, cùng ngữ nghĩa với SQLiteBackend (không ghi đĩa)."""
+
+    def __init__(self):
+        self.init()
+
+    def init(self) -> None:
+        # {chat_id: {"meta", "participants", "tickets", "waiters", "winners"}}
+        self._sessions: Dict[int, Dict[str, Any]] = {}
+        # {(chat_id, game_id): {seq: (number, ts)}}
+        self._spins: Dict[tuple, Dict[int, tuple]] = {}
+        # {chat_id: {stat_type: {user_id: {"count", "name"}}}}
+        self._stats: Dict[int, Dict[str, Dict[int, Dict[str, Any]]]] = {}
+        self._last_results: Dict[int, Dict[str, Any]] = {}
+        self._active_rounds: Dict[int, Dict[str, Any]] = {}
+        self._auto_spins: Dict[int, Dict[str, Any]] = {}
+        # {(chat_id, round_id): [record, ...]} / {(chat_id, round_id): {user_id: {...}}}
+        self._games: Dict[tuple, list] = {}
+        self._ledgers: Dict[tuple, Dict[int, Dict[str, Any]]] = {}
+        self.calls = 0
+
+    # ---------- Session ----------
+    def load_session(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        self.calls += 1
+        stored = self._sessions.get(chat_id)
+        if stored is None:
+            return None
+        meta = stored["meta"]
+        spins = self._spins.get((chat_id, meta.get("id")), {})
+        since = meta.get("history_base", 0)
+        parts = dict(stored)
+        parts["spins"] = [(seq, *spins[seq]) for seq in sorted(spins) if seq > since]
+        return assemble_session_dict(_json_copy(parts))
+
+    def save_sessions_batch(self, writes: list[tuple[int, Optional[Dict[str, Any]]]]) -> None:
+        self.calls += 1
+        for chat_id, write in writes:
+            if write is None:
+                # Giống SQLite: giữ lại lượt quay làm lịch sử game
+                self._sessions.pop(chat_id, None)
+                continue
+            stored = self._sessions.setdefault(
+                chat_id, {"participants": [], "tickets": [], "waiters": [], "winners": []}
+            )
+            stored["meta"] = _json_copy(write["meta"])
+            for name in ("participants", "tickets", "waiters", "winners"):
+                if name in write:
+                    stored[name] = list(write[name])
+            spins = self._spins.setdefault((chat_id, write["game_id"]), {})
+            for seq, number, ts in write.get("spins") or []:
+                spins.setdefault(seq, (number, ts))
+
+    def load_spins(
+        self, chat_id: int, game_id: str, since_seq: int = 0, limit: Optional[int] = None
+    ) -> list[Dict[str, Any]]:
+        self.calls += 1
+        spins = self._spins.get((chat_id, game_id), {})
+        seqs = [seq for seq in sorted(spins) if seq > since_seq]
+        if limit is not None:
+            seqs = seqs[-limit:] if limit > 0 else []
+        return [{"seq": seq, "number": spins[seq][0], "time": _epoch_to_iso(spins[seq][1])} for seq in seqs]
+
+    def count_spins(self, chat_id: int, game_id: str, since_seq: int = 0) -> int:
+        self.calls += 1
+        return sum(1 for seq in self._spins.get((chat_id, game_id), {}) if seq > since_seq)
+
+    # ---------- Stats ----------
+    def load_stats(self, chat_id: int) -> Dict[str, Dict[int, Dict[str, Any]]]:
+        self.calls += 1
+        result: Dict[str, Dict[int, Dict[str, Any]]] = {"wins": {}, "participations": {}}
+        for stat_type, items in self._stats.get(chat_id, {}).items():
+            target = result["wins"] if stat_type == "wins" else result["participations"]
+            target.update({uid: dict(info) for uid, info in items.items()})
+        return result
+
+    def apply_stat_deltas(
+        self, chat_id: int, deltas: Dict[str, Dict[int, float]], names: Optional[Dict[int, str]] = None
+    ) -> None:
+        self.calls += 1
+        names = names or {}
+        chat = self._stats.setdefault(chat_id, {})
+        for stat_type, items in deltas.items():
+            for user_id, delta in items.items():
+                entry = chat.setdefault(stat_type, {}).setdefault(int(user_id), {"count": 0.0, "name": None})
+                entry["count"] += float(delta)
+                if names.get(user_id) is not None:
+                    entry["name"] = names[user_id]
+
+    def reset_stats(self, chat_id: int, stat_type: Optional[str] = None) -> None:
+        self.calls += 1
+        if stat_type is None:
+            self._stats.pop(chat_id, None)
+        else:
+            self._stats.get(chat_id, {}).pop(stat_type, None)
+
+    def delete_user_stats(self, chat_id: int, user_id: int, stat_type: str = "wins") -> None:
+        self.calls += 1
+        self._stats.get(chat_id, {}).get(stat_type, {}).pop(int(user_id), None)
+
+    # ---------- Last result ----------
+    def save_last_result(self, chat_id: int, data: Dict[str, Any]) -> None:
+        self.calls += 1
+        self._last_results[chat_id] = _json_copy(data)
+
+    def load_last_result(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        self.calls += 1
+        data = self._last_results.get(chat_id)
+        return _json_copy(data) if data is not None else None
+
+    # ---------- Active rounds ----------
+    def save_active_round(self, chat_id: int, round_data: Dict[str, Any]) -> None:
+        self.calls += 1
+        self._active_rounds[chat_id] = _json_copy(round_data)
+
+    def load_all_active_rounds(self) -> Dict[int, Dict[str, Any]]:
+        self.calls += 1
+        return {chat_id: _json_copy(data) for chat_id, data in self._active_rounds.items()}
+
+    def delete_active_round_row(self, chat_id: int) -> None:
+        self.calls += 1
+        self._active_rounds.pop(chat_id, None)
+
+    # ---------- Auto spin ----------
+    def save_auto_spin(self, chat_id: int, schedule: Dict[str, Any]) -> None:
+        self.calls += 1
+        self._auto_spins[chat_id] = _json_copy(schedule)
+
+    def load_all_auto_spins(self) -> Dict[int, Dict[str, Any]]:
+        self.calls += 1
+        return {chat_id: _json_copy(data) for chat_id, data in self._auto_spins.items()}
+
+    def delete_auto_spin(self, chat_id: int) -> None:
+        self.calls += 1
+        self._auto_spins.pop(chat_id, None)
+
+    def save_game_record(
+        self,
+        chat_id: int,
+        round_id: str,
+        record: Dict[str, Any],
+        token_deltas: Optional[Dict[int, Dict[str, Any]]] = None,
+    ) -> None:
+        self.calls += 1
+        if token_deltas:
+            self.apply_round_ledger_deltas(chat_id, round_id, token_deltas)
+        self._games.setdefault((chat_id, round_id), []).append({
+            "game_name": record.get("game_name"),
+            "host_name": record.get("host_name"),
+            "participants": _json_copy(record.get("participants") or []),
+            "winners": _json_copy(record.get("winners") or []),
+            "numbers_drawn": int(record.get("numbers_drawn") or 0),
+            "ended_at": record.get("ended_at"),
+        })
+
+    def load_round_games(self, chat_id: int, round_id: str) -> list[Dict[str, Any]]:
+        self.calls += 1
+        return _json_copy(self._games.get((chat_id, round_id), []))
+
+    def apply_round_ledger_deltas(self, chat_id: int, round_id: str, deltas: Dict[int, Dict[str, Any]]) -> None:
+        ledger = self._ledgers.setdefault((chat_id, round_id), {})
+        for uid, info in deltas.items():
+            entry = ledger.setdefault(int(uid), {"name": str(uid), "token": 0.0})
+            if info.get("name") is not None:
+                entry["name"] = info["name"]
+            entry["token"] += float(info.get("token", 0.0))
+
+    def load_round_ledger(self, chat_id: int, round_id: str) -> Dict[int, Dict[str, Any]]:
+        self.calls += 1
+        return {uid: dict(info) for uid, info in self._ledgers.get((chat_id, round_id), {}).items()}
+
+    # ---------- Warm start ----------
+    # MemoryBackend không lưu thời gian cập nhật nên `since` bị bỏ qua
+    def load_all_sessions(self, since: Optional[str] = None) -> Dict[int, Dict[str, Any]]:
+        return {chat_id: self.load_session(chat_id) for chat_id in list(self._sessions)}
+
+    def load_all_stats(self, chat_ids: Optional[list[int]] = None) -> Dict[int, Dict[str, Any]]:
+        wanted = self._stats.keys() if chat_ids is None else set(chat_ids)
+        return {chat_id: self.load_stats(chat_id) for chat_id in list(wanted)}
+
+    def load_all_last_results(self, since: Optional[str] = None) -> Dict[int, Dict[str, Any]]:
+        self.calls += 1
+        return {chat_id: _json_copy(data) for chat_id, data in self._last_results.items()}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {"backend": "memory", "calls": self.calls, "sessions": len(self._sessions)}
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBackend:
+    """
+    Backend một file SQLite.
+
+    manager = None nghĩa là dùng ConnectionManager mặc định của
+    `sqlite_store` (đổi được bằng `sqlite_store.configure`).
+    """
+
+    def __init__(self, manager: Optional[ConnectionManager] = None):
+        self.manager = manager
+
+    @classmethod
+    def from_path(cls, db_path: Path, **options: Any) -> "SQLiteBackend":
+        return cls(ConnectionManager(Path(db_path), **options))
+
+    def init(self) -> None:
+        sqlite_store.init_db(manager=self.manager)
+
+    # ---------- Session ----------
+    def load_session(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        return sqlite_store.load_session(chat_id, manager=self.manager)
+
+    def save_sessions_batch(self, writes: list[tuple[int, Optional[Dict[str, Any]]]]) -> None:
+        sqlite_store.save_sessions_batch(writes, manager=self.manager)
+
+    def load_spins(
+        self, chat_id: int, game_id: str, since_seq: int = 0, limit: Optional[int] = None
+    ) -> list[Dict[str, Any]]:
+        return sqlite_store.load_spins(chat_id, game_id, since_seq, limit, manager=self.manager)
+
+    def count_spins(self, chat_id: int, game_id: str, since_seq: int = 0) -> int:
+        return sqlite_store.count_spins(chat_id, game_id, since_seq, manager=self.manager)
+
+    # ---------- Stats ----------
+    def load_stats(self, chat_id: int) -> Dict[str, Dict[int, Dict[str, Any]]]:
+        return sqlite_store.load_stats(chat_id, manager=self.manager)
+
+    def apply_stat_deltas(
+        self, chat_id: int, deltas: Dict[str, Dict[int, float]], names: Optional[Dict[int, str]] = None
+    ) -> None:
+        sqlite_store.apply_stat_deltas(chat_id, deltas, names, manager=self.manager)
+
+    def reset_stats(self, chat_id: int, stat_type: Optional[str] = None) -> None:
+        sqlite_store.reset_stats(chat_id, stat_type, manager=self.manager)
+
+    def delete_user_stats(self, chat_id: int, user_id: int, stat_type: str = "wins") -> None:
+        sqlite_store.delete_user_stats(chat_id, user_id, stat_type, manager=self.manager)
+
+    # ---------- Last result ----------
+    def save_last_result(self, chat_id: int, data: Dict[str, Any]) -> None:
+        sqlite_store.save_last_result(chat_id, data, manager=self.manager)
+
+    def load_last_result(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        return sqlite_store.load_last_result(chat_id, manager=self.manager)
+
+    # ---------- Active rounds ----------
+    def save_active_round(self, chat_id: int, round_data: Dict[str, Any]) -> None:
+        sqlite_store.save_active_round(chat_id, round_data, manager=self.manager)
+
+    def load_all_active_rounds(self) -> Dict[int, Dict[str, Any]]:
+        return sqlite_store.load_all_active_rounds(manager=self.manager)
+
+    def delete_active_round_row(self, chat_id: int) -> None:
+        sqlite_store.delete_active_round_row(chat_id, manager=self.manager)
+
+    def save_auto_spin(self, chat_id: int, schedule: Dict[str, Any]) -> None:
+        sqlite_store.save_auto_spin(chat_id, schedule, manager=self.manager)
+
+    def load_all_auto_spins(self) -> Dict[int, Dict[str, Any]]:
+        return sqlite_store.load_all_auto_spins(manager=self.manager)
+
+    def delete_auto_spin(self, chat_id: int) -> None:
+        sqlite_store.delete_auto_spin(chat_id, manager=self.manager)
+
+    def save_game_record(
+        self,
+        chat_id: int,
+        round_id: str,
+        record: Dict[str, Any],
+        token_deltas: Optional[Dict[int, Dict[str, Any]]] = None,
+    ) -> None:
+        sqlite_store.save_game_record(chat_id, round_id, record, token_deltas, manager=self.manager)
+
+    def load_round_games(self, chat_id: int, round_id: str) -> list[Dict[str, Any]]:
+        return sqlite_store.load_round_games(chat_id, round_id, manager=self.manager)
+
+    def apply_round_ledger_deltas(self, chat_id: int, round_id: str, deltas: Dict[int, Dict[str, Any]]) -> None:
+        sqlite_store.apply_round_ledger_deltas(chat_id, round_id, deltas, manager=self.manager)
+
+    def load_round_ledger(self, chat_id: int, round_id: str) -> Dict[int, Dict[str, Any]]:
+        return sqlite_store.load_round_ledger(chat_id, round_id, manager=self.manager)
+
+    # ---------- Warm start ----------
+    def load_all_sessions(self, since: Optional[str] = None) -> Dict[int, Dict[str, Any]]:
+        return sqlite_store.load_all_sessions(since, manager=self.manager)
+
+    def load_all_stats(self, chat_ids: Optional[list[int]] = None) -> Dict[int, Dict[str, Any]]:
+        return sqlite_store.load_all_stats(chat_ids, manager=self.manager)
+
+    def load_all_last_results(self, since: Optional[str] = None) -> Dict[int, Dict[str, Any]]:
+        return sqlite_store.load_all_last_results(since, manager=self.manager)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return sqlite_store._resolve(self.manager).get_metrics()
+
+    def close(self) -> None:
+        sqlite_store._resolve(self.manager).close_all()
+
+
+class ShardedSQLiteBackend:
+    """
+    Chia dữ liệu ra N file SQLite theo hash của chat_id.
+
+    Mọi dữ liệu của một chat nằm trọn trong một shard, nên transaction của
+    từng chat vẫn nguyên vẹn; một lô ghi nhiều chat được tách thành một
+    transaction cho mỗi shard.
+    """
+
+    def __init__(self, base_path: Path, shards: int, **options: Any):
+        if shards < 1:
+            raise ValueError("Số shard phải >= 1")
+        base_path = Path(base_path)
+        self.paths = [
+            base_path.with_name(f"{base_path.stem}.shard{i}{base_path.suffix}")
+            for i in range(shards)
+        ]
+        self.shards = [SQLiteBackend.from_path(path, **options) for path in self.paths]
+
+    def shard_index(self, chat_id: int) -> int:
+        """Shard của một chat (crc32 ổn định giữa các lần chạy, khác với hash())."""
+        return zlib.crc32(str(chat_id).encode()) % len(self.shards)
+
+    def _shard(self, chat_id: int) -> SQLiteBackend:
+        return self.shards[self.shard_index(chat_id)]
+
+    def init(self) -> None:
+        for shard in self.shards:
+            shard.init()
+
+    # ---------- Session ----------
+    def load_session(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        return self._shard(chat_id).load_session(chat_id)
+
+    def save_sessions_batch(self, writes: list[tuple[int, Optional[Dict[str, Any]]]]) -> None:
+        by_shard: Dict[int, list] = {}
+        for chat_id, write in writes:
+            by_shard.setdefault(self.shard_index(chat_id), []).append((chat_id, write))
+        for index, shard_writes in by_shard.items():
+            self.shards[index].save_sessions_batch(shard_writes)
+
+    def load_spins(
+        self, chat_id: int, game_id: str, since_seq: int = 0, limit: Optional[int] = None
+    ) -> list[Dict[str, Any]]:
+        return self._shard(chat_id).load_spins(chat_id, game_id, since_seq, limit)
+
+    def count_spins(self, chat_id: int, game_id: str, since_seq: int = 0) -> int:
+        return self._shard(chat_id).count_spins(chat_id, game_id, since_seq)
+
+    # ---------- Stats ----------
+    def load_stats(self, chat_id: int) -> Dict[str, Dict[int, Dict[str, Any]]]:
+        return self._shard(chat_id).load_stats(chat_id)
+
+    def apply_stat_deltas(
+        self, chat_id: int, deltas: Dict[str, Dict[int, float]], names: Optional[Dict[int, str]] = None
+    ) -> None:
+        self._shard(chat_id).apply_stat_deltas(chat_id, deltas, names)
+
+    def reset_stats(self, chat_id: int, stat_type: Optional[str] = None) -> None:
+        self._shard(chat_id).reset_stats(chat_id, stat_type)
+
+    def delete_user_stats(self, chat_id: int, user_id: int, stat_type: str = "wins") -> None:
+        self._shard(chat_id).delete_user_stats(chat_id, user_id, stat_type)
+
+    # ---------- Last result ----------
+    def save_last_result(self, chat_id: int, data: Dict[str, Any]) -> None:
+        self._shard(chat_id).save_last_result(chat_id, data)
+
+    def load_last_result(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        return self._shard(chat_id).load_last_result(chat_id)
+
+    # ---------- Active rounds ----------
+    def save_active_round(self, chat_id: int, round_data: Dict[str, Any]) -> None:
+        self._shard(chat_id).save_active_round(chat_id, round_data)
+
+    def load_all_active_rounds(self) -> Dict[int, Dict[str, Any]]:
+        rounds: Dict[int, Dict[str, Any]] = {}
+        for shard in self.shards:
+            rounds.update(shard.load_all_active_rounds())
+        return rounds
+
+    def delete_active_round_row(self, chat_id: int) -> None:
+        self._shard(chat_id).delete_active_round_row(chat_id)
+
+    # ---------- Auto spin ----------
+    def save_auto_spin(self, chat_id: int, schedule: Dict[str, Any]) -> None:
+        self._shard(chat_id).save_auto_spin(chat_id, schedule)
+
+    def load_all_auto_spins(self) -> Dict[int, Dict[str, Any]]:
+        schedules: Dict[int, Dict[str, Any]] = {}
+        for shard in self.shards:
+            schedules.update(shard.load_all_auto_spins())
+        return schedules
+
+    def delete_auto_spin(self, chat_id: int) -> None:
+        self._shard(chat_id).delete_auto_spin(chat_id)
+
+    def save_game_record(
+        self,
+        chat_id: int,
+        round_id: str,
+        record: Dict[str, Any],
+        token_deltas: Optional[Dict[int, Dict[str, Any]]] = None,
+    ) -> None:
+        self._shard(chat_id).save_game_record(chat_id, round_id, record, token_deltas)
+
+    def load_round_games(self, chat_id: int, round_id: str) -> list[Dict[str, Any]]:
+        return self._shard(chat_id).load_round_games(chat_id, round_id)
+
+    def apply_round_ledger_deltas(self, chat_id: int, round_id: str, deltas: Dict[int, Dict[str, Any]]) -> None:
+        self._shard(chat_id).apply_round_ledger_deltas(chat_id, round_id, deltas)
+
+    def load_round_ledger(self, chat_id: int, round_id: str) -> Dict[int, Dict[str, Any]]:
+        return self._shard(chat_id).load_round_ledger(chat_id, round_id)
+
+    # ---------- Warm start ----------
+    def load_all_sessions(self, since: Optional[str] = None) -> Dict[int, Dict[str, Any]]:
+        sessions: Dict[int, Dict[str, Any]] = {}
+        for shard in self.shards:
+            sessions.update(shard.load_all_sessions(since))
+        return sessions
+
+    def load_all_stats(self, chat_ids: Optional[list[int]] = None) -> Dict[int, Dict[str, Any]]:
+        if chat_ids is None:
+            by_shard: Dict[int, Optional[list]] = {i: None for i in range(len(self.shards))}
+        else:
+            by_shard = {}
+            for chat_id in chat_ids:
+                by_shard.setdefault(self.shard_index(chat_id), []).append(chat_id)
+        result: Dict[int, Dict[str, Any]] = {}
+        for index, ids in by_shard.items():
+            result.update(self.shards[index].load_all_stats(ids))
+        return result
+
+    def load_all_last_results(self, since: Optional[str] = None) -> Dict[int, Dict[str, Any]]:
+        results: Dict[int, Dict[str, Any]] = {}
+        for shard in self.shards:
+            results.update(shard.load_all_last_results(since))
+        return results
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {str(path.name): shard.get_metrics() for path, shard in zip(self.paths, self.shards)}
+
+    def close(self) -> None:
+        for shard in self.shards:
+            shard.close()
+
+
+# Backend mặc định: file SQLite của sqlite_store
+_backend: StorageBackend = SQLiteBackend()
+
+
+def get_backend() -> StorageBackend:
+    """Backend đang dùng cho toàn bộ bot."""
+    return _backend
+
+
+def set_backend(backend: StorageBackend) -> StorageBackend:
+    """Đổi backend mặc định, trả về backend cũ."""
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
@@ -0,0 +1,374 @@
+"""
+Migration schema SQLite theo phiên bản.
+
+Bảng `schema_version` ghi lại các bước đã chạy. Mỗi bước (`Migration`) có số
+phiên bản tăng dần, chạy các câu lệnh DDL của nó trong một transaction cùng với
+dòng ghi nhận phiên bản, nên một bước hoặc chạy hết hoặc không chạy gì.
+
+Bước nào cần điền dữ liệu cho cột mới (backfill) thì làm theo từng lô nhỏ, mỗi
+lô một transaction riêng: bot vẫn ghi được giữa các lô, và nếu bị dừng giữa
+chừng thì lần khởi động sau sẽ làm tiếp (`backfill_done = 0`).
+
+Chạy tay (xem trước bằng --dry-run, không thay đổi DB):
+    python -m src.db.migrations [--db src/loto.db] [--dry-run]
+"""
+import argparse
+import logging
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from src.db import sqlite_store
+from src.db.sqlite_store import ConnectionManager
+
+logger = logging.getLogger(__name__)
+
+# Số dòng mỗi lô backfill (mỗi lô một transaction)
+BACKFILL_BATCH_SIZE = 500
+
+
+class Migration(NamedTuple):
+    """Một bước nâng cấp schema."""
+    version: int
+    name: str
+    statements: tuple[str, ...]
+    # backfill(cur, limit) -> số dòng đã xử lý; trả về < limit nghĩa là đã xong
+    backfill: Optional[Callable[[sqlite3.Cursor, int], int]] = None
+    # Bảng được backfill và điều kiện chọn các dòng còn thiếu (để ước lượng khi dry-run)
+    backfill_table: Optional[str] = None
+    backfill_where: Optional[str] = None
+
+
+# ---------- Các bước ----------
+
+# v1: schema gốc (trước khi có migration, init_db chỉ chạy các câu lệnh này)
+_BASELINE = (
+    # Lưu phần meta của WheelSession theo chat_id (nhị phân hoặc JSON)
+    """
+    CREATE TABLE IF NOT EXISTS sessions (
+        chat_id INTEGER PRIMARY KEY,
+        session_json TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    """,
+    # Các phần con của session (chuẩn hoá, xem phần "Session" trong sqlite_store)
+    """
+    CREATE TABLE IF NOT EXISTS session_participants (
+        chat_id INTEGER NOT NULL,
+        pos INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        name TEXT,
+        PRIMARY KEY (chat_id, pos)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS session_tickets (
+        chat_id INTEGER NOT NULL,
+        ticket_code TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        PRIMARY KEY (chat_id, ticket_code)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS session_waiters (
+        chat_id INTEGER NOT NULL,
+        number INTEGER NOT NULL,
+        pos INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        name TEXT,
+        PRIMARY KEY (chat_id, number, pos)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS session_winners (
+        chat_id INTEGER NOT NULL,
+        pos INTEGER NOT NULL,
+        user_id INTEGER,
+        name TEXT,
+        numbers_json TEXT NOT NULL,
+        time TEXT,
+        PRIMARY KEY (chat_id, pos)
+    ) WITHOUT ROWID
+    """,
+    # Lượt quay append-only theo game (giữ lại sau khi game kết thúc)
+    """
+    CREATE TABLE IF NOT EXISTS spins (
+        chat_id INTEGER NOT NULL,
+        game_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        number INTEGER NOT NULL,
+        ts INTEGER, -- epoch giây
+        PRIMARY KEY (chat_id, game_id, seq)
+    ) WITHOUT ROWID
+    """,
+    # Lịch sử các game đã kết thúc trong từng vòng chơi
+    """
+    CREATE TABLE IF NOT EXISTS games (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        round_id TEXT NOT NULL,
+        game_name TEXT,
+        host_name TEXT,
+        participants_json TEXT NOT NULL,
+        winners_json TEXT NOT NULL,
+        numbers_drawn INTEGER NOT NULL DEFAULT 0,
+        ended_at TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_games_chat_round ON games(chat_id, round_id, id)",
+    # Sổ token cộng dồn của từng vòng chơi (cập nhật mỗi khi một game kết thúc)
+    """
+    CREATE TABLE IF NOT EXISTS round_ledger (
+        chat_id INTEGER NOT NULL,
+        round_id TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        name TEXT,
+        token REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (chat_id, round_id, user_id)
+    ) WITHOUT ROWID
+    """,
+    # Lưu thống kê leaderboard theo chat + user
+    """
+    CREATE TABLE IF NOT EXISTS stats (
+        chat_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        type TEXT NOT NULL, -- 'wins' hoặc 'participations'
+        count REAL NOT NULL,
+        name TEXT,
+        PRIMARY KEY (chat_id, user_id, type)
+    )
+    """,
+    # Lưu vòng chơi đang hoạt động theo chat
+    """
+    CREATE TABLE IF NOT EXISTS active_rounds (
+        chat_id INTEGER PRIMARY KEY,
+        round_data_json TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    """,
+    # Lưu kết quả game gần nhất theo chat
+    """
+    CREATE TABLE IF NOT EXISTS last_results (
+        chat_id INTEGER PRIMARY KEY,
+        data_json TEXT NOT NULL,
+        saved_at TEXT NOT NULL
+    )
+    """,
+)
+
+
+def _backfill_session_columns(cur: sqlite3.Cursor, limit: int) -> int:
+    """Điền sessions.game_id/history_base từ meta đã lưu cho tối đa `limit` dòng."""
+    cur.execute(
+        "SELECT chat_id, session_json FROM sessions WHERE history_base IS NULL LIMIT ?",
+        (limit,),
+    )
+    rows = cur.fetchall()
+    updates = []
+    for chat_id, raw in rows:
+        try:
+            meta = sqlite_store.decode_meta(raw)
+        except ValueError:
+            # Meta hỏng: vẫn đánh dấu để không quét lại mãi, load_session sẽ xử lý
+            meta = {}
+        history = meta.get("history") or []
+        spin_seq = int(meta.get("spin_seq", len(history)))
+        updates.append((meta.get("id"), int(meta.get("history_base", spin_seq - len(history))), chat_id))
+    cur.executemany("UPDATE sessions SET game_id = ?, history_base = ? WHERE chat_id = ?", updates)
+    return len(rows)
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(1, "baseline", _BASELINE),
+    # Warm start lọc theo thời gian cập nhật
+    Migration(2, "warm_start_indexes", (
+        "CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at)",
+        "CREATE INDEX IF NOT EXISTS idx_last_results_saved_at ON last_results(saved_at)",
+    )),
+    # game_id/history_base ra cột riêng để JOIN thẳng với spins, khỏi giải mã meta
+    Migration(
+        3,
+        "session_game_columns",
+        (
+            "ALTER TABLE sessions ADD COLUMN game_id TEXT",
+            "ALTER TABLE sessions ADD COLUMN history_base INTEGER",
+        ),
+        backfill=_backfill_session_columns,
+        backfill_table="sessions",
+        backfill_where="history_base IS NULL",
+    ),
+    # Lịch tự động quay (/tu_dong), khôi phục khi restart
+    Migration(4, "auto_spins", (
+        """
+        CREATE TABLE IF NOT EXISTS auto_spins (
+            chat_id INTEGER PRIMARY KEY,
+            interval_seconds REAL NOT NULL,
+            schedule_json TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """,
+    )),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+# ---------- Runner ----------
+
+def _ensure_version_table(cur: sqlite3.Cursor) -> None:
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL,
+            backfill_done INTEGER NOT NULL DEFAULT 1
+        )
+        """
+    )
+
+
+def _table_exists(cur: sqlite3.Cursor, name: str) -> bool:
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+    return cur.fetchone() is not None
+
+
+def _applied(cur: sqlite3.Cursor) -> Dict[int, bool]:
+    """{version: backfill_done} của các bước đã chạy."""
+    if not _table_exists(cur, "schema_version"):
+        return {}
+    cur.execute("SELECT version, backfill_done FROM schema_version")
+    return {row[0]: bool(row[1]) for row in cur.fetchall()}
+
+
+def get_schema_version(*, manager: Optional[ConnectionManager] = None) -> int:
+    """Phiên bản schema hiện tại (0 nếu DB chưa từng chạy migration)."""
+    return max(_applied((manager or sqlite_store.get_manager()).cursor()), default=0)
+
+
+def _pending_rows(cur: sqlite3.Cursor, migration: Migration, applied: bool) -> int:
+    """Ước lượng số dòng cần backfill của một bước."""
+    if migration.backfill is None or not _table_exists(cur, migration.backfill_table):
+        return 0
+    if applied:
+        cur.execute(f"SELECT COUNT(*) FROM {migration.backfill_table} WHERE {migration.backfill_where}")
+    else:
+        cur.execute(f"SELECT COUNT(*) FROM {migration.backfill_table}")
+    return cur.fetchone()[0]
+
+
+def _summary(statement: str) -> str:
+    """Câu lệnh SQL trên một dòng (bỏ comment `--`) để in trong báo cáo."""
+    lines = (line.split("--", 1)[0] for line in statement.splitlines())
+    return " ".join(" ".join(lines).split())
+
+
+def _run_backfill(mgr: ConnectionManager, migration: Migration, batch_size: int) -> int:
+    """Backfill theo lô, mỗi lô một transaction; đánh dấu xong ở lô cuối."""
+    total = 0
+    while True:
+        with mgr.transaction() as cur:
+            done = migration.backfill(cur, batch_size)
+            if done < batch_size:
+                cur.execute(
+                    "UPDATE schema_version SET backfill_done = 1 WHERE version = ?",
+                    (migration.version,),
+                )
+        total += done
+        if done < batch_size:
+            return total
+
+
+def run_migrations(
+    *,
+    manager: Optional[ConnectionManager] = None,
+    dry_run: bool = False,
+    batch_size: int = BACKFILL_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Đưa schema lên LATEST_VERSION.
+
+    Args:
+        manager: ConnectionManager của DB cần nâng cấp (mặc định: của sqlite_store)
+        dry_run: Chỉ báo cáo các bước sẽ chạy, không thay đổi DB
+        batch_size: Số dòng mỗi lô backfill
+
+    Returns:
+        {"from_version", "to_version", "dry_run", "steps": [...]}, mỗi step gồm
+        version, name, statements, backfill_rows (dry-run: ước lượng; còn lại:
+        số dòng đã backfill).
+    """
+    mgr = manager or sqlite_store.get_manager()
+    cur = mgr.cursor()
+    applied = _applied(cur)
+    from_version = max(applied, default=0)
+    report: Dict[str, Any] = {"from_version": from_version, "to_version": from_version, "dry_run": dry_run, "steps": []}
+
+    for migration in MIGRATIONS:
+        is_applied = migration.version in applied
+        if is_applied and applied[migration.version]:
+            continue
+        step = {
+            "version": migration.version,
+            "name": migration.name,
+            "statements": [] if is_applied else [_summary(s) for s in migration.statements],
+            "backfill_rows": 0,
+        }
+        report["steps"].append(step)
+
+        if dry_run:
+            step["backfill_rows"] = _pending_rows(cur, migration, is_applied)
+            report["to_version"] = migration.version
+            continue
+
+        if not is_applied:
+            started = datetime.now().isoformat(timespec="seconds")
+            with mgr.transaction() as tx:
+                _ensure_version_table(tx)
+                for statement in migration.statements:
+                    tx.execute(statement)
+                tx.execute(
+                    "INSERT INTO schema_version(version, name, applied_at, backfill_done) VALUES (?, ?, ?, ?)",
+                    (migration.version, migration.name, started, int(migration.backfill is None)),
+                )
+            logger.info(f"Schema v{migration.version} ({migration.name}) đã áp dụng cho {mgr.db_path}")
+
+        if migration.backfill is not None:
+            step["backfill_rows"] = _run_backfill(mgr, migration, batch_size)
+            if step["backfill_rows"]:
+                logger.info(f"Schema v{migration.version}: backfill {step['backfill_rows']} dòng")
+        report["to_version"] = migration.version
+
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Nâng cấp schema SQLite của bot")
+    parser.add_argument("--db", type=Path, default=sqlite_store.DB_PATH, help="Đường dẫn file DB")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ liệt kê các bước sẽ chạy")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.dry_run and not args.db.exists():
+        print(f"{args.db} chưa tồn tại: sẽ được tạo mới ở schema v{LATEST_VERSION}.")
+        return
+
+    manager = ConnectionManager(args.db)
+    try:
+        report = run_migrations(manager=manager, dry_run=args.dry_run, batch_size=args.batch_size)
+    finally:
+        manager.close_all()
+
+    action = "Sẽ nâng cấp" if args.dry_run else "Đã nâng cấp"
+    print(f"{args.db}: schema v{report['from_version']} -> v{report['to_version']} (mới nhất: v{LATEST_VERSION})")
+    if not report["steps"]:
+        print("Không có bước nào cần chạy.")
+    for step in report["steps"]:
+        print(f"{action} v{step['version']} {step['name']}: backfill {step['backfill_rows']} dòng")
+        for statement in step["statements"]:
+            print(f"    {statement}")
+
+
+if __name__ == "__main__":
+    main()
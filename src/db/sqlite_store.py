@@ -1,126 +1,668 @@
+import logging
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
 from pathlib import Path
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterator, Optional, Union
 import json
 
+from src.models.session_codec import CodecError, decode_session, encode_session, is_encoded
+from src.models.spin_history import SpinHistory
+
+logger = logging.getLogger(__name__)
 
 # Đường dẫn file SQLite trong project
 DB_PATH = Path(__file__).parent.parent / "loto.db"
 
+# Cấu hình PRAGMA áp dụng một lần cho mỗi connection
+JOURNAL_MODE = "WAL"
+SYNCHRONOUS = "NORMAL"  # An toàn với WAL, bớt fsync so với FULL
+CACHE_SIZE_KIB = 8192  # ~8MB page cache
+MMAP_SIZE = 64 * 1024 * 1024  # 64MB memory-mapped I/O
+CACHED_STATEMENTS = 128  # Số prepared statement giữ lại trên mỗi connection
 
-def get_connection() -> sqlite3.Connection:
-    """Tạo connection đến SQLite DB."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
 
+class ConnectionManager:
+    """
+    Quản lý connection SQLite sống lâu (mỗi thread một connection).
 
-def init_db() -> None:
-    """Khởi tạo các bảng cần thiết nếu chưa tồn tại."""
-    conn = get_connection()
-    cur = conn.cursor()
+    Connection được mở một lần, cấu hình PRAGMA một lần và tái sử dụng cho
+    mọi lời gọi, nhờ vậy sqlite3 giữ được cache prepared statement giữa các
+    lần gọi. Manager cũng đếm số connection đã mở, số commit và thời gian
+    của từng hàm truy cập DB.
+    """
 
-    # Lưu WheelSession theo chat_id, dạng JSON
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS sessions (
-            chat_id INTEGER PRIMARY KEY,
-            session_json TEXT NOT NULL,
-            updated_at TEXT NOT NULL
-        )
-        """
-    )
+    def __init__(
+        self,
+        db_path: Path,
+        journal_mode: str = JOURNAL_MODE,
+        synchronous: str = SYNCHRONOUS,
+        cache_size_kib: int = CACHE_SIZE_KIB,
+        mmap_size: int = MMAP_SIZE,
+        cached_statements: int = CACHED_STATEMENTS,
+    ):
+        self.db_path = db_path
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
 
-    # Lưu thống kê leaderboard theo chat + user
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS stats (
-            chat_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            type TEXT NOT NULL, -- 'wins' hoặc 'participations'
-            count REAL NOT NULL,
-            name TEXT,
-            PRIMARY KEY (chat_id, user_id, type)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+
+        self.connections_opened = 0
+        self.commits = 0
+        self.rollbacks = 0
+        # {tên_hàm: {"calls": int, "total_ms": float, "max_ms": float}}
+        self.call_stats: Dict[str, Dict[str, float]] = {}
+
+    def _open(self) -> sqlite3.Connection:
+        """Mở connection mới và cấu hình PRAGMA."""
+        conn = sqlite3.connect(
+            self.db_path,
+            isolation_level=None,  # Tự quản lý BEGIN/COMMIT
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
         )
-        """
-    )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
 
-    # Lưu vòng chơi đang hoạt động theo chat
-    cur.execute(
+        with self._lock:
+            self._connections.append(conn)
+            self.connections_opened += 1
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Trả về connection của thread hiện tại (mở nếu chưa có)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
         """
-        CREATE TABLE IF NOT EXISTS active_rounds (
-            chat_id INTEGER PRIMARY KEY,
-            round_data_json TEXT NOT NULL,
-            created_at TEXT NOT NULL
-        )
+        Mở transaction ghi. Lồng nhau được: chỉ transaction ngoài cùng
+        mới COMMIT/ROLLBACK, nên nhiều thao tác có thể gom vào một commit.
         """
-    )
+        conn = self.connection()
+        outermost = self._local.depth == 0
+        if outermost:
+            conn.execute("BEGIN")
+        self._local.depth += 1
+        try:
+            yield conn.cursor()
+        except BaseException:
+            self._local.depth -= 1
+            if outermost:
+                conn.execute("ROLLBACK")
+                with self._lock:
+                    self.rollbacks += 1
+            raise
+        self._local.depth -= 1
+        if outermost:
+            try:
+                conn.execute("COMMIT")
+            except BaseException:
+                # COMMIT lỗi (vd: SQLITE_BUSY) để transaction còn mở trên connection
+                # của thread; rollback để các BEGIN sau không bị kẹt
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                with self._lock:
+                    self.rollbacks += 1
+                raise
+            with self._lock:
+                self.commits += 1
 
-    # Lưu kết quả game gần nhất theo chat
-    cur.execute(
+    @contextmanager
+    def snapshot(self) -> Iterator[sqlite3.Cursor]:
         """
-        CREATE TABLE IF NOT EXISTS last_results (
-            chat_id INTEGER PRIMARY KEY,
-            data_json TEXT NOT NULL,
-            saved_at TEXT NOT NULL
-        )
+        Transaction chỉ đọc (BEGIN DEFERRED): nhiều truy vấn cùng thấy một
+        snapshot của WAL mà không giữ khoá ghi. Trong transaction ghi đang mở
+        thì dùng luôn transaction đó.
         """
-    )
+        conn = self.connection()
+        if self._local.depth or conn.in_transaction:
+            yield conn.cursor()
+            return
+        conn.execute("BEGIN DEFERRED")
+        try:
+            yield conn.cursor()
+        finally:
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+
+    def cursor(self) -> sqlite3.Cursor:
+        """Cursor cho các truy vấn chỉ đọc (autocommit)."""
+        return self.connection().cursor()
+
+    def record_call(self, name: str, elapsed: float) -> None:
+        """Ghi nhận thời gian thực thi của một hàm truy cập DB."""
+        elapsed_ms = elapsed * 1000.0
+        with self._lock:
+            entry = self.call_stats.setdefault(name, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Trả về snapshot các bộ đếm (connections, commits, thời gian theo hàm)."""
+        with self._lock:
+            return {
+                "db_path": str(self.db_path),
+                "connections_opened": self.connections_opened,
+                "open_connections": len(self._connections),
+                "commits": self.commits,
+                "rollbacks": self.rollbacks,
+                "calls": {name: dict(entry) for name, entry in self.call_stats.items()},
+            }
+
+    def reset_metrics(self) -> None:
+        """Đặt lại các bộ đếm thời gian/commit (không đóng connection)."""
+        with self._lock:
+            self.commits = 0
+            self.rollbacks = 0
+            self.call_stats.clear()
+
+    def close_all(self) -> None:
+        """Đóng mọi connection đã mở (dùng khi tắt bot hoặc trong test)."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+_manager = ConnectionManager(DB_PATH)
+
+
+def configure(db_path: Path, **options: Any) -> ConnectionManager:
+    """Đổi file DB (vd: dùng file tạm trong test). Đóng các connection cũ."""
+    global _manager
+    _manager.close_all()
+    _manager = ConnectionManager(Path(db_path), **options)
+    return _manager
 
-    conn.commit()
-    conn.close()
+
+def get_manager() -> ConnectionManager:
+    """Trả về ConnectionManager đang dùng."""
+    return _manager
+
+
+def get_db_metrics() -> Dict[str, Any]:
+    """Các bộ đếm của ConnectionManager hiện tại."""
+    return _manager.get_metrics()
+
+
+def _resolve(manager: Optional[ConnectionManager]) -> ConnectionManager:
+    """Manager được truyền vào (backend riêng) hoặc manager mặc định của module."""
+    return manager if manager is not None else _manager
+
+
+def _timed(func: Callable) -> Callable:
+    """Đo thời gian mỗi lần gọi hàm truy cập DB và ghi vào manager."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _resolve(kwargs.get("manager")).record_call(func.__name__, time.perf_counter() - started)
+    return wrapper
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Trả về connection dùng chung của thread hiện tại.
+
+    Connection do ConnectionManager quản lý, không được close() sau khi dùng.
+    """
+    return _manager.connection()
+
+
+@_timed
+def init_db(*, manager: Optional[ConnectionManager] = None) -> None:
+    """Tạo/nâng cấp schema lên phiên bản mới nhất (xem `src.db.migrations`)."""
+    from src.db.migrations import run_migrations
+
+    run_migrations(manager=_resolve(manager))
 
 
 # ---------- Session ----------
-def save_session(chat_id: int, session_dict: Dict[str, Any]) -> None:
-    """Lưu (hoặc cập nhật) session cho một chat."""
-    conn = get_connection()
-    cur = conn.cursor()
-    now = datetime.now().isoformat(timespec="seconds")
+# Session được lưu chuẩn hoá: `sessions.session_json` chỉ còn phần meta (khoảng
+# số, trạng thái, pool số...), còn người chơi, vé, người đợi số, người thắng và
+# các lượt quay nằm ở bảng riêng. Lượt quay là append-only theo
+# (chat_id, game_id, seq) nên mỗi lần /quay chỉ là một INSERT nhỏ.
+# Meta được lưu bằng mã hoá nhị phân gọn (`src.models.session_codec`, cột
+# session_json khi đó chứa BLOB); nếu không mã hoá được thì lưu JSON như cũ.
+SESSION_STORAGE_VERSION = 2
+COMPACT_SESSION_META = True
+
+# Các khoá của WheelSession.to_dict() được tách ra bảng riêng
+_CHILD_KEYS = ("history", "participants", "tickets", "user_tickets", "waiting_numbers", "winners")
+_CHILD_PARTS = ("participants", "tickets", "waiters", "winners")
+
+
+def _iso_to_epoch(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def _epoch_to_iso(value: Optional[int]) -> str:
+    if value is None:
+        return ""
+    return datetime.fromtimestamp(value).isoformat(timespec="seconds")
+
+
+def split_session_dict(
+    session_dict: Dict[str, Any],
+    history: Optional[SpinHistory] = None,
+    after_seq: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Tách dict của WheelSession thành các phần lưu ở từng bảng.
+
+    Args:
+        session_dict: Kết quả của WheelSession.to_dict()
+        history: `spin_history` của session khi to_dict(include_history=False);
+            lượt quay được lấy thẳng từ ring buffer thay vì từ list dict
+        after_seq: Chỉ lấy các lượt seq > after_seq (dùng với `history`)
+
+    Returns:
+        {"game_id", "meta", "participants", "tickets", "waiters", "winners", "spins"}
+        trong đó các phần con là list tuple sẵn sàng cho executemany.
+    """
+    if history is not None:
+        spin_seq = int(session_dict["spin_seq"])
+        history_base = spin_seq - len(history)
+        spins = history.rows(history_base, after_seq)
+    else:
+        items = session_dict.get("history") or []
+        spin_seq = int(session_dict.get("spin_seq", len(items)))
+        history_base = spin_seq - len(items)
+        spins = [
+            (history_base + i + 1, item.get("number"), _iso_to_epoch(item.get("time")))
+            for i, item in enumerate(items)
+        ]
+
+    meta = {k: v for k, v in session_dict.items() if k not in _CHILD_KEYS}
+    meta["spin_seq"] = spin_seq
+    meta["history_base"] = history_base
+    meta["storage_version"] = SESSION_STORAGE_VERSION
 
+    participants = [
+        (pos, int(p["user_id"]), p.get("name"))
+        for pos, p in enumerate(session_dict.get("participants") or [])
+        if p.get("user_id") is not None
+    ]
+    tickets = [
+        (code, int(uid))
+        for code, uid in (session_dict.get("tickets") or {}).items()
+        if uid is not None
+    ]
+    waiters = []
+    for number, users in (session_dict.get("waiting_numbers") or {}).items():
+        for pos, (uid, name) in enumerate(users):
+            waiters.append((int(number), pos, int(uid), name))
+    winners = [
+        (
+            pos,
+            int(w["user_id"]) if w.get("user_id") is not None else None,
+            w.get("name"),
+            json.dumps(w.get("numbers") or []),
+            w.get("time"),
+        )
+        for pos, w in enumerate(session_dict.get("winners") or [])
+    ]
+    return {
+        "game_id": session_dict.get("id"),
+        "meta": meta,
+        "participants": participants,
+        "tickets": tickets,
+        "waiters": waiters,
+        "winners": winners,
+        "spins": spins,
+    }
+
+
+def build_session_write(
+    session_dict: Dict[str, Any],
+    previous: Optional[Dict[str, Any]] = None,
+    history: Optional[SpinHistory] = None,
+) -> tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Chuẩn bị một lần ghi session.
+
+    Args:
+        session_dict: Kết quả của WheelSession.to_dict()
+        previous: Trạng thái đã ghi lần trước (giá trị trả về thứ hai của lần
+            gọi trước). None nghĩa là ghi đầy đủ.
+        history: `spin_history` của session nếu session_dict không có
+            'history' (to_dict(include_history=False)); khi đó mỗi lượt /quay
+            chỉ chép các lượt mới, không dựng lại cả lịch sử
+
+    Returns:
+        (write, state): `write` chỉ chứa meta, các bảng con đã thay đổi và các
+        lượt quay mới; `state` dùng làm `previous` cho lần ghi sau.
+    """
+    game_id = session_dict.get("id")
+    same_game = previous is not None and previous.get("game_id") == game_id
+    parts = split_session_dict(session_dict, history, previous["last_seq"] if same_game else None)
+    last_seq = parts["meta"]["spin_seq"]
+    write: Dict[str, Any] = {"game_id": game_id, "meta": parts["meta"]}
+    for name in _CHILD_PARTS:
+        if not same_game or previous.get(name) != parts[name]:
+            write[name] = parts[name]
+
+    if same_game:
+        write["spins"] = [s for s in parts["spins"] if s[0] > previous["last_seq"]]
+    else:
+        write["spins"] = parts["spins"]
+
+    state = {name: parts[name] for name in _CHILD_PARTS}
+    state["game_id"] = game_id
+    state["last_seq"] = last_seq
+    return write, state
+
+
+def encode_meta(meta: Dict[str, Any]) -> Union[bytes, str]:
+    """Meta của session -> BLOB nhị phân, hoặc JSON nếu codec không hỗ trợ."""
+    if COMPACT_SESSION_META:
+        try:
+            return encode_session(meta)
+        except CodecError:
+            pass
+    return json.dumps(meta, ensure_ascii=False)
+
+
+def decode_meta(raw: Union[bytes, str]) -> Dict[str, Any]:
+    """Đọc meta đã lưu (nhị phân hoặc JSON của các bản cũ)."""
+    if is_encoded(raw):
+        return decode_session(raw)
+    return json.loads(raw)
+
+
+def _apply_session_write(cur: sqlite3.Cursor, chat_id: int, write: Dict[str, Any], now: str) -> None:
+    """Ghi một write (từ build_session_write) bằng cursor đang trong transaction."""
     cur.execute(
         """
-        INSERT INTO sessions(chat_id, session_json, updated_at)
-        VALUES (?, ?, ?)
+        INSERT INTO sessions(chat_id, session_json, updated_at, game_id, history_base)
+        VALUES (?, ?, ?, ?, ?)
         ON CONFLICT(chat_id) DO UPDATE SET
             session_json = excluded.session_json,
-            updated_at   = excluded.updated_at
+            updated_at   = excluded.updated_at,
+            game_id      = excluded.game_id,
+            history_base = excluded.history_base
         """,
-        (chat_id, json.dumps(session_dict, ensure_ascii=False), now),
+        (chat_id, encode_meta(write["meta"]), now, write["game_id"], write["meta"]["history_base"]),
     )
 
-    conn.commit()
-    conn.close()
+    if "participants" in write:
+        cur.execute("DELETE FROM session_participants WHERE chat_id = ?", (chat_id,))
+        cur.executemany(
+            "INSERT INTO session_participants(chat_id, pos, user_id, name) VALUES (?, ?, ?, ?)",
+            [(chat_id, *row) for row in write["participants"]],
+        )
+    if "tickets" in write:
+        cur.execute("DELETE FROM session_tickets WHERE chat_id = ?", (chat_id,))
+        cur.executemany(
+            "INSERT INTO session_tickets(chat_id, ticket_code, user_id) VALUES (?, ?, ?)",
+            [(chat_id, *row) for row in write["tickets"]],
+        )
+    if "waiters" in write:
+        cur.execute("DELETE FROM session_waiters WHERE chat_id = ?", (chat_id,))
+        cur.executemany(
+            "INSERT INTO session_waiters(chat_id, number, pos, user_id, name) VALUES (?, ?, ?, ?, ?)",
+            [(chat_id, *row) for row in write["waiters"]],
+        )
+    if "winners" in write:
+        cur.execute("DELETE FROM session_winners WHERE chat_id = ?", (chat_id,))
+        cur.executemany(
+            "INSERT INTO session_winners(chat_id, pos, user_id, name, numbers_json, time) VALUES (?, ?, ?, ?, ?, ?)",
+            [(chat_id, *row) for row in write["winners"]],
+        )
+    if write.get("spins"):
+        cur.executemany(
+            "INSERT OR IGNORE INTO spins(chat_id, game_id, seq, number, ts) VALUES (?, ?, ?, ?, ?)",
+            [(chat_id, write["game_id"], *row) for row in write["spins"]],
+        )
+
+
+def _delete_session_rows(cur: sqlite3.Cursor, chat_id: int) -> None:
+    """Xoá session và các bảng con (giữ lại bảng spins làm lịch sử game)."""
+    cur.execute("DELETE FROM sessions WHERE chat_id = ?", (chat_id,))
+    cur.execute("DELETE FROM session_participants WHERE chat_id = ?", (chat_id,))
+    cur.execute("DELETE FROM session_tickets WHERE chat_id = ?", (chat_id,))
+    cur.execute("DELETE FROM session_waiters WHERE chat_id = ?", (chat_id,))
+    cur.execute("DELETE FROM session_winners WHERE chat_id = ?", (chat_id,))
+
+
+def assemble_session_dict(parts: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Dựng lại dict của WheelSession từ các phần đã tách (ngược với
+    `split_session_dict`). `spins` chỉ gồm các lượt seq > history_base,
+    theo thứ tự quay.
+    """
+    meta = parts["meta"]
+    data = {k: v for k, v in meta.items() if k not in ("history_base", "storage_version")}
+
+    data["participants"] = [
+        {"user_id": user_id, "name": name}
+        for _, user_id, name in sorted(parts.get("participants") or [], key=lambda r: r[0])
+    ]
+
+    tickets = {code: user_id for code, user_id in parts.get("tickets") or []}
+    data["tickets"] = tickets
+    data["user_tickets"] = {uid: code for code, uid in tickets.items()}
+
+    waiting: Dict[int, list] = {}
+    for number, _, user_id, name in sorted(parts.get("waiters") or [], key=lambda r: r[:2]):
+        waiting.setdefault(number, []).append((user_id, name))
+    data["waiting_numbers"] = waiting
+
+    data["winners"] = [
+        {"user_id": user_id, "name": name, "numbers": json.loads(numbers_json), "time": time_}
+        for _, user_id, name, numbers_json, time_ in sorted(parts.get("winners") or [], key=lambda r: r[0])
+    ]
+
+    data["history"] = [
+        {"number": number, "time": _epoch_to_iso(ts)}
+        for _, number, ts in parts.get("spins") or []
+    ]
+    return data
 
 
-def load_session(chat_id: int) -> Optional[Dict[str, Any]]:
-    """Tải session cho một chat, trả về dict hoặc None."""
-    conn = get_connection()
-    cur = conn.cursor()
+def _assemble_session(cur: sqlite3.Cursor, chat_id: int, meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Đọc các bảng con của một chat rồi dựng lại dict của WheelSession."""
+    parts: Dict[str, Any] = {"meta": meta}
+
+    cur.execute("SELECT pos, user_id, name FROM session_participants WHERE chat_id = ?", (chat_id,))
+    parts["participants"] = [tuple(r) for r in cur.fetchall()]
+
+    cur.execute("SELECT ticket_code, user_id FROM session_tickets WHERE chat_id = ?", (chat_id,))
+    parts["tickets"] = [tuple(r) for r in cur.fetchall()]
+
+    cur.execute("SELECT number, pos, user_id, name FROM session_waiters WHERE chat_id = ?", (chat_id,))
+    parts["waiters"] = [tuple(r) for r in cur.fetchall()]
+
+    cur.execute(
+        "SELECT pos, user_id, name, numbers_json, time FROM session_winners WHERE chat_id = ?",
+        (chat_id,),
+    )
+    parts["winners"] = [tuple(r) for r in cur.fetchall()]
+
+    parts["spins"] = _select_spins(cur, chat_id, meta.get("id"), meta.get("history_base", 0))
+    return assemble_session_dict(parts)
+
+
+def _select_spins(
+    cur: sqlite3.Cursor,
+    chat_id: int,
+    game_id: Optional[str],
+    since_seq: int = 0,
+    limit: Optional[int] = None,
+) -> list[tuple[int, int, Optional[int]]]:
+    """Đọc các lượt quay (seq > since_seq) theo index (chat_id, game_id, seq)."""
+    if limit is None:
+        cur.execute(
+            "SELECT seq, number, ts FROM spins WHERE chat_id = ? AND game_id = ? AND seq > ? ORDER BY seq",
+            (chat_id, game_id, since_seq),
+        )
+        return [tuple(r) for r in cur.fetchall()]
+
+    # Lấy `limit` lượt mới nhất rồi đảo lại theo thứ tự tăng dần
+    cur.execute(
+        "SELECT seq, number, ts FROM spins WHERE chat_id = ? AND game_id = ? AND seq > ? ORDER BY seq DESC LIMIT ?",
+        (chat_id, game_id, since_seq, limit),
+    )
+    return [tuple(r) for r in reversed(cur.fetchall())]
+
+
+@_timed
+def save_session(
+    chat_id: int,
+    session_dict: Dict[str, Any],
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> None:
+    """Lưu (hoặc cập nhật) session cho một chat (ghi đầy đủ các bảng)."""
+    now = datetime.now().isoformat(timespec="seconds")
+    write, _ = build_session_write(session_dict)
+
+    with _resolve(manager).transaction() as cur:
+        _apply_session_write(cur, chat_id, write, now)
+
+
+@_timed
+def load_session(
+    chat_id: int,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Tải session cho một chat, trả về dict hoặc None.
+
+    Session cũ còn lưu nguyên JSON trong `session_json` sẽ được chuyển sang
+    dạng chuẩn hoá ngay ở lần tải đầu tiên.
+    """
+    cur = _resolve(manager).cursor()
     cur.execute("SELECT session_json FROM sessions WHERE chat_id = ?", (chat_id,))
     row = cur.fetchone()
-    conn.close()
 
     if not row:
         return None
 
-    return json.loads(row["session_json"])
+    meta = decode_meta(row["session_json"])
+    if meta.get("storage_version") != SESSION_STORAGE_VERSION:
+        # Dữ liệu cũ: toàn bộ session trong một blob JSON -> tách ra các bảng
+        write, _ = build_session_write(meta)
+        now = datetime.now().isoformat(timespec="seconds")
+        with _resolve(manager).transaction() as wcur:
+            _apply_session_write(wcur, chat_id, write, now)
+        meta = write["meta"]
 
+    return _assemble_session(cur, chat_id, meta)
 
-def delete_session_row(chat_id: int) -> None:
-    """Xoá session của một chat khỏi DB."""
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM sessions WHERE chat_id = ?", (chat_id,))
-    conn.commit()
-    conn.close()
+
+@_timed
+def delete_session_row(chat_id: int, *, manager: Optional[ConnectionManager] = None) -> None:
+    """Xoá session của một chat khỏi DB (lịch sử lượt quay vẫn được giữ)."""
+    with _resolve(manager).transaction() as cur:
+        _delete_session_rows(cur, chat_id)
+
+
+@_timed
+def append_spin(
+    chat_id: int,
+    game_id: str,
+    seq: int,
+    number: int,
+    ts: Optional[int] = None,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> None:
+    """Ghi thêm một lượt quay (một INSERT nhỏ)."""
+    with _resolve(manager).transaction() as cur:
+        cur.execute(
+            "INSERT OR IGNORE INTO spins(chat_id, game_id, seq, number, ts) VALUES (?, ?, ?, ?, ?)",
+            (chat_id, game_id, seq, number, ts),
+        )
+
+
+@_timed
+def load_spins(
+    chat_id: int,
+    game_id: str,
+    since_seq: int = 0,
+    limit: Optional[int] = None,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> list[Dict[str, Any]]:
+    """
+    Đọc lượt quay của một game theo index (chat_id, game_id, seq).
+
+    Args:
+        since_seq: Chỉ lấy các lượt có seq > since_seq
+        limit: Chỉ lấy `limit` lượt mới nhất (None = tất cả)
+
+    Returns:
+        [{"seq": int, "number": int, "time": str}, ...] theo thứ tự quay
+    """
+    cur = _resolve(manager).cursor()
+    return [
+        {"seq": seq, "number": number, "time": _epoch_to_iso(ts)}
+        for seq, number, ts in _select_spins(cur, chat_id, game_id, since_seq, limit)
+    ]
+
+
+@_timed
+def count_spins(
+    chat_id: int,
+    game_id: str,
+    since_seq: int = 0,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> int:
+    """Đếm số lượt quay của một game."""
+    cur = _resolve(manager).cursor()
+    cur.execute(
+        "SELECT COUNT(*) FROM spins WHERE chat_id = ? AND game_id = ? AND seq > ?",
+        (chat_id, game_id, since_seq),
+    )
+    return int(cur.fetchone()[0])
 
 
 # ---------- Stats ----------
-def save_stats(chat_id: int, chat_stats: Dict[str, Dict[int, Dict[str, Any]]]) -> None:
+@_timed
+def save_stats(
+    chat_id: int,
+    chat_stats: Dict[str, Dict[int, Dict[str, Any]]],
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> None:
     """
-    Lưu thống kê cho một chat.
+    Ghi lại toàn bộ thống kê của một chat (xoá rồi ghi lại).
+
+    Chỉ dùng cho các thao tác reset/ghi đè; cập nhật sau mỗi game nên dùng
+    `apply_stat_deltas` / `apply_token_deltas`.
 
     chat_stats format giống biến global `stats[chat_id]` hiện tại:
       {
@@ -128,47 +670,39 @@ def save_stats(chat_id: int, chat_stats: Dict[str, Dict[int, Dict[str, Any]]]) -
         "participations": { user_id: {"count": float, "name": str}, ... }
       }
     """
-    conn = get_connection()
-    cur = conn.cursor()
-
     wins = chat_stats.get("wins", {})
     participations = chat_stats.get("participations", {})
+    rows = [
+        (chat_id, int(user_id), stat_type, float(info.get("count", 0.0)), info.get("name"))
+        for stat_type, items in (("wins", wins), ("participations", participations))
+        for user_id, info in items.items()
+    ]
 
-    # Xoá dữ liệu cũ của chat này
-    cur.execute("DELETE FROM stats WHERE chat_id = ?", (chat_id,))
-
-    for user_id, info in wins.items():
-        cur.execute(
-            """
-            INSERT INTO stats(chat_id, user_id, type, count, name)
-            VALUES (?, ?, 'wins', ?, ?)
-            """,
-            (chat_id, int(user_id), float(info.get("count", 0.0)), info.get("name")),
-        )
-
-    for user_id, info in participations.items():
-        cur.execute(
+    with _resolve(manager).transaction() as cur:
+        # Xoá dữ liệu cũ của chat này
+        cur.execute("DELETE FROM stats WHERE chat_id = ?", (chat_id,))
+        cur.executemany(
             """
             INSERT INTO stats(chat_id, user_id, type, count, name)
-            VALUES (?, ?, 'participations', ?, ?)
+            VALUES (?, ?, ?, ?, ?)
             """,
-            (chat_id, int(user_id), float(info.get("count", 0.0)), info.get("name")),
+            rows,
         )
 
-    conn.commit()
-    conn.close()
-
 
-def load_stats(chat_id: int) -> Dict[str, Dict[int, Dict[str, Any]]]:
+@_timed
+def load_stats(
+    chat_id: int,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> Dict[str, Dict[int, Dict[str, Any]]]:
     """Tải thống kê cho một chat, trả về dict cùng format với `stats[chat_id]`."""
-    conn = get_connection()
-    cur = conn.cursor()
+    cur = _resolve(manager).cursor()
     cur.execute(
         "SELECT user_id, type, count, name FROM stats WHERE chat_id = ?",
         (chat_id,),
     )
     rows = cur.fetchall()
-    conn.close()
 
     wins: Dict[int, Dict[str, Any]] = {}
     participations: Dict[int, Dict[str, Any]] = {}
@@ -184,35 +718,119 @@ def load_stats(chat_id: int) -> Dict[str, Dict[int, Dict[str, Any]]]:
     return {"wins": wins, "participations": participations}
 
 
+@_timed
+def apply_stat_deltas(
+    chat_id: int,
+    deltas: Dict[str, Dict[int, float]],
+    names: Optional[Dict[int, str]] = None,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> None:
+    """
+    Cộng dồn biến động thống kê bằng upsert, không xoá/ghi lại cả chat.
+
+    Args:
+        deltas: {"wins": {user_id: delta}, "participations": {user_id: delta}}
+        names: {user_id: tên hiển thị mới nhất} (tuỳ chọn)
+    """
+    names = names or {}
+    rows = [
+        (chat_id, int(user_id), stat_type, float(delta), names.get(user_id))
+        for stat_type, per_user in deltas.items()
+        for user_id, delta in per_user.items()
+    ]
+    if not rows:
+        return
+
+    with _resolve(manager).transaction() as cur:
+        cur.executemany(
+            """
+            INSERT INTO stats(chat_id, user_id, type, count, name)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(chat_id, user_id, type) DO UPDATE SET
+                count = count + excluded.count,
+                name  = COALESCE(excluded.name, name)
+            """,
+            rows,
+        )
+
+
+def apply_token_deltas(
+    chat_id: int,
+    deltas: Dict[int, float],
+    names: Optional[Dict[int, str]] = None,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> None:
+    """Cộng dồn biến động token ({user_id: delta}) cho một chat."""
+    apply_stat_deltas(chat_id, {"wins": deltas}, names, manager=manager)
+
+
+@_timed
+def reset_stats(
+    chat_id: int,
+    stat_type: Optional[str] = None,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> None:
+    """Xoá thống kê của chat (chỉ một loại nếu truyền `stat_type`)."""
+    with _resolve(manager).transaction() as cur:
+        if stat_type is None:
+            cur.execute("DELETE FROM stats WHERE chat_id = ?", (chat_id,))
+        else:
+            cur.execute("DELETE FROM stats WHERE chat_id = ? AND type = ?", (chat_id, stat_type))
+
+
+@_timed
+def delete_user_stats(
+    chat_id: int,
+    user_id: int,
+    stat_type: str = "wins",
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> None:
+    """Xoá thống kê của một user trong chat."""
+    with _resolve(manager).transaction() as cur:
+        cur.execute(
+            "DELETE FROM stats WHERE chat_id = ? AND user_id = ? AND type = ?",
+            (chat_id, int(user_id), stat_type),
+        )
+
+
 # ---------- Last result ----------
-def save_last_result(chat_id: int, data: Dict[str, Any]) -> None:
+@_timed
+def save_last_result(
+    chat_id: int,
+    data: Dict[str, Any],
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> None:
     """Lưu kết quả game gần nhất cho một chat."""
-    conn = get_connection()
-    cur = conn.cursor()
     now = datetime.now().isoformat(timespec="seconds")
 
-    cur.execute(
-        """
-        INSERT INTO last_results(chat_id, data_json, saved_at)
-        VALUES (?, ?, ?)
-        ON CONFLICT(chat_id) DO UPDATE SET
-            data_json = excluded.data_json,
-            saved_at  = excluded.saved_at
-        """,
-        (chat_id, json.dumps(data, ensure_ascii=False), now),
-    )
-
-    conn.commit()
-    conn.close()
+    with _resolve(manager).transaction() as cur:
+        cur.execute(
+            """
+            INSERT INTO last_results(chat_id, data_json, saved_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(chat_id) DO UPDATE SET
+                data_json = excluded.data_json,
+                saved_at  = excluded.saved_at
+            """,
+            (chat_id, json.dumps(data, ensure_ascii=False), now),
+        )
 
 
-def load_last_result(chat_id: int) -> Optional[Dict[str, Any]]:
+@_timed
+def load_last_result(
+    chat_id: int,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> Optional[Dict[str, Any]]:
     """Tải kết quả game gần nhất của một chat."""
-    conn = get_connection()
-    cur = conn.cursor()
+    cur = _resolve(manager).cursor()
     cur.execute("SELECT data_json FROM last_results WHERE chat_id = ?", (chat_id,))
     row = cur.fetchone()
-    conn.close()
 
     if not row:
         return None
@@ -220,39 +838,354 @@ def load_last_result(chat_id: int) -> Optional[Dict[str, Any]]:
     return json.loads(row["data_json"])
 
 # ---------- Active Rounds ----------
-def save_active_round(chat_id: int, round_data: Dict[str, Any]) -> None:
+@_timed
+def save_active_round(
+    chat_id: int,
+    round_data: Dict[str, Any],
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> None:
     """Lưu vòng chơi đang hoạt động."""
-    conn = get_connection()
-    cur = conn.cursor()
     now = datetime.now().isoformat(timespec="seconds")
-    
-    cur.execute(
-        """
-        INSERT INTO active_rounds(chat_id, round_data_json, created_at)
-        VALUES (?, ?, ?)
-        ON CONFLICT(chat_id) DO UPDATE SET
-            round_data_json = excluded.round_data_json,
-            created_at = excluded.created_at
-        """,
-        (chat_id, json.dumps(round_data, ensure_ascii=False), now),
-    )
-    conn.commit()
-    conn.close()
 
-def load_all_active_rounds() -> Dict[int, Dict[str, Any]]:
+    with _resolve(manager).transaction() as cur:
+        cur.execute(
+            """
+            INSERT INTO active_rounds(chat_id, round_data_json, created_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(chat_id) DO UPDATE SET
+                round_data_json = excluded.round_data_json,
+                created_at = excluded.created_at
+            """,
+            (chat_id, json.dumps(round_data, ensure_ascii=False), now),
+        )
+
+@_timed
+def load_all_active_rounds(
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> Dict[int, Dict[str, Any]]:
     """Tải tất cả các vòng chơi đang hoạt động để khôi phục khi restart."""
-    conn = get_connection()
-    cur = conn.cursor()
+    cur = _resolve(manager).cursor()
     cur.execute("SELECT chat_id, round_data_json FROM active_rounds")
     rows = cur.fetchall()
-    conn.close()
-    
+
     return {row["chat_id"]: json.loads(row["round_data_json"]) for row in rows}
 
-def delete_active_round_row(chat_id: int) -> None:
+@_timed
+def delete_active_round_row(chat_id: int, *, manager: Optional[ConnectionManager] = None) -> None:
     """Xoá vòng chơi khi kết thúc."""
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM active_rounds WHERE chat_id = ?", (chat_id,))
-    conn.commit()
-    conn.close()
+    with _resolve(manager).transaction() as cur:
+        cur.execute("DELETE FROM active_rounds WHERE chat_id = ?", (chat_id,))
+
+
+# ---------- Auto spin (lịch tự động quay) ----------
+@_timed
+def save_auto_spin(
+    chat_id: int,
+    schedule: Dict[str, Any],
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> None:
+    """Lưu lịch tự động quay của chat (interval, người bật...)."""
+    now = datetime.now().isoformat(timespec="seconds")
+    with _resolve(manager).transaction() as cur:
+        cur.execute(
+            """
+            INSERT INTO auto_spins(chat_id, interval_seconds, schedule_json, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(chat_id) DO UPDATE SET
+                interval_seconds = excluded.interval_seconds,
+                schedule_json = excluded.schedule_json,
+                updated_at = excluded.updated_at
+            """,
+            (chat_id, float(schedule["interval"]), json.dumps(schedule, ensure_ascii=False), now),
+        )
+
+
+@_timed
+def load_all_auto_spins(
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> Dict[int, Dict[str, Any]]:
+    """Tải mọi lịch tự động quay để khôi phục khi restart."""
+    cur = _resolve(manager).cursor()
+    cur.execute("SELECT chat_id, schedule_json FROM auto_spins")
+    return {row["chat_id"]: json.loads(row["schedule_json"]) for row in cur.fetchall()}
+
+
+@_timed
+def delete_auto_spin(chat_id: int, *, manager: Optional[ConnectionManager] = None) -> None:
+    """Xoá lịch tự động quay của chat."""
+    with _resolve(manager).transaction() as cur:
+        cur.execute("DELETE FROM auto_spins WHERE chat_id = ?", (chat_id,))
+
+
+# ---------- Games (lịch sử vòng chơi) ----------
+def _upsert_round_ledger(cur: sqlite3.Cursor, chat_id: int, round_id: str, deltas: Dict[int, Dict[str, Any]]) -> None:
+    cur.executemany(
+        """
+        INSERT INTO round_ledger(chat_id, round_id, user_id, name, token)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(chat_id, round_id, user_id) DO UPDATE SET
+            token = token + excluded.token,
+            name = COALESCE(excluded.name, name)
+        """,
+        [
+            (chat_id, round_id, int(uid), info.get("name"), float(info.get("token", 0.0)))
+            for uid, info in deltas.items()
+        ],
+    )
+
+
+@_timed
+def save_game_record(
+    chat_id: int,
+    round_id: str,
+    record: Dict[str, Any],
+    token_deltas: Optional[Dict[int, Dict[str, Any]]] = None,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> None:
+    """
+    Lưu một game đã kết thúc vào lịch sử của vòng chơi.
+
+    Nếu có token_deltas ({user_id: {"name", "token"}}) thì cộng vào sổ token
+    của vòng trong cùng transaction, để sổ luôn khớp với bảng games.
+    """
+    with _resolve(manager).transaction() as cur:
+        if token_deltas:
+            _upsert_round_ledger(cur, chat_id, round_id, token_deltas)
+        cur.execute(
+            """
+            INSERT INTO games(chat_id, round_id, game_name, host_name,
+                              participants_json, winners_json, numbers_drawn, ended_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                chat_id,
+                round_id,
+                record.get("game_name"),
+                record.get("host_name"),
+                json.dumps(record.get("participants") or [], ensure_ascii=False),
+                json.dumps(record.get("winners") or [], ensure_ascii=False),
+                int(record.get("numbers_drawn") or 0),
+                record.get("ended_at"),
+            ),
+        )
+
+
+@_timed
+def load_round_games(
+    chat_id: int,
+    round_id: str,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> list[Dict[str, Any]]:
+    """Tải các game của một vòng chơi theo thứ tự kết thúc."""
+    cur = _resolve(manager).cursor()
+    cur.execute(
+        """
+        SELECT game_name, host_name, participants_json, winners_json, numbers_drawn, ended_at
+        FROM games WHERE chat_id = ? AND round_id = ? ORDER BY id
+        """,
+        (chat_id, round_id),
+    )
+    return [
+        {
+            "game_name": r["game_name"],
+            "host_name": r["host_name"],
+            "participants": json.loads(r["participants_json"]),
+            "winners": json.loads(r["winners_json"]),
+            "numbers_drawn": r["numbers_drawn"],
+            "ended_at": r["ended_at"],
+        }
+        for r in cur.fetchall()
+    ]
+
+
+@_timed
+def apply_round_ledger_deltas(
+    chat_id: int,
+    round_id: str,
+    deltas: Dict[int, Dict[str, Any]],
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> None:
+    """Cộng dồn token vào sổ của vòng (không ghi game mới)."""
+    if not deltas:
+        return
+    with _resolve(manager).transaction() as cur:
+        _upsert_round_ledger(cur, chat_id, round_id, deltas)
+
+
+@_timed
+def load_round_ledger(
+    chat_id: int,
+    round_id: str,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> Dict[int, Dict[str, Any]]:
+    """Tải sổ token của vòng: {user_id: {"name": str, "token": float}}."""
+    cur = _resolve(manager).cursor()
+    cur.execute(
+        "SELECT user_id, name, token FROM round_ledger WHERE chat_id = ? AND round_id = ?",
+        (chat_id, round_id),
+    )
+    return {
+        r["user_id"]: {"name": r["name"] or str(r["user_id"]), "token": r["token"]}
+        for r in cur.fetchall()
+    }
+
+
+# ---------- Warm start (tải hàng loạt) ----------
+# Mỗi hàm dưới đây đọc dữ liệu của mọi chat bằng vài truy vấn theo tập hợp,
+# thay vì một truy vấn cho mỗi chat như các hàm load_* ở trên.
+_WARM_CHILD_QUERIES = (
+    ("participants", "SELECT t.chat_id, t.pos, t.user_id, t.name FROM session_participants t"),
+    ("tickets", "SELECT t.chat_id, t.ticket_code, t.user_id FROM session_tickets t"),
+    ("waiters", "SELECT t.chat_id, t.number, t.pos, t.user_id, t.name FROM session_waiters t"),
+    ("winners", "SELECT t.chat_id, t.pos, t.user_id, t.name, t.numbers_json, t.time FROM session_winners t"),
+)
+
+
+@_timed
+def load_all_sessions(
+    since: Optional[str] = None,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Tải mọi session (cập nhật từ `since` trở đi, ISO) trong một snapshot đọc.
+
+    Các bảng con và lượt quay được đọc bằng JOIN với bảng sessions (qua cột
+    game_id/history_base), mỗi bảng một truy vấn. Dòng hỏng được ghi log và
+    bỏ qua, chat đó sẽ được tải lại theo từng lệnh.
+    """
+    mgr = _resolve(manager)
+    sessions: Dict[int, Dict[str, Any]] = {}
+    legacy: list[int] = []
+    where, params = ("", ()) if since is None else (" WHERE w.updated_at >= ?", (since,))
+
+    with mgr.snapshot() as cur:
+        cur.execute("SELECT w.chat_id, w.session_json FROM sessions w" + where, params)
+
+        parts: Dict[int, Dict[str, Any]] = {}
+        for row in cur.fetchall():
+            try:
+                meta = decode_meta(row["session_json"])
+            except (CodecError, ValueError) as e:
+                logger.warning(f"Warm start: bỏ qua session hỏng của chat {row['chat_id']}: {e}")
+                continue
+            if meta.get("storage_version") != SESSION_STORAGE_VERSION:
+                legacy.append(row["chat_id"])
+                continue
+            parts[row["chat_id"]] = {
+                "meta": meta, "participants": [], "tickets": [], "waiters": [], "winners": [], "spins": [],
+            }
+
+        if parts:
+            for key, query in _WARM_CHILD_QUERIES:
+                cur.execute(query + " JOIN sessions w ON w.chat_id = t.chat_id" + where, params)
+                for row in cur.fetchall():
+                    if row[0] in parts:
+                        parts[row[0]][key].append(tuple(row)[1:])
+
+            cur.execute(
+                """
+                SELECT s.chat_id, s.seq, s.number, s.ts
+                FROM sessions w
+                JOIN spins s ON s.chat_id = w.chat_id AND s.game_id = w.game_id AND s.seq > w.history_base
+                """
+                + where
+                + " ORDER BY s.chat_id, s.seq",
+                params,
+            )
+            for row in cur.fetchall():
+                if row[0] in parts:
+                    parts[row[0]]["spins"].append(tuple(row)[1:])
+
+        for chat_id, chat_parts in parts.items():
+            try:
+                sessions[chat_id] = assemble_session_dict(chat_parts)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Warm start: bỏ qua session hỏng của chat {chat_id}: {e}")
+
+    # Session cũ (một blob JSON) hiếm gặp: đi đường load_session để được chuyển dạng
+    for chat_id in legacy:
+        data = load_session(chat_id, manager=manager)
+        if data is not None:
+            sessions[chat_id] = data
+    return sessions
+
+
+@_timed
+def load_all_stats(
+    chat_ids: Optional[list[int]] = None,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> Dict[int, Dict[str, Dict[int, Dict[str, Any]]]]:
+    """Tải thống kê của nhiều chat (tất cả nếu chat_ids = None) trong một truy vấn."""
+    cur = _resolve(manager).cursor()
+    if chat_ids is None:
+        cur.execute("SELECT chat_id, user_id, type, count, name FROM stats")
+        rows = cur.fetchall()
+    else:
+        wanted = sorted(set(chat_ids))
+        if not wanted:
+            return {}
+        cur.execute(
+            "SELECT chat_id, user_id, type, count, name FROM stats "
+            "WHERE chat_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(wanted),),
+        )
+        rows = cur.fetchall()
+
+    result: Dict[int, Dict[str, Dict[int, Dict[str, Any]]]] = {}
+    if chat_ids is not None:
+        result = {chat_id: {"wins": {}, "participations": {}} for chat_id in set(chat_ids)}
+    for r in rows:
+        chat = result.setdefault(r["chat_id"], {"wins": {}, "participations": {}})
+        target = chat["wins"] if r["type"] == "wins" else chat["participations"]
+        target[int(r["user_id"])] = {"count": float(r["count"]), "name": r["name"]}
+    return result
+
+
+@_timed
+def load_all_last_results(
+    since: Optional[str] = None,
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> Dict[int, Dict[str, Any]]:
+    """Tải kết quả gần nhất của mọi chat (lưu từ `since` trở đi, ISO)."""
+    cur = _resolve(manager).cursor()
+    if since is None:
+        cur.execute("SELECT chat_id, data_json FROM last_results")
+    else:
+        cur.execute("SELECT chat_id, data_json FROM last_results WHERE saved_at >= ?", (since,))
+    return {row["chat_id"]: json.loads(row["data_json"]) for row in cur.fetchall()}
+
+
+# ---------- Batch (write-behind) ----------
+@_timed
+def save_sessions_batch(
+    writes: list[tuple[int, Optional[Dict[str, Any]]]],
+    *,
+    manager: Optional[ConnectionManager] = None,
+) -> None:
+    """
+    Ghi nhiều session trong một transaction.
+
+    writes: [(chat_id, write), ...] theo thứ tự, với `write` lấy từ
+    build_session_write(); write = None nghĩa là xoá session của chat đó.
+    """
+    if not writes:
+        return
+
+    now = datetime.now().isoformat(timespec="seconds")
+    with _resolve(manager).transaction() as cur:
+        for chat_id, write in writes:
+            if write is None:
+                _delete_session_rows(cur, chat_id)
+            else:
+                _apply_session_write(cur, chat_id, write, now)
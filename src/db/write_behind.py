@@ -0,0 +1,205 @@
+"""
+Hàng đợi ghi trễ (write-behind) cho session.
+
+Handler chỉ đánh dấu chat_id là "dirty"; một task nền gom các chat dirty,
+chụp snapshot trên event loop rồi ghi cả lô xuống SQLite trong một
+transaction ở thread phụ. Nhiều lần ghi liên tiếp cho cùng chat_id được gộp
+thành một lần ghi.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Giá trị đánh dấu chat cần xoá khỏi DB thay vì lưu
+DELETE = object()
+
+
+class WriteBehindQueue:
+    """Gom và ghi session xuống DB theo lô, chạy nền trên event loop."""
+
+    def __init__(
+        self,
+        snapshot: Callable[[int], Optional[Dict[str, Any]]],
+        writer: Callable[[list], None],
+        interval: float = 0.5,
+        max_dirty: int = 32,
+    ):
+        """
+        Args:
+            snapshot: Hàm lấy dict của session theo chat_id (None nếu không còn)
+            writer: Hàm ghi một lô [(chat_id, dict | None), ...] trong một transaction
+            interval: Chu kỳ flush (giây)
+            max_dirty: Số chat dirty tối đa trước khi flush sớm
+        """
+        self._snapshot = snapshot
+        self._writer = writer
+        self.interval = interval
+        self.max_dirty = max_dirty
+
+        # {chat_id: None (cần lưu) | DELETE (cần xoá)}, giữ thứ tự đánh dấu
+        self._pending: Dict[int, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+        # Các chat của lô đang ghi ở thread phụ
+        self._inflight: set[int] = set()
+
+        self.flushes = 0
+        self.rows_written = 0
+        self.merged = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def mark_dirty(self, chat_id: int) -> None:
+        """Đánh dấu session của chat cần được lưu."""
+        if not self.running:
+            # Chưa có task nền (script, test): ghi đồng bộ như trước
+            data = self._snapshot(chat_id)
+            if data is not None:
+                self._write_now([(chat_id, data)])
+            return
+
+        if chat_id in self._pending:
+            self.merged += 1
+            self._pending.pop(chat_id)
+        self._pending[chat_id] = None
+        self._maybe_wakeup()
+
+    def mark_deleted(self, chat_id: int) -> None:
+        """Đánh dấu session của chat cần xoá khỏi DB (huỷ lần lưu đang chờ)."""
+        if not self.running:
+            self._write_now([(chat_id, None)])
+            return
+
+        if chat_id in self._pending:
+            self.merged += 1
+            self._pending.pop(chat_id)
+        self._pending[chat_id] = DELETE
+        self._maybe_wakeup()
+
+    def is_pending_delete(self, chat_id: int) -> bool:
+        """Chat đang chờ xoá (DB có thể vẫn còn bản cũ)."""
+        return self._pending.get(chat_id, None) is DELETE
+
+    def is_dirty(self, chat_id: int) -> bool:
+        """Chat có thay đổi đang chờ lưu."""
+        return self._pending.get(chat_id, DELETE) is None
+
+    def is_writing(self, chat_id: int) -> bool:
+        """Chat nằm trong lô đang ghi ở thread phụ."""
+        return chat_id in self._inflight
+
+    def discard(self, chat_id: int) -> None:
+        """Bỏ lần lưu đang chờ của chat (nơi gọi đã tự ghi bản mới nhất)."""
+        if self._pending.get(chat_id, DELETE) is None:
+            del self._pending[chat_id]
+
+    def write_now(self, chat_id: int, data: Dict[str, Any]) -> None:
+        """Ghi đồng bộ một chat ngay lập tức (vd: trước khi bỏ session khỏi cache)."""
+        self._write_now([(chat_id, data)])
+        self.discard(chat_id)
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def _maybe_wakeup(self) -> None:
+        if self._wakeup is not None and len(self._pending) >= self.max_dirty:
+            self._wakeup.set()
+
+    def _take_batch(self) -> list:
+        """Lấy các chat đang chờ và chụp snapshot (chạy trên event loop)."""
+        pending, self._pending = self._pending, {}
+        batch = []
+        for chat_id, op in pending.items():
+            if op is DELETE:
+                batch.append((chat_id, None))
+                continue
+            data = self._snapshot(chat_id)
+            if data is not None:
+                batch.append((chat_id, data))
+        return batch
+
+    def _write_now(self, batch: list) -> None:
+        if not batch:
+            return
+        self._writer(batch)
+        self.flushes += 1
+        self.rows_written += len(batch)
+
+    def _requeue(self, batch: list) -> None:
+        """Đưa lại lô ghi lỗi vào hàng đợi, không đè lên thay đổi mới hơn."""
+        for chat_id, data in batch:
+            if chat_id not in self._pending:
+                self._pending[chat_id] = DELETE if data is None else None
+
+    async def flush(self) -> None:
+        """
+        Barrier "flush now": khi hàm trả về, mọi thay đổi đã đánh dấu trước
+        lời gọi đều đã nằm trong DB.
+        """
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            batch = self._take_batch()
+            if not batch:
+                return
+            self._inflight = {chat_id for chat_id, _ in batch}
+            try:
+                await asyncio.to_thread(self._write_now, batch)
+            except Exception as e:
+                self.errors += 1
+                self._requeue(batch)
+                logger.error(f"Lỗi khi ghi {len(batch)} session xuống DB: {e}", exc_info=True)
+                raise
+            finally:
+                self._inflight = set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Đã log trong flush, lô lỗi sẽ được thử lại ở chu kỳ sau
+                pass
+
+    async def start(self) -> None:
+        """Khởi động task nền (gọi trong event loop, vd: post_init của bot)."""
+        if self.running:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run(), name="session-write-behind")
+
+    async def stop(self) -> None:
+        """Dừng task nền và đảm bảo flush hết dữ liệu còn lại."""
+        task = self._task
+        if task is None:
+            return
+        # Cho vòng lặp tự kết thúc (không cancel giữa lúc đang ghi)
+        self._stopping = True
+        self._wakeup.set()
+        await task
+        self._task = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Các bộ đếm của hàng đợi."""
+        return {
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "merged": self.merged,
+            "errors": self.errors,
+        }
@@ -10,9 +10,12 @@ root_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(root_dir))
 
 import logging
-from config.config import TELEGRAM_BOT_TOKEN
+from config.config import (
+    TELEGRAM_BOT_TOKEN, DB_SHARDS, SESSION_CACHE_MAX_SIZE, SESSION_CACHE_TTL_SECONDS,
+)
 from src.bot.telegram_bot import setup_bot
-from src.db.sqlite_store import init_db
+from src.db.backends import ShardedSQLiteBackend, get_backend, set_backend
+from src.db.sqlite_store import DB_PATH
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -30,13 +33,25 @@ def main():
     
     logger.info("Đang khởi động bot...")
 
+    # Chọn backend lưu trữ: một file SQLite hoặc chia theo chat_id ra nhiều file
+    if DB_SHARDS > 1:
+        set_backend(ShardedSQLiteBackend(DB_PATH, DB_SHARDS))
+        logger.info(f"Dùng {DB_SHARDS} shard SQLite.")
+    backend = get_backend()
+
     # Khởi tạo database (nếu chưa có)
-    init_db()
+    backend.init()
+
+    # Giới hạn cache session trong RAM theo biến môi trường (nếu có)
+    from src.bot.utils import session_manager
+    session_manager.configure_cache(
+        int(SESSION_CACHE_MAX_SIZE) if SESSION_CACHE_MAX_SIZE else None,
+        float(SESSION_CACHE_TTL_SECONDS) if SESSION_CACHE_TTL_SECONDS else None,
+    )
 
     # Khôi phục các vòng chơi đang hoạt động từ DB vào RAM
-    from src.db.sqlite_store import load_all_active_rounds
     from src.bot.constants import active_rounds
-    loaded_rounds = load_all_active_rounds()
+    loaded_rounds = backend.load_all_active_rounds()
     active_rounds.update(loaded_rounds)
     logger.info(f"Đã khôi phục {len(loaded_rounds)} vòng chơi đang hoạt động.")
     
@@ -47,6 +62,11 @@ def main():
     logger.info("Bot đã sẵn sàng!")
     application.run_polling()
 
+    # Đóng các connection SQLite dùng chung khi bot dừng
+    logger.info(f"Thống kê DB: {backend.get_metrics()}")
+    logger.info(f"Thống kê cache session: {session_manager.get_cache_stats()}")
+    backend.close()
+
 
 if __name__ == "__main__":
     main()
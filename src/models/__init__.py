@@ -1,3 +1,4 @@
 from .wheel_session import WheelSession
+from .session_codec import CodecError, encode_session, decode_session
 
-__all__ = ['WheelSession']
+__all__ = ['WheelSession', 'CodecError', 'encode_session', 'decode_session']
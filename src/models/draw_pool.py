@@ -0,0 +1,312 @@
+"""
+Tập số còn lại của một session, rút ngẫu nhiên O(1)
+"""
+import hashlib
+import random
+import secrets
+from typing import Iterable, Iterator, Optional, Union
+
+# Khoảng lớn hơn ngưỡng này dùng SparseDrawPool (không cấp phát mảng theo khoảng)
+DENSE_POOL_MAX = 10_000
+
+
+# Số bit của seed: đủ lớn để không dò ngược được từ vài số đầu đã rút
+# (hay từ mã cam kết) bằng cách thử mọi seed
+SEED_BITS = 128
+
+
+def new_seed() -> int:
+    """Seed ngẫu nhiên cho chế độ rút theo thứ tự xáo trước."""
+    return secrets.randbits(SEED_BITS)
+
+
+def seed_commitment(seed: int) -> str:
+    """
+    Mã cam kết của seed (SHA-256, hex): công bố lúc bắt đầu thay cho seed, vì
+    seed đủ để suy ra mọi số sắp rút. Khi game kết thúc mới công bố seed để
+    mọi người đối chiếu với mã này và với `shuffled_order`.
+    """
+    return hashlib.sha256(str(seed).encode("ascii")).hexdigest()
+
+
+def shuffled_order(start: int, end: int, seed: int) -> list[int]:
+    """Thứ tự rút của khoảng [start, end]: Fisher-Yates với random.Random(seed)."""
+    order = list(range(start, end + 1))
+    rng = random.Random(seed)
+    for i in range(len(order) - 1, 0, -1):
+        j = rng.randrange(i + 1)
+        order[i], order[j] = order[j], order[i]
+    return order
+
+
+class DrawPool:
+    """
+    Các số còn lại trong khoảng [start, end].
+
+    Mọi số của khoảng nằm trong mảng `_items`: `_size` phần tử đầu là các số
+    còn lại, phần sau là các số đã rút. Rút một số = chọn vị trí ngẫu nhiên ở
+    phần đầu rồi đổi chỗ với phần tử cuối của phần đầu (swap-remove); `_pos`
+    giữ vị trí của từng số nên kiểm tra "còn hay không" cũng O(1). Reset chỉ
+    cần đặt lại `_size` vì các số đã rút vẫn nằm trong mảng.
+
+    Chế độ xáo trước (`shuffle(seed)`): cả thứ tự rút được sinh sẵn từ seed và
+    xếp ngược vào `_items`, mỗi lần rút chỉ lấy phần tử cuối của phần đầu. Trạng
+    thái khi đó chỉ gồm (seed, cursor), đủ để dựng lại và phát lại y hệt ván chơi.
+    """
+
+    __slots__ = ("start", "end", "_items", "_pos", "_size", "seed")
+
+    def __init__(self, start: int, end: int, available: Optional[Iterable[int]] = None):
+        self.start = start
+        self.end = end
+        self._items = list(range(start, end + 1))
+        self._pos = list(range(len(self._items)))
+        self._size = len(self._items)
+        # Seed của thứ tự rút xáo trước (None = rút ngẫu nhiên từng lượt)
+        self.seed: Optional[int] = None
+        if available is not None:
+            self.load(available)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, number: object) -> bool:
+        if not isinstance(number, int) or not self.start <= number <= self.end:
+            return False
+        return self._pos[number - self.start] < self._size
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.to_list())
+
+    def _swap(self, i: int, j: int) -> None:
+        items, pos = self._items, self._pos
+        a, b = items[i], items[j]
+        items[i], items[j] = b, a
+        pos[a - self.start], pos[b - self.start] = j, i
+
+    def choice(self) -> int:
+        """Chọn ngẫu nhiên một số còn lại (không loại bỏ)."""
+        if not self._size:
+            raise IndexError("DrawPool rỗng")
+        return self._items[random.randrange(self._size)]
+
+    @property
+    def cursor(self) -> int:
+        """Số lượt đã rút từ lần reset gần nhất."""
+        return len(self._items) - self._size
+
+    def shuffle(self, seed: int, cursor: int = 0) -> None:
+        """Chuyển sang chế độ xáo trước với `seed`, đã rút `cursor` số đầu."""
+        order = shuffled_order(self.start, self.end, seed)
+        order.reverse()
+        self._items = order
+        for i, number in enumerate(order):
+            self._pos[number - self.start] = i
+        self._size = len(order) - min(max(cursor, 0), len(order))
+        self.seed = seed
+
+    def drawn_order(self) -> list[int]:
+        """Chế độ xáo trước: các số đã rút theo đúng thứ tự rút."""
+        return self._items[self._size:][::-1]
+
+    def draw(self) -> int:
+        """Rút một số còn lại (theo thứ tự xáo trước nếu có seed) và loại nó khỏi pool."""
+        if not self._size:
+            raise IndexError("DrawPool rỗng")
+        if self.seed is not None:
+            self._size -= 1
+            return self._items[self._size]
+        i = random.randrange(self._size)
+        number = self._items[i]
+        self._size -= 1
+        self._swap(i, self._size)
+        return number
+
+    def remove(self, number: int) -> bool:
+        """Loại một số cụ thể. Trả về False nếu số không còn trong pool."""
+        if number not in self:
+            return False
+        self.seed = None  # Thứ tự không còn suy ra được từ seed
+        self._size -= 1
+        self._swap(self._pos[number - self.start], self._size)
+        return True
+
+    def reset(self) -> None:
+        """Khôi phục đủ mọi số của khoảng (chế độ xáo trước: xáo lại với seed mới)."""
+        if self.seed is not None:
+            self.shuffle(new_seed())
+        else:
+            self._size = len(self._items)
+
+    def clear(self) -> None:
+        """Loại bỏ toàn bộ số."""
+        self.seed = None  # Không còn là tiền tố của thứ tự xáo
+        self._size = 0
+
+    def load(self, numbers: Iterable[int]) -> None:
+        """Đặt tập số còn lại (bỏ qua số ngoài khoảng và số trùng)."""
+        self.seed = None
+        self.clear()
+        for number in numbers:
+            if number not in self and self.start <= number <= self.end:
+                self._swap(self._pos[number - self.start], self._size)
+                self._size += 1
+
+    def load_removed(self, numbers: Iterable[int]) -> None:
+        """Đặt lại đủ khoảng rồi loại các số `numbers` (các số đã rút)."""
+        self.seed = None
+        self._size = len(self._items)
+        for number in numbers:
+            self.remove(number)
+
+    def removed(self) -> list[int]:
+        """Các số đã rút kể từ lần reset gần nhất (theo vị trí trong mảng)."""
+        return self._items[self._size:]
+
+    def to_list(self) -> list[int]:
+        """Các số còn lại theo thứ tự tăng dần (dùng khi hiển thị/lưu trữ)."""
+        return sorted(self._items[:self._size])
+
+    def __repr__(self) -> str:
+        mode = f", seed={self.seed}" if self.seed is not None else ""
+        return f"DrawPool({self.start}-{self.end}, remaining={self._size}{mode})"
+
+
+class SparseDrawPool:
+    """
+    Các số còn lại trong một khoảng lớn (xổ số/bốc thăm 10^5 - 10^7 người).
+
+    Cùng thuật toán swap-remove với DrawPool nhưng mảng hoán vị là ảo: vị trí
+    `i` mặc định chứa số `start + i`, chỉ các vị trí đã bị đổi chỗ mới nằm
+    trong dict `_items` (vị trí -> số) và `_pos` (số -> vị trí). Mỗi lần rút
+    thêm nhiều nhất hai mục, nên bộ nhớ tỉ lệ với số lượt rút chứ không phải
+    độ rộng khoảng (Fisher-Yates thưa). Không hỗ trợ chế độ xáo trước.
+    """
+
+    __slots__ = ("start", "end", "_items", "_pos", "_size")
+
+    # Luôn rút ngẫu nhiên từng lượt (để cùng giao diện với DrawPool)
+    seed = None
+
+    def __init__(self, start: int, end: int, available: Optional[Iterable[int]] = None):
+        self.start = start
+        self.end = end
+        self._items: dict[int, int] = {}
+        self._pos: dict[int, int] = {}
+        self._size = end - start + 1
+        if available is not None:
+            self.load(available)
+
+    @property
+    def total(self) -> int:
+        return self.end - self.start + 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, number: object) -> bool:
+        if not isinstance(number, int) or not self.start <= number <= self.end:
+            return False
+        return self._index(number) < self._size
+
+    def __iter__(self) -> Iterator[int]:
+        removed = set(self.removed())
+        return (n for n in range(self.start, self.end + 1) if n not in removed)
+
+    def _item(self, i: int) -> int:
+        return self._items.get(i, self.start + i)
+
+    def _index(self, number: int) -> int:
+        return self._pos.get(number, number - self.start)
+
+    def _set(self, i: int, number: int) -> None:
+        if number == self.start + i:
+            # Về đúng chỗ mặc định: bỏ khỏi dict để bộ nhớ không tăng mãi
+            self._items.pop(i, None)
+            self._pos.pop(number, None)
+        else:
+            self._items[i] = number
+            self._pos[number] = i
+
+    def _swap(self, i: int, j: int) -> None:
+        a, b = self._item(i), self._item(j)
+        self._set(i, b)
+        self._set(j, a)
+
+    def choice(self) -> int:
+        """Chọn ngẫu nhiên một số còn lại (không loại bỏ)."""
+        if not self._size:
+            raise IndexError("DrawPool rỗng")
+        return self._item(random.randrange(self._size))
+
+    @property
+    def cursor(self) -> int:
+        """Số lượt đã rút từ lần reset gần nhất."""
+        return self.total - self._size
+
+    def shuffle(self, seed: int, cursor: int = 0) -> None:
+        raise ValueError("Khoảng số lớn không hỗ trợ chế độ xáo trước")
+
+    def drawn_order(self) -> list[int]:
+        raise ValueError("Khoảng số lớn không hỗ trợ chế độ xáo trước")
+
+    def draw(self) -> int:
+        """Rút một số còn lại và loại nó khỏi pool."""
+        if not self._size:
+            raise IndexError("DrawPool rỗng")
+        i = random.randrange(self._size)
+        number = self._item(i)
+        self._size -= 1
+        self._swap(i, self._size)
+        return number
+
+    def remove(self, number: int) -> bool:
+        """Loại một số cụ thể. Trả về False nếu số không còn trong pool."""
+        if number not in self:
+            return False
+        self._size -= 1
+        self._swap(self._index(number), self._size)
+        return True
+
+    def reset(self) -> None:
+        """Khôi phục đủ mọi số của khoảng (về hoán vị mặc định, O(1))."""
+        self._items = {}
+        self._pos = {}
+        self._size = self.total
+
+    def clear(self) -> None:
+        """Loại bỏ toàn bộ số."""
+        self._size = 0
+
+    def load(self, numbers: Iterable[int]) -> None:
+        """Đặt tập số còn lại (bỏ qua số ngoài khoảng và số trùng)."""
+        self.reset()
+        self.clear()
+        for number in numbers:
+            if number not in self and self.start <= number <= self.end:
+                self._swap(self._index(number), self._size)
+                self._size += 1
+
+    def load_removed(self, numbers: Iterable[int]) -> None:
+        """Đặt lại đủ khoảng rồi loại các số `numbers` (O(số lượng số đã rút))."""
+        self.reset()
+        for number in numbers:
+            self.remove(number)
+
+    def removed(self) -> list[int]:
+        """Các số đã rút kể từ lần reset gần nhất (O(số lượt rút))."""
+        return [self._item(i) for i in range(self._size, self.total)]
+
+    def to_list(self) -> list[int]:
+        """Các số còn lại tăng dần - O(độ rộng khoảng), tránh dùng khi lưu trữ."""
+        return list(self)
+
+    def __repr__(self) -> str:
+        return f"SparseDrawPool({self.start}-{self.end}, remaining={self._size})"
+
+
+def make_draw_pool(start: int, end: int) -> Union[DrawPool, SparseDrawPool]:
+    """DrawPool cho khoảng nhỏ (loto 90 số), SparseDrawPool cho khoảng lớn."""
+    if end - start + 1 > DENSE_POOL_MAX:
+        return SparseDrawPool(start, end)
+    return DrawPool(start, end)
@@ -0,0 +1,481 @@
+"""
+Mã hoá nhị phân gọn cho dict của WheelSession (kết quả `to_dict()`).
+
+So với JSON:
+- `available_numbers` và `drawn_numbers` lưu thành bitmap trên khoảng [start_number, end_number]
+  (chế độ xáo trước chỉ lưu `draw_seed` + `draw_cursor`); tập thưa trên khoảng lớn
+  lưu thành dãy delta varint để kích thước theo số lượt rút chứ không theo khoảng
+- `removed_numbers`, các số trong lịch sử quay và số trúng lưu thành dãy varint
+- thời gian lưu thành số giây/micro giây (varint, lịch sử quay lưu delta)
+- tên người chơi lưu một lần trong bảng tên, các chỗ khác chỉ lưu chỉ số
+
+Định dạng có version (byte thứ 3); dữ liệu không biểu diễn được (vd: số ngoài
+khoảng, thời gian có múi giờ) sẽ raise `CodecError` để nơi gọi ghi JSON thay thế.
+Các khoá lạ (vd: meta của sqlite_store) được giữ nguyên trong phần JSON phụ.
+"""
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+MAGIC = b"LS"
+CODEC_VERSION = 1
+
+# Mốc thời gian (naive, không đổi múi giờ) cho các giá trị datetime
+_EPOCH = datetime(1970, 1, 1)
+
+# Các khoá có trường riêng trong định dạng nhị phân
+_KNOWN_KEYS = {
+    "id", "start_number", "end_number", "remove_after_spin", "available_numbers",
+    "removed_numbers", "last_spin", "spin_count", "created_at", "updated_at",
+    "history", "spin_seq", "game_name", "owner_id", "round_name", "participants",
+    "started", "winners", "tickets", "user_tickets", "waiting_numbers",
+    "last_control_message_id", "drawn_numbers", "draw_seed", "draw_cursor",
+}
+
+# Bit trong byte cờ
+_F_REMOVE = 1 << 0
+_F_STARTED = 1 << 1
+_F_UUID = 1 << 2
+_F_DRAWN = 1 << 3
+_F_SEEDED = 1 << 4
+_F_DRAWN_DELTAS = 1 << 5
+
+# Cách lưu available_numbers (uvarint đứng trước)
+_SET_ABSENT = 0
+_SET_BITMAP = 1
+_SET_DELTAS = 2
+
+
+class CodecError(ValueError):
+    """Dữ liệu không mã hoá/giải mã được bằng định dạng nhị phân."""
+
+
+# ---------- Primitive ----------
+class _Writer:
+    def __init__(self):
+        self.buf = bytearray()
+
+    def uvarint(self, value: int) -> None:
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise CodecError(f"Không phải số nguyên không âm: {value!r}")
+        while value >= 0x80:
+            self.buf.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self.buf.append(value)
+
+    def svarint(self, value: int) -> None:
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise CodecError(f"Không phải số nguyên: {value!r}")
+        # zigzag: 0, -1, 1, -2, ... -> 0, 1, 2, 3, ...
+        self.uvarint(value * 2 if value >= 0 else -value * 2 - 1)
+
+    def opt_svarint(self, value: Optional[int]) -> None:
+        if value is None:
+            self.uvarint(0)
+        else:
+            self.uvarint(1)
+            self.svarint(value)
+
+    def raw(self, data: bytes) -> None:
+        self.buf += data
+
+    def string(self, value: str) -> None:
+        if not isinstance(value, str):
+            raise CodecError(f"Không phải chuỗi: {value!r}")
+        data = value.encode("utf-8")
+        self.uvarint(len(data))
+        self.buf += data
+
+    def opt_string(self, value: Optional[str]) -> None:
+        if value is None:
+            self.uvarint(0)
+        elif not isinstance(value, str):
+            raise CodecError(f"Không phải chuỗi: {value!r}")
+        else:
+            data = value.encode("utf-8")
+            self.uvarint(len(data) + 1)
+            self.buf += data
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def uvarint(self) -> int:
+        result = shift = 0
+        while True:
+            try:
+                byte = self.data[self.pos]
+            except IndexError:
+                raise CodecError("Dữ liệu bị cắt cụt") from None
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def svarint(self) -> int:
+        value = self.uvarint()
+        return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+    def opt_svarint(self) -> Optional[int]:
+        return self.svarint() if self.uvarint() else None
+
+    def raw(self, size: int) -> bytes:
+        if self.pos + size > len(self.data):
+            raise CodecError("Dữ liệu bị cắt cụt")
+        chunk = bytes(self.data[self.pos:self.pos + size])
+        self.pos += size
+        return chunk
+
+    def string(self) -> str:
+        return self.raw(self.uvarint()).decode("utf-8")
+
+    def opt_string(self) -> Optional[str]:
+        size = self.uvarint()
+        return None if size == 0 else self.raw(size - 1).decode("utf-8")
+
+
+# ---------- Thời gian ----------
+def _micros(value: str) -> int:
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise CodecError(f"Thời gian không hợp lệ: {value!r}") from None
+    if dt.tzinfo is not None:
+        raise CodecError("Không hỗ trợ thời gian có múi giờ")
+    return (dt - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value: int) -> str:
+    return (_EPOCH + timedelta(microseconds=value)).isoformat()
+
+
+def _seconds(value: Optional[str]) -> Optional[int]:
+    """ISO (độ chính xác giây) -> số giây; None nếu không có thời gian."""
+    if not value:
+        return None
+    micros = _micros(value)
+    if micros % 1_000_000 or len(value) != 19:
+        # Chỉ nhận đúng định dạng isoformat(timespec="seconds") để giải mã ra y hệt
+        raise CodecError(f"Thời gian không ở dạng giây: {value!r}")
+    return micros // 1_000_000
+
+
+def _from_seconds(value: Optional[int]) -> str:
+    if value is None:
+        return ""
+    return (_EPOCH + timedelta(seconds=value)).isoformat(timespec="seconds")
+
+
+# ---------- Encode ----------
+def _write_bitmap(w: _Writer, numbers: list, start: int, end: int, what: str) -> None:
+    size = end - start + 1
+    bitmap = bytearray((size + 7) // 8)
+    prev = None
+    for n in numbers:
+        if not isinstance(n, int) or not start <= n <= end or (prev is not None and n <= prev):
+            # Bitmap không giữ được thứ tự/trùng lặp -> để JSON lưu
+            raise CodecError(f"{what} không tăng dần trong khoảng")
+        offset = n - start
+        bitmap[offset >> 3] |= 1 << (offset & 7)
+        prev = n
+    w.raw(bytes(bitmap))
+
+
+def _use_deltas(numbers: list, start: int, end: int) -> bool:
+    """Tập thưa (dưới 1/16 khoảng): dãy delta varint gọn hơn bitmap."""
+    return len(numbers) * 16 < end - start + 1
+
+
+def _write_deltas(w: _Writer, numbers: list, start: int, end: int, what: str) -> None:
+    w.uvarint(len(numbers))
+    prev = start - 1
+    for n in numbers:
+        if not isinstance(n, int) or not prev < n <= end:
+            raise CodecError(f"{what} không tăng dần trong khoảng")
+        w.uvarint(n - prev - 1)
+        prev = n
+
+
+def _write_numbers(w: _Writer, numbers: list) -> None:
+    w.uvarint(len(numbers))
+    for n in numbers:
+        if not isinstance(n, int):
+            raise CodecError(f"Số không hợp lệ: {n!r}")
+        w.svarint(n)
+
+
+def _check_keys(item: dict, allowed: set, what: str) -> None:
+    if not isinstance(item, dict) or not set(item) <= allowed:
+        raise CodecError(f"{what} có trường không hỗ trợ")
+
+
+def encode_session(data: dict) -> bytes:
+    """Mã hoá dict của WheelSession; raise CodecError nếu không biểu diễn được."""
+    start = data["start_number"]
+    end = data["end_number"]
+    if not (isinstance(start, int) and isinstance(end, int)) or start > end:
+        raise CodecError("Khoảng số không hợp lệ")
+
+    # Bảng tên dùng chung cho người chơi, người thắng, người đợi số
+    names: dict[Optional[str], int] = {}
+
+    def name_ref(name: Optional[str]) -> int:
+        if name is not None and not isinstance(name, str):
+            raise CodecError(f"Tên không hợp lệ: {name!r}")
+        if name not in names:
+            names[name] = len(names)
+        return names[name]
+
+    body = _Writer()
+
+    # Khoảng số & pool
+    body.svarint(start)
+    body.uvarint(end - start)
+    available = data.get("available_numbers")
+    if available is None:
+        body.uvarint(_SET_ABSENT)
+    elif _use_deltas(available, start, end):
+        body.uvarint(_SET_DELTAS)
+        _write_deltas(body, available, start, end, "available_numbers")
+    else:
+        body.uvarint(_SET_BITMAP)
+        _write_bitmap(body, available, start, end, "available_numbers")
+    drawn = data.get("drawn_numbers")
+    drawn_deltas = drawn is not None and _use_deltas(drawn, start, end)
+    if drawn_deltas:
+        _write_deltas(body, drawn, start, end, "drawn_numbers")
+    elif drawn is not None:
+        _write_bitmap(body, drawn, start, end, "drawn_numbers")
+    _write_numbers(body, data.get("removed_numbers") or [])
+    seeded = data.get("draw_seed") is not None
+    if seeded:
+        body.uvarint(data["draw_seed"])
+        body.uvarint(data.get("draw_cursor", 0))
+
+    body.opt_svarint(data.get("last_spin"))
+    body.uvarint(data.get("spin_count", 0))
+    body.uvarint(data.get("spin_seq", 0))
+    body.opt_svarint(_micros(data["created_at"]) if data.get("created_at") else None)
+    body.opt_svarint(_micros(data["updated_at"]) if data.get("updated_at") else None)
+    body.opt_svarint(data.get("owner_id"))
+    body.opt_svarint(data.get("last_control_message_id"))
+    body.opt_string(data.get("game_name"))
+    body.opt_string(data.get("round_name"))
+
+    # Lịch sử quay: dãy số + dãy thời gian (delta giây so với lượt trước)
+    history = data.get("history") or []
+    body.uvarint(len(history))
+    prev_ts = 0
+    for item in history:
+        _check_keys(item, {"number", "time"}, "history")
+        number = item.get("number")
+        if not isinstance(number, int):
+            raise CodecError(f"Số không hợp lệ: {number!r}")
+        body.svarint(number)
+        ts = _seconds(item.get("time"))
+        if ts is None:
+            body.uvarint(0)
+        else:
+            body.uvarint(1)
+            body.svarint(ts - prev_ts)
+            prev_ts = ts
+
+    participants = data.get("participants") or []
+    body.uvarint(len(participants))
+    for p in participants:
+        _check_keys(p, {"user_id", "name"}, "participants")
+        body.opt_svarint(p.get("user_id"))
+        body.uvarint(name_ref(p.get("name")))
+
+    winners = data.get("winners") or []
+    body.uvarint(len(winners))
+    for win in winners:
+        _check_keys(win, {"user_id", "name", "numbers", "time"}, "winners")
+        body.opt_svarint(win.get("user_id"))
+        body.uvarint(name_ref(win.get("name")))
+        _write_numbers(body, list(win.get("numbers") or []))
+        ts = _seconds(win.get("time"))
+        body.opt_svarint(ts)
+
+    tickets = data.get("tickets") or {}
+    body.uvarint(len(tickets))
+    for code, uid in tickets.items():
+        body.string(code)
+        body.opt_svarint(uid)
+
+    user_tickets = data.get("user_tickets") or {}
+    body.uvarint(len(user_tickets))
+    for uid, code in user_tickets.items():
+        try:
+            body.svarint(int(uid))
+        except (TypeError, ValueError):
+            raise CodecError(f"user_id không hợp lệ: {uid!r}") from None
+        body.string(code)
+
+    waiting = data.get("waiting_numbers") or {}
+    body.uvarint(len(waiting))
+    for number, users in waiting.items():
+        try:
+            body.svarint(int(number))
+        except (TypeError, ValueError):
+            raise CodecError(f"Số đợi không hợp lệ: {number!r}") from None
+        body.uvarint(len(users))
+        for user in users:
+            if len(user) != 2:
+                raise CodecError(f"Người đợi không hợp lệ: {user!r}")
+            uid, name = user
+            body.svarint(uid)
+            body.uvarint(name_ref(name))
+
+    # Khoá ngoài định dạng (vd: meta của storage) giữ nguyên dưới dạng JSON
+    extra = {k: v for k, v in data.items() if k not in _KNOWN_KEYS}
+    body.string(json.dumps(extra, ensure_ascii=False, separators=(",", ":")) if extra else "")
+
+    # Header: magic, version, cờ, id, bảng tên, rồi tới phần thân
+    head = _Writer()
+    head.raw(MAGIC)
+    head.uvarint(CODEC_VERSION)
+
+    flags = 0
+    if data.get("remove_after_spin", True):
+        flags |= _F_REMOVE
+    if data.get("started"):
+        flags |= _F_STARTED
+    if drawn is not None:
+        flags |= _F_DRAWN
+    if drawn_deltas:
+        flags |= _F_DRAWN_DELTAS
+    if seeded:
+        flags |= _F_SEEDED
+    session_id = data.get("id")
+    packed_id = None
+    if isinstance(session_id, str):
+        try:
+            if str(uuid.UUID(session_id)) == session_id:
+                packed_id = uuid.UUID(session_id).bytes
+        except ValueError:
+            pass
+    if packed_id is not None:
+        flags |= _F_UUID
+    head.uvarint(flags)
+    if packed_id is not None:
+        head.raw(packed_id)
+    else:
+        head.opt_string(session_id)
+
+    head.uvarint(len(names))
+    for name in names:
+        head.opt_string(name)
+
+    return bytes(head.buf + body.buf)
+
+
+# ---------- Decode ----------
+def is_encoded(raw: Any) -> bool:
+    """Dữ liệu có phải được mã hoá bởi encode_session không."""
+    return isinstance(raw, (bytes, bytearray, memoryview)) and bytes(raw[:2]) == MAGIC
+
+
+def _read_bitmap(r: _Reader, start: int, end: int) -> list:
+    bitmap = r.raw((end - start + 1 + 7) // 8)
+    return [start + i for i in range(end - start + 1) if bitmap[i >> 3] & (1 << (i & 7))]
+
+
+def _read_deltas(r: _Reader, start: int) -> list:
+    numbers = []
+    prev = start - 1
+    for _ in range(r.uvarint()):
+        prev += r.uvarint() + 1
+        numbers.append(prev)
+    return numbers
+
+
+def decode_session(raw: bytes) -> dict:
+    """Giải mã về dict cùng dạng với WheelSession.to_dict()."""
+    if not is_encoded(raw):
+        raise CodecError("Không phải dữ liệu session nhị phân")
+    r = _Reader(bytes(raw))
+    r.raw(len(MAGIC))
+    version = r.uvarint()
+    if version != CODEC_VERSION:
+        raise CodecError(f"Không hỗ trợ version {version}")
+
+    flags = r.uvarint()
+    session_id = str(uuid.UUID(bytes=r.raw(16))) if flags & _F_UUID else r.opt_string()
+    names = [r.opt_string() for _ in range(r.uvarint())]
+
+    data: dict[str, Any] = {"id": session_id}
+    start = r.svarint()
+    end = start + r.uvarint()
+    data["start_number"] = start
+    data["end_number"] = end
+    data["remove_after_spin"] = bool(flags & _F_REMOVE)
+
+    available = r.uvarint()
+    if available == _SET_DELTAS:
+        data["available_numbers"] = _read_deltas(r, start)
+    elif available:
+        data["available_numbers"] = _read_bitmap(r, start, end)
+    if flags & _F_DRAWN_DELTAS:
+        data["drawn_numbers"] = _read_deltas(r, start)
+    elif flags & _F_DRAWN:
+        data["drawn_numbers"] = _read_bitmap(r, start, end)
+    data["removed_numbers"] = [r.svarint() for _ in range(r.uvarint())]
+    if flags & _F_SEEDED:
+        data["draw_seed"] = r.uvarint()
+        data["draw_cursor"] = r.uvarint()
+
+    data["last_spin"] = r.opt_svarint()
+    data["spin_count"] = r.uvarint()
+    data["spin_seq"] = r.uvarint()
+    for key in ("created_at", "updated_at"):
+        micros = r.opt_svarint()
+        if micros is not None:
+            data[key] = _from_micros(micros)
+    data["owner_id"] = r.opt_svarint()
+    data["last_control_message_id"] = r.opt_svarint()
+    data["game_name"] = r.opt_string()
+    data["round_name"] = r.opt_string()
+    data["started"] = bool(flags & _F_STARTED)
+
+    history = []
+    prev_ts = 0
+    for _ in range(r.uvarint()):
+        number = r.svarint()
+        ts = None
+        if r.uvarint():
+            ts = prev_ts + r.svarint()
+            prev_ts = ts
+        history.append({"number": number, "time": _from_seconds(ts)})
+    data["history"] = history
+
+    data["participants"] = [
+        {"user_id": r.opt_svarint(), "name": names[r.uvarint()]}
+        for _ in range(r.uvarint())
+    ]
+
+    winners = []
+    for _ in range(r.uvarint()):
+        user_id = r.opt_svarint()
+        name = names[r.uvarint()]
+        numbers = [r.svarint() for _ in range(r.uvarint())]
+        winners.append({"user_id": user_id, "name": name, "numbers": numbers, "time": _from_seconds(r.opt_svarint())})
+    data["winners"] = winners
+
+    data["tickets"] = {r.string(): r.opt_svarint() for _ in range(r.uvarint())}
+    data["user_tickets"] = {r.svarint(): r.string() for _ in range(r.uvarint())}
+
+    waiting = {}
+    for _ in range(r.uvarint()):
+        number = r.svarint()
+        waiting[str(number)] = [(r.svarint(), names[r.uvarint()]) for _ in range(r.uvarint())]
+    data["waiting_numbers"] = waiting
+
+    extra = r.string()
+    if extra:
+        data.update(json.loads(extra))
+    return data
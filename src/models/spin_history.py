@@ -0,0 +1,162 @@
+"""
+Lịch sử quay số gọn của một session (ring buffer)
+"""
+from array import array
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+# Số lượt tối đa giữ trong RAM; lượt cũ nhất bị ghi đè khi đầy
+HISTORY_CAPACITY = 1000
+
+# Giá trị thay cho "không có thời gian" trong cột epoch
+_NO_TIME = -(1 << 63)
+
+
+def _to_epoch(value: Optional[str]) -> int:
+    if not value:
+        return _NO_TIME
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except (TypeError, ValueError):
+        return _NO_TIME
+
+
+class SpinRecord:
+    """Một lượt quay: số và thời điểm (epoch giây, giờ địa phương khi hiển thị)."""
+
+    __slots__ = ("number", "ts")
+
+    def __init__(self, number: int, ts: Optional[int] = None):
+        self.number = number
+        self.ts = ts
+
+    @property
+    def time(self) -> str:
+        """Thời điểm quay dạng ISO (tới giây), "" nếu không rõ."""
+        if self.ts is None:
+            return ""
+        return datetime.fromtimestamp(self.ts).isoformat(timespec="seconds")
+
+    def to_dict(self) -> dict:
+        return {"number": self.number, "time": self.time}
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SpinRecord):
+            return NotImplemented
+        return self.number == other.number and self.ts == other.ts
+
+    def __repr__(self) -> str:
+        return f"SpinRecord(number={self.number}, time={self.time!r})"
+
+
+class SpinHistory:
+    """
+    Lịch sử quay dạng cột: `array` số và `array` epoch giây chạy song song.
+
+    Khi chưa đầy, hai mảng chỉ lớn dần theo số lượt (mỗi lượt 16 byte);
+    khi đủ `capacity` lượt thì thành ring buffer: lượt mới ghi đè lượt cũ
+    nhất tại `_head`, nên append và loại bỏ đều O(1).
+    """
+
+    __slots__ = ("capacity", "_numbers", "_times", "_head")
+
+    def __init__(self, capacity: int = HISTORY_CAPACITY):
+        if capacity <= 0:
+            raise ValueError("capacity phải > 0")
+        self.capacity = capacity
+        self._numbers = array("l")
+        self._times = array("q")
+        # Vị trí lượt cũ nhất (chỉ khác 0 khi buffer đã đầy)
+        self._head = 0
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+    def __bool__(self) -> bool:
+        return len(self._numbers) > 0
+
+    def append(self, number: int, ts: Optional[int] = None) -> None:
+        """Thêm một lượt quay (ts: epoch giây)."""
+        ts = _NO_TIME if ts is None else ts
+        if len(self._numbers) < self.capacity:
+            self._numbers.append(number)
+            self._times.append(ts)
+        else:
+            self._numbers[self._head] = number
+            self._times[self._head] = ts
+            self._head = (self._head + 1) % self.capacity
+
+    def clear(self) -> None:
+        self._numbers = array("l")
+        self._times = array("q")
+        self._head = 0
+
+    def _ordered(self, column: array, start: int = 0) -> array:
+        """Cột theo thứ tự quay, từ lượt thứ `start` (0 = cũ nhất); chỉ chép phần cần lấy."""
+        size = len(column)
+        if self._head == 0 or start >= size:
+            return column[start:]
+        begin = (self._head + start) % size
+        end = begin + size - start
+        if end <= size:
+            return column[begin:end]
+        return column[begin:] + column[:end - size]
+
+    def _record(self, number: int, ts: int) -> SpinRecord:
+        return SpinRecord(number, None if ts == _NO_TIME else ts)
+
+    def __iter__(self) -> Iterator[SpinRecord]:
+        return iter(self.recent(len(self)))
+
+    def recent(self, limit: int = 10) -> list[SpinRecord]:
+        """`limit` lượt gần nhất, cũ trước mới sau."""
+        if limit <= 0:
+            return []
+        start = max(len(self) - limit, 0)
+        return [
+            self._record(number, ts)
+            for number, ts in zip(self._ordered(self._numbers, start), self._ordered(self._times, start))
+        ]
+
+    def recent_numbers(self, limit: int = 10) -> list[int]:
+        """Các số của `limit` lượt gần nhất."""
+        if limit <= 0:
+            return []
+        return self._ordered(self._numbers, max(len(self) - limit, 0)).tolist()
+
+    def numbers(self) -> list[int]:
+        """Mọi số trong lịch sử theo thứ tự quay."""
+        return self._ordered(self._numbers).tolist()
+
+    @property
+    def last(self) -> Optional[SpinRecord]:
+        if not self:
+            return None
+        i = (self._head - 1) % len(self._numbers)
+        return self._record(self._numbers[i], self._times[i])
+
+    def rows(self, base_seq: int, after_seq: Optional[int] = None) -> list[tuple[int, int, Optional[int]]]:
+        """
+        Các lượt dạng (seq, số, epoch) để ghi bảng spins; lượt cũ nhất có seq
+        `base_seq + 1`. Chỉ lấy các lượt seq > `after_seq` (chỉ chép phần đó).
+        """
+        start = 0 if after_seq is None else min(max(after_seq - base_seq, 0), len(self))
+        return [
+            (base_seq + start + i + 1, number, None if ts == _NO_TIME else ts)
+            for i, (number, ts) in enumerate(
+                zip(self._ordered(self._numbers, start), self._ordered(self._times, start))
+            )
+        ]
+
+    # Dạng dict cũ: [{'number': int, 'time': str}, ...], chỉ dùng khi lưu trữ JSON
+    def to_dicts(self) -> list[dict]:
+        return [record.to_dict() for record in self]
+
+    def load(self, items: Iterable[dict]) -> None:
+        """Nạp lại từ dạng dict (giữ `capacity` lượt cuối)."""
+        self.clear()
+        for item in items:
+            self.append(int(item.get("number")), _to_epoch(item.get("time")))
+
+    def __repr__(self) -> str:
+        return f"SpinHistory(len={len(self)}, capacity={self.capacity})"
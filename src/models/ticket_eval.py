@@ -0,0 +1,136 @@
+"""
+Đánh giá hàng loạt vé in sẵn so với tập số đã quay.
+
+Dùng khi tổng kết game, đối chiếu khiếu nại và mô phỏng: mọi vé được xếp
+thành một mảng (vé x hàng x ô) và tập số đã quay thành một mask, số khớp /
+hàng đủ của tất cả vé tính trong vài phép toán NumPy. Không có NumPy thì
+chạy vòng lặp Python thuần với cùng kết quả.
+"""
+from typing import Any, Iterable, NamedTuple, Optional, Sequence
+
+from .ticket_layouts import ROW_SIZE, TICKET_ROWS
+
+try:
+    import numpy as np
+except ImportError:  # NumPy là tuỳ chọn
+    np = None
+
+# Luật kinh của /kinh: đủ 5 số khác nhau đã quay, không số nào chưa quay/không hợp lệ
+WIN_MIN_MATCHED = ROW_SIZE
+
+_CODES = tuple(TICKET_ROWS)
+_CODE_INDEX = {code: i for i, code in enumerate(_CODES)}
+# Mảng bố cục (mã vé x hàng x ô), tạo khi cần lần đầu
+_code_array = None
+
+
+def has_numpy() -> bool:
+    return np is not None
+
+
+def is_winning_claim(matched: Sequence[int], not_drawn: Sequence[Any], invalid: Sequence[Any]) -> bool:
+    """Một lần kinh hợp lệ hay không (dùng chung cho /kinh và bộ đánh giá)."""
+    return len(set(matched)) >= WIN_MIN_MATCHED and not not_drawn and not invalid
+
+
+class TicketResult(NamedTuple):
+    """Kết quả của một vé: số ô đã quay, số ô chưa quay và các hàng đã đủ."""
+    user_id: Any
+    code: str
+    matched: int
+    missing: int
+    complete_rows: tuple[int, ...]
+
+    @property
+    def is_winner(self) -> bool:
+        return bool(self.complete_rows)
+
+
+def _evaluate_python(layouts: Sequence[Sequence[Sequence[int]]], drawn: set) -> list[tuple[int, tuple[int, ...]]]:
+    results = []
+    for rows in layouts:
+        matched = 0
+        complete = []
+        for i, row in enumerate(rows):
+            hits = sum(1 for number in row if number in drawn)
+            matched += hits
+            if hits == len(row):
+                complete.append(i)
+        results.append((matched, tuple(complete)))
+    return results
+
+
+def _evaluate_numpy(layouts, drawn: set) -> list[tuple[int, tuple[int, ...]]]:
+    layouts = np.asarray(layouts)
+    if not layouts.size:
+        return [(0, ())] * len(layouts)
+    mask = np.zeros(int(layouts.max()) + 1, dtype=bool)
+    in_range = [n for n in drawn if 0 <= n < len(mask)]
+    mask[in_range] = True
+
+    hits = mask[layouts]                      # vé x hàng x ô
+    row_hits = hits.sum(axis=2)               # vé x hàng
+    matched = row_hits.sum(axis=1).tolist()   # vé
+    tickets, rows = np.nonzero(row_hits == layouts.shape[2])
+
+    complete: list[list[int]] = [[] for _ in range(len(layouts))]
+    for ticket, row in zip(tickets.tolist(), rows.tolist()):
+        complete[ticket].append(row)
+    return [(m, tuple(c)) for m, c in zip(matched, complete)]
+
+
+def evaluate_layouts(
+    layouts: Sequence[Sequence[Sequence[int]]],
+    drawn: Iterable[int],
+    use_numpy: Optional[bool] = None,
+) -> list[tuple[int, tuple[int, ...]]]:
+    """
+    Đánh giá các vé có cùng kích thước (hàng x ô) với tập số đã quay.
+    Trả về [(số ô đã quay, các hàng đã đủ), ...] theo thứ tự vé.
+    `use_numpy`: None = dùng NumPy nếu có; True mà không có NumPy thì RuntimeError.
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    elif use_numpy and np is None:
+        raise RuntimeError("NumPy chưa được cài đặt")
+    drawn = set(drawn)
+    if use_numpy:
+        return _evaluate_numpy(layouts, drawn)
+    return _evaluate_python(layouts, drawn)
+
+
+def code_layouts(codes: Sequence[str]):
+    """Bố cục của các mã vé: mảng NumPy (lấy từ bảng dựng sẵn) hoặc list nếu không có NumPy."""
+    global _code_array
+    if np is None:
+        return [TICKET_ROWS[code] for code in codes]
+    if _code_array is None:
+        _code_array = np.array([TICKET_ROWS[code] for code in _CODES], dtype=np.int16)
+    return _code_array[[_CODE_INDEX[code] for code in codes]]
+
+
+def evaluate_tickets(
+    user_tickets: dict,
+    drawn: Iterable[int],
+    use_numpy: Optional[bool] = None,
+) -> list[TicketResult]:
+    """Đánh giá các vé đang giữ {user_id: mã vé} (bỏ qua mã vé không có bố cục)."""
+    held = [(user_id, code) for user_id, code in user_tickets.items() if code in _CODE_INDEX]
+    if not held:
+        return []
+    codes = [code for _, code in held]
+    if use_numpy is False:
+        layouts = [TICKET_ROWS[code] for code in codes]
+    else:
+        layouts = code_layouts(codes)
+    evaluated = evaluate_layouts(layouts, drawn, use_numpy)
+    cells = len(TICKET_ROWS[codes[0]]) * ROW_SIZE
+    return [
+        TicketResult(user_id, code, matched, cells - matched, complete)
+        for (user_id, code), (matched, complete) in zip(held, evaluated)
+    ]
+
+
+def evaluate_session(session, use_numpy: Optional[bool] = None) -> list[TicketResult]:
+    """Đánh giá mọi vé đang giữ trong session với các số đã quay."""
+    return evaluate_tickets(getattr(session, "user_tickets", {}), session.drawn_sorted(), use_numpy)
@@ -0,0 +1,196 @@
+"""
+Vòng quay giải thưởng có trọng số: bảng alias (Walker/Vose) rút O(1)
+"""
+import math
+import random
+from typing import Iterable, Iterator, Optional, Sequence
+
+# Dựng lại bảng alias khi tổng trọng số còn lại dưới tỉ lệ này so với lúc dựng
+REBUILD_RATIO = 0.5
+
+
+class AliasTable:
+    """
+    Bảng alias của Vose cho phân phối rời rạc theo `weights`.
+
+    Mỗi ô i giữ xác suất `prob[i]` và một chỉ số `alias[i]`; rút mẫu = chọn
+    ô đều ngẫu nhiên rồi tung đồng xu `prob[i]`, nên luôn O(1) sau khi dựng O(n).
+    """
+
+    __slots__ = ("_prob", "_alias")
+
+    def __init__(self, weights: Sequence[float]):
+        n = len(weights)
+        total = math.fsum(weights)
+        if not n or total <= 0:
+            raise ValueError("Cần ít nhất một trọng số dương")
+        scaled = [w * n / total for w in weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] += scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Phần còn lại (do sai số làm tròn) có xác suất 1
+        self._prob = prob
+        self._alias = alias
+
+    def __len__(self) -> int:
+        return len(self._prob)
+
+    def sample(self, rng: random.Random = random) -> int:
+        """Chỉ số được rút theo trọng số (một lần gọi rng.random())."""
+        u = rng.random() * len(self._prob)
+        i = int(u)
+        # Phần lẻ của u độc lập với i, dùng luôn làm đồng xu
+        return i if u - i < self._prob[i] else self._alias[i]
+
+
+def check_weights(weights: Iterable[float]) -> tuple[float, ...]:
+    """Chuẩn hoá trọng số; ValueError nếu có trọng số không dương/không hữu hạn."""
+    result = tuple(float(w) for w in weights)
+    for w in result:
+        if not math.isfinite(w) or w <= 0:
+            raise ValueError(f"Trọng số phải là số dương: {w!r}")
+    return result
+
+
+class WeightedDrawPool:
+    """
+    Các ô còn lại của vòng quay [start, end], ô `start + i` có trọng số `weights[i]`.
+
+    Cùng giao diện với DrawPool. Rút = lấy mẫu từ bảng alias và bỏ qua ô đã
+    loại (rejection); bảng chỉ dựng lại (lười, ở lượt rút kế tiếp) khi tổng
+    trọng số còn lại giảm dưới REBUILD_RATIO lần lúc dựng, nên mỗi lượt rút
+    kỳ vọng O(1) và số lần dựng lại chỉ tăng theo log của tổng trọng số.
+    """
+
+    __slots__ = ("start", "end", "weights", "_alive", "_size", "_alive_weight", "_table", "_table_ids", "_table_weight")
+
+    # Không hỗ trợ chế độ xáo trước (để cùng giao diện với DrawPool)
+    seed = None
+
+    def __init__(
+        self,
+        start: int,
+        end: int,
+        weights: Sequence[float],
+        available: Optional[Iterable[int]] = None,
+    ):
+        weights = check_weights(weights)
+        if len(weights) != end - start + 1:
+            raise ValueError("Số trọng số phải bằng số ô của vòng quay")
+        self.start = start
+        self.end = end
+        self.weights = weights
+        self.reset()
+        if available is not None:
+            self.load(available)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, number: object) -> bool:
+        if not isinstance(number, int) or not self.start <= number <= self.end:
+            return False
+        return self._alive[number - self.start]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.to_list())
+
+    def _invalidate(self) -> None:
+        self._table = None
+        self._alive_weight = math.fsum(w for w, alive in zip(self.weights, self._alive) if alive)
+
+    def _sample(self) -> int:
+        if not self._size:
+            raise IndexError("DrawPool rỗng")
+        if self._table is None or self._alive_weight < self._table_weight * REBUILD_RATIO:
+            ids = [i for i, alive in enumerate(self._alive) if alive]
+            self._table = AliasTable([self.weights[i] for i in ids])
+            self._table_ids = ids
+            self._table_weight = self._alive_weight = math.fsum(self.weights[i] for i in ids)
+        table, ids, alive = self._table, self._table_ids, self._alive
+        while True:
+            i = ids[table.sample()]
+            if alive[i]:
+                return i
+
+    def _kill(self, i: int) -> None:
+        self._alive[i] = False
+        self._size -= 1
+        self._alive_weight -= self.weights[i]
+
+    def choice(self) -> int:
+        """Chọn một ô còn lại theo trọng số (không loại bỏ)."""
+        return self.start + self._sample()
+
+    @property
+    def cursor(self) -> int:
+        """Số lượt đã rút từ lần reset gần nhất."""
+        return len(self.weights) - self._size
+
+    def shuffle(self, seed: int, cursor: int = 0) -> None:
+        raise ValueError("Vòng quay có trọng số không hỗ trợ chế độ xáo trước")
+
+    def drawn_order(self) -> list[int]:
+        raise ValueError("Vòng quay có trọng số không hỗ trợ chế độ xáo trước")
+
+    def draw(self) -> int:
+        """Rút một ô theo trọng số và loại nó khỏi pool."""
+        i = self._sample()
+        self._kill(i)
+        return self.start + i
+
+    def remove(self, number: int) -> bool:
+        """Loại một ô cụ thể. Trả về False nếu ô không còn trong pool."""
+        if number not in self:
+            return False
+        self._kill(number - self.start)
+        return True
+
+    def reset(self) -> None:
+        """Khôi phục mọi ô (bảng alias dựng lại ở lượt rút kế tiếp)."""
+        self._alive = [True] * len(self.weights)
+        self._size = len(self.weights)
+        self._table = None
+        self._table_ids = []
+        self._table_weight = 0.0
+        self._alive_weight = math.fsum(self.weights)
+
+    def clear(self) -> None:
+        """Loại bỏ toàn bộ ô."""
+        self._alive = [False] * len(self.weights)
+        self._size = 0
+        self._invalidate()
+
+    def load(self, numbers: Iterable[int]) -> None:
+        """Đặt tập ô còn lại (bỏ qua số ngoài khoảng và số trùng)."""
+        alive = [False] * len(self.weights)
+        for number in numbers:
+            if isinstance(number, int) and self.start <= number <= self.end:
+                alive[number - self.start] = True
+        self._alive = alive
+        self._size = sum(alive)
+        self._invalidate()
+
+    def load_removed(self, numbers: Iterable[int]) -> None:
+        """Đặt lại đủ các ô rồi loại các ô `numbers`."""
+        self.reset()
+        for number in numbers:
+            self.remove(number)
+
+    def removed(self) -> list[int]:
+        """Các ô đã loại, tăng dần."""
+        return [self.start + i for i, alive in enumerate(self._alive) if not alive]
+
+    def to_list(self) -> list[int]:
+        """Các ô còn lại theo thứ tự tăng dần."""
+        return [self.start + i for i, alive in enumerate(self._alive) if alive]
+
+    def __repr__(self) -> str:
+        return f"WeightedDrawPool({self.start}-{self.end}, remaining={self._size})"
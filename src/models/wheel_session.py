@@ -2,10 +2,18 @@
 Model quản lý session của random wheel
 """
 from datetime import datetime
-from typing import List, Optional
+from typing import Callable, List, Optional
 import json
 import uuid
 
+from .draw_pool import SparseDrawPool, make_draw_pool, new_seed
+from .spin_history import SpinHistory, SpinRecord
+from .ticket_layouts import RowTracker
+from .weighted_pool import WeightedDrawPool, check_weights
+
+# Độ rộng tối đa của một session (chế độ xổ số/bốc thăm khoảng lớn)
+MAX_RANGE_SIZE = 10_000_000
+
 
 class WheelSession:
     """Quản lý một session quay wheel"""
@@ -19,6 +27,7 @@ class WheelSession:
         game_name: Optional[str] = None,
         owner_id: Optional[int] = None,
         round_name: Optional[str] = None,
+        segments: Optional[list[tuple[str, float]]] = None,
     ):
         """
         Khởi tạo wheel session
@@ -30,6 +39,8 @@ class WheelSession:
             session_id: ID của session (tự động tạo nếu None)
             game_name: Tên game (tuỳ chọn)
             owner_id: ID người tạo session (tuỳ chọn)
+            segments: Vòng quay giải thưởng [(nhãn, trọng số), ...], ô thứ i là
+                số start_number + i (None = mọi số đồng xác suất)
         """
         if start_number > end_number:
             raise ValueError("start_number phải nhỏ hơn hoặc bằng end_number")
@@ -37,10 +48,9 @@ class WheelSession:
         if start_number < 0:
             raise ValueError("start_number phải >= 0")
         
-        # Giới hạn số lượng số trong danh sách
-        max_numbers = 90
-        if (end_number - start_number + 1) > max_numbers:
-            raise ValueError(f"Khoảng số quá lớn. Tối đa {max_numbers} số")
+        # Giới hạn số lượng số trong danh sách (loto 90 số giới hạn ở validate_range)
+        if (end_number - start_number + 1) > MAX_RANGE_SIZE:
+            raise ValueError(f"Khoảng số quá lớn. Tối đa {MAX_RANGE_SIZE} số")
         
         self.id = session_id or str(uuid.uuid4())
         self.start_number = start_number
@@ -53,10 +63,13 @@ class WheelSession:
         self.owner_id = owner_id
         # Tên vòng chơi (vòng mới) mà session này thuộc về, nếu có
         self.round_name = round_name
+        # Gọi khi tập người chơi hoặc trạng thái bắt đầu đổi (SessionManager dùng
+        # để cập nhật chỉ mục user -> chat); không lưu trữ
+        self.on_members_changed: Optional[Callable[['WheelSession'], None]] = None
         # Danh sách người tham gia game: [{user_id, name}, ...]
         self.participants: list[dict] = []
         # Trạng thái game đã bắt đầu hay chưa (host dùng /bat_dau)
-        self.started: bool = False
+        self._started = False
         # Danh sách người trúng thưởng trong game hiện tại
         # [{'user_id': int, 'name': str, 'numbers': list[int], 'time': str}, ...] 
         self.winners: list[dict] = []
@@ -69,21 +82,160 @@ class WheelSession:
         # ID tin nhắn bảng điều khiển cuối cùng để có thể xoá và đẩy xuống dưới
         self.last_control_message_id: Optional[int] = None
         
-        # Tạo danh sách số ban đầu
-        self.available_numbers = list(range(start_number, end_number + 1))
+        # Pool các số còn lại (rút/kiểm tra O(1), xem DrawPool); khoảng lớn
+        # dùng SparseDrawPool với bộ nhớ theo số lượt rút, vòng quay giải
+        # thưởng dùng WeightedDrawPool (bảng alias)
+        self.segments: Optional[list[tuple[str, float]]] = None
+        if segments is not None:
+            labels = [str(label) for label, _ in segments]
+            weights = check_weights(weight for _, weight in segments)
+            self.segments = list(zip(labels, weights))
+            self.pool = WeightedDrawPool(start_number, end_number, weights)
+        else:
+            self.pool = make_draw_pool(start_number, end_number)
         self.removed_numbers = []
+        # Chỉ mục các số đã quay từ lần reset gần nhất: bit (n - start_number).
+        # spin_wheel/reset_session/clear_session cập nhật, không cần quét history.
+        # Khoảng lớn dùng set thay bitmask (phép OR trên số nguyên lớn là O(khoảng))
+        self._drawn_mask = 0
+        self._drawn_set: Optional[set[int]] = set() if self.is_sparse else None
+        # Số đã quay trên từng hàng của các vé in sẵn (đi cùng _drawn_mask)
+        self.row_tracker = RowTracker()
         self.last_spin: Optional[int] = None
         self.spin_count = 0
-        # Lịch sử các lần quay: [{'number': int, 'time': str}, ...]
-        self.history: list[dict] = []
+        # Lịch sử các lần quay (ring buffer gọn, xem SpinHistory); `history`
+        # là dạng dict cũ [{'number': int, 'time': str}, ...] để lưu trữ
+        self.spin_history = SpinHistory()
+        # Tổng số lượt đã ghi vào lịch sử (tăng dần, không reset) - dùng làm
+        # seq của lượt quay khi lưu xuống DB
+        self.spin_seq = 0
     
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    @started.setter
+    def started(self, value: bool) -> None:
+        changed = bool(value) != self._started
+        self._started = bool(value)
+        if changed:
+            self._members_changed()
+
+    def _members_changed(self) -> None:
+        if self.on_members_changed is not None:
+            self.on_members_changed(self)
+
+    def member_ids(self) -> set[int]:
+        """user_id của chủ phòng và mọi người tham gia"""
+        ids = {p.get("user_id") for p in self.participants}
+        ids.add(self.owner_id)
+        ids.discard(None)
+        return ids
+
+    @property
+    def history(self) -> list[dict]:
+        """Lịch sử quay dạng dict (tạo mới mỗi lần gọi, chỉ dùng khi lưu trữ)."""
+        return self.spin_history.to_dicts()
+
+    @history.setter
+    def history(self, items: list[dict]) -> None:
+        self.spin_history.load(items)
+
+    @property
+    def available_numbers(self) -> list[int]:
+        """Các số còn lại (tăng dần). Gán list để đặt lại pool."""
+        return self.pool.to_list()
+
+    @available_numbers.setter
+    def available_numbers(self, numbers: list[int]) -> None:
+        self.pool.load(numbers)
+
+    @property
+    def is_sparse(self) -> bool:
+        """Session khoảng lớn (SparseDrawPool, lưu trữ theo số lượt rút)"""
+        return isinstance(self.pool, SparseDrawPool)
+
+    def segment_label(self, number: int) -> str:
+        """Nhãn của ô `number` trên vòng quay giải thưởng (số thường: chính số đó)"""
+        if self.segments is None or not self.start_number <= number <= self.end_number:
+            return str(number)
+        return self.segments[number - self.start_number][0]
+
+    def is_available(self, number: int) -> bool:
+        """Số `number` còn trong pool hay không (O(1))"""
+        return number in self.pool
+
+    def mark_drawn(self, number: int) -> None:
+        """Ghi nhận số `number` đã được quay"""
+        if not self.start_number <= number <= self.end_number:
+            return
+        if self._drawn_set is not None:
+            if number not in self._drawn_set:
+                self._drawn_set.add(number)
+                self.row_tracker.hit(number)
+            return
+        bit = 1 << (number - self.start_number)
+        if not self._drawn_mask & bit:
+            self._drawn_mask |= bit
+            self.row_tracker.hit(number)
+
+    def clear_drawn(self) -> None:
+        """Xoá chỉ mục số đã quay (khi reset/clear)"""
+        self._drawn_mask = 0
+        if self._drawn_set is not None:
+            self._drawn_set = set()
+        self.row_tracker.clear()
+
+    def is_drawn(self, number: int) -> bool:
+        """Số `number` đã được quay hay chưa (O(1))"""
+        if not self.start_number <= number <= self.end_number:
+            return False
+        if self._drawn_set is not None:
+            return number in self._drawn_set
+        return bool(self._drawn_mask >> (number - self.start_number) & 1)
+
+    def drawn_sorted(self) -> list[int]:
+        """Các số đã quay, tăng dần, không trùng"""
+        if self._drawn_set is not None:
+            return sorted(self._drawn_set)
+        mask, start = self._drawn_mask, self.start_number
+        return [start + i for i in range(mask.bit_length()) if mask >> i & 1]
+
+    def get_drawn_count(self) -> int:
+        """Số lượng số khác nhau đã quay"""
+        if self._drawn_set is not None:
+            return len(self._drawn_set)
+        return self._drawn_mask.bit_count()
+
+    def completed_ticket_rows(self, numbers: list[int]) -> list[tuple[str, int]]:
+        """
+        Các hàng (mã vé, chỉ số hàng) của vé đã có người giữ vừa đủ số nhờ
+        `numbers` (các số vừa quay), theo thứ tự xuất hiện, không trùng.
+        """
+        rows: list[tuple[str, int]] = []
+        for number in numbers:
+            for key in self.row_tracker.completed_by(number):
+                if key[0] in self.tickets and key not in rows:
+                    rows.append(key)
+        return rows
+
+    def match(self, numbers: list[int]) -> tuple[list[int], list[int]]:
+        """
+        Tách `numbers` thành (đã quay, chưa quay), giữ nguyên thứ tự nhập.
+        Số ngoài khoảng được tính là chưa quay.
+        """
+        drawn, not_drawn = [], []
+        for number in numbers:
+            (drawn if self.is_drawn(number) else not_drawn).append(number)
+        return drawn, not_drawn
+
     def get_total_numbers(self) -> int:
         """Trả về tổng số số ban đầu"""
         return self.end_number - self.start_number + 1
     
     def get_remaining_count(self) -> int:
         """Trả về số lượng số còn lại"""
-        return len(self.available_numbers)
+        return len(self.pool)
     
     def get_removed_count(self) -> int:
         """Trả về số lượng số đã loại bỏ"""
@@ -91,22 +243,47 @@ class WheelSession:
     
     def is_empty(self) -> bool:
         """Kiểm tra danh sách số còn lại có rỗng không"""
-        return len(self.available_numbers) == 0
+        return len(self.pool) == 0
     
-    def to_dict(self) -> dict:
-        """Chuyển đổi session thành dictionary"""
-        return {
+    def enable_shuffled_draw(self, seed: Optional[int] = None) -> int:
+        """
+        Sinh trước toàn bộ thứ tự rút bằng Fisher-Yates với `seed` (ngẫu nhiên
+        nếu None); mỗi lượt quay sau đó chỉ tiến con trỏ. Chỉ dùng khi loại số
+        sau khi quay và chưa rút số nào. Trả về seed đã dùng.
+        """
+        if not self.remove_after_spin:
+            raise ValueError("Chế độ xáo trước chỉ dùng khi loại số sau khi quay")
+        if self.get_remaining_count() != self.get_total_numbers():
+            raise ValueError("Đã có số được rút, hãy reset trước khi xáo")
+        seed = new_seed() if seed is None else seed
+        self.pool.shuffle(seed)
+        return seed
+
+    @property
+    def draw_seed(self) -> Optional[int]:
+        """Seed của thứ tự rút xáo trước (None nếu rút ngẫu nhiên từng lượt)"""
+        return self.pool.seed
+
+    def to_dict(self, include_history: bool = True) -> dict:
+        """
+        Chuyển đổi session thành dictionary.
+
+        include_history=False bỏ khoá 'history' (dựng lại toàn bộ lịch sử dạng
+        dict mỗi lần); đường ghi DB lấy lượt mới thẳng từ `spin_history`.
+        """
+        data = {
             'id': self.id,
             'start_number': self.start_number,
             'end_number': self.end_number,
             'remove_after_spin': self.remove_after_spin,
-            'available_numbers': self.available_numbers,
+            'available_numbers': None,  # Điền ở dưới (khoảng lớn có thể bỏ qua)
             'removed_numbers': self.removed_numbers,
+            'drawn_numbers': self.drawn_sorted(),
             'last_spin': self.last_spin,
             'spin_count': self.spin_count,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
-            'history': self.history,
+            'spin_seq': self.spin_seq,
             'game_name': self.game_name,
             'owner_id': self.owner_id,
             'round_name': self.round_name,
@@ -118,6 +295,24 @@ class WheelSession:
             'waiting_numbers': {str(k): v for k, v in self.waiting_numbers.items()},
             'last_control_message_id': self.last_control_message_id,
         }
+        if include_history:
+            data['history'] = self.history
+        if self.segments is not None:
+            data['segments'] = [{'label': label, 'weight': weight} for label, weight in self.segments]
+        if self.pool.seed is not None:
+            # Chế độ xáo trước: (seed, cursor) thay cho danh sách số còn lại/đã loại
+            del data['available_numbers'], data['removed_numbers']
+            data['draw_seed'] = self.pool.seed
+            data['draw_cursor'] = self.pool.cursor
+            if self.get_drawn_count() == self.pool.cursor:
+                del data['drawn_numbers']
+        elif self.is_sparse and set(self.pool.removed()) == set(self.removed_numbers):
+            # Khoảng lớn: số còn lại = cả khoảng trừ removed_numbers, không
+            # lưu danh sách theo độ rộng khoảng
+            del data['available_numbers']
+        else:
+            data['available_numbers'] = self.available_numbers
+        return data
     
     @classmethod
     def from_dict(cls, data: dict) -> 'WheelSession':
@@ -130,14 +325,34 @@ class WheelSession:
             game_name=data.get('game_name'),
             owner_id=data.get('owner_id'),
             round_name=data.get('round_name'),
+            segments=[(s['label'], s['weight']) for s in data['segments']] if data.get('segments') else None,
         )
-        session.available_numbers = data.get('available_numbers', session.available_numbers)
-        session.removed_numbers = data.get('removed_numbers', [])
+        if data.get('draw_seed') is not None:
+            session.pool.shuffle(data['draw_seed'], data.get('draw_cursor', 0))
+            session.removed_numbers = session.pool.drawn_order()
+        else:
+            session.removed_numbers = data.get('removed_numbers', [])
+            if 'available_numbers' in data:
+                session.available_numbers = data['available_numbers']
+            elif session.is_sparse:
+                session.pool.load_removed(session.removed_numbers)
         session.last_spin = data.get('last_spin')
         session.spin_count = data.get('spin_count', 0)
         session.created_at = datetime.fromisoformat(data.get('created_at', datetime.now().isoformat()))
         session.updated_at = datetime.fromisoformat(data.get('updated_at', datetime.now().isoformat()))
-        session.history = data.get('history', [])
+        history = data.get('history', [])
+        session.history = history
+        session.spin_seq = data.get('spin_seq', len(history))
+        # Không lưu drawn_numbers: dựng lại từ thứ tự xáo trước, hoặc từ lịch
+        # sử quay với dữ liệu của bản cũ
+        drawn = data.get('drawn_numbers')
+        if drawn is None and session.pool.seed is not None:
+            drawn = session.removed_numbers
+        elif drawn is None:
+            drawn = session.spin_history.numbers()
+        for number in drawn:
+            if isinstance(number, int):
+                session.mark_drawn(number)
         session.participants = data.get('participants', [])
         session.started = data.get('started', False)
         session.winners = data.get('winners', [])
@@ -158,6 +373,28 @@ class WheelSession:
                 
         return session
 
+    def to_bytes(self) -> bytes:
+        """
+        Mã hoá session ở dạng nhị phân gọn (xem `session_codec`).
+        Nếu dữ liệu không mã hoá được thì trả về JSON (UTF-8).
+        """
+        from .session_codec import CodecError, encode_session
+
+        data = self.to_dict()
+        try:
+            return encode_session(data)
+        except CodecError:
+            return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> 'WheelSession':
+        """Tạo WheelSession từ kết quả của to_bytes() (nhị phân hoặc JSON cũ)."""
+        from .session_codec import decode_session, is_encoded
+
+        if is_encoded(raw):
+            return cls.from_dict(decode_session(raw))
+        return cls.from_dict(json.loads(raw))
+
     # Quản lý người tham gia
     def add_participant(self, user_id: int, name: str) -> bool:
         """Thêm người chơi vào danh sách tham gia. Trả về True nếu thêm mới, False nếu đã tồn tại."""
@@ -168,6 +405,7 @@ class WheelSession:
                 return False
         self.participants.append({"user_id": user_id, "name": name})
         self.updated_at = datetime.now()
+        self._members_changed()
         return True
 
     def remove_participant(self, user_id: int) -> bool:
@@ -176,6 +414,7 @@ class WheelSession:
         self.participants = [p for p in self.participants if p.get("user_id") != user_id]
         if len(self.participants) != before:
             self.updated_at = datetime.now()
+            self._members_changed()
             return True
         return False
 
@@ -183,11 +422,9 @@ class WheelSession:
         """Trả về danh sách người tham gia hiện tại."""
         return list(self.participants)
 
-    def get_recent_history(self, limit: int = 10) -> list[dict]:
+    def get_recent_history(self, limit: int = 10) -> list[SpinRecord]:
         """Trả về lịch sử quay gần đây (mặc định 10 lần gần nhất)"""
-        if limit <= 0:
-            return []
-        return self.history[-limit:]
+        return self.spin_history.recent(limit)
     
     def __repr__(self) -> str:
         return (
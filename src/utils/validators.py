@@ -4,13 +4,14 @@ Validation functions cho wheel bot
 from typing import Tuple, Optional
 
 
-def validate_range(start: int, end: int) -> Tuple[bool, Optional[str]]:
+def validate_range(start: int, end: int, max_numbers: int = 90) -> Tuple[bool, Optional[str]]:
     """
     Validate khoảng số từ start đến end
     
     Args:
         start: Số bắt đầu
         end: Số kết thúc
+        max_numbers: Số lượng số tối đa (mặc định 90 cho loto)
     
     Returns:
         Tuple (is_valid, error_message)
@@ -24,7 +25,6 @@ def validate_range(start: int, end: int) -> Tuple[bool, Optional[str]]:
     if start >= end:
         return False, "Số bắt đầu phải nhỏ hơn số kết thúc"
     
-    max_numbers = 90
     if (end - start + 1) > max_numbers:
         return False, f"Khoảng số quá lớn. Tối đa {max_numbers} số"
     
@@ -48,3 +48,41 @@ def validate_number(value: any) -> Tuple[bool, Optional[int], Optional[str]]:
         return True, number, None
     except (ValueError, TypeError):
         return False, None, f"'{value}' không phải là số hợp lệ"
+
+
+def parse_segments(text: str, max_segments: int = 1000) -> Tuple[bool, Optional[list], Optional[str]]:
+    """
+    Phân tích danh sách ô của vòng quay giải thưởng
+
+    Args:
+        text: Các ô cách nhau bởi dấu phẩy, mỗi ô dạng `nhãn:trọng_số`
+            (bỏ trọng số = 1), vd "Jackpot:1, Voucher 50k:5, Chúc may mắn:30"
+        max_segments: Số ô tối đa
+
+    Returns:
+        Tuple (is_valid, [(nhãn, trọng số), ...], error_message)
+    """
+    segments = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        label, sep, weight_text = item.rpartition(":")
+        if not sep:
+            label, weight_text = item, "1"
+        label = label.strip()
+        if not label:
+            return False, None, f"Ô '{item}' thiếu nhãn"
+        try:
+            weight = float(weight_text)
+        except ValueError:
+            return False, None, f"'{weight_text.strip()}' không phải trọng số hợp lệ"
+        if not weight > 0 or weight == float("inf"):
+            return False, None, f"Trọng số của '{label}' phải là số dương"
+        segments.append((label, weight))
+
+    if not segments:
+        return False, None, "Cần ít nhất một ô"
+    if len(segments) > max_segments:
+        return False, None, f"Quá nhiều ô. Tối đa {max_segments} ô"
+    return True, segments, None
@@ -0,0 +1,127 @@
+"""
+Unit tests cho lịch tự động quay (AutoSpinScheduler)
+"""
+import unittest
+
+from src.bot.auto_spin import AutoSpinScheduler
+from src.bot.constants import AUTO_SPIN_MIN_SECONDS
+from src.db.backends import MemoryBackend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAutoSpinScheduler(unittest.IsolatedAsyncioTestCase):
+    """Test heap dùng chung, huỷ lười và khôi phục sau restart"""
+
+    def setUp(self):
+        self.backend = MemoryBackend()
+        self.clock = FakeClock()
+        self.scheduler = AutoSpinScheduler(backend=self.backend, clock=self.clock)
+
+    def test_due_order_and_reschedule(self):
+        """Test chat đến hạn theo thứ tự thời gian, chỉ quay lại heap khi reschedule"""
+        self.scheduler.start(1, 10, game_id="g1")
+        self.scheduler.start(2, 6, game_id="g2")
+        self.assertEqual(self.scheduler.pop_due(), [])
+        self.assertEqual(self.scheduler.next_due_in(), 6.0)
+
+        self.clock.now = 10
+        self.assertEqual(self.scheduler.pop_due(), [2, 1])
+        self.assertEqual(self.scheduler.pop_due(), [])
+
+        self.scheduler.reschedule(1)
+        self.scheduler.reschedule(2, delay=0.5)
+        self.clock.now = 10.5
+        self.assertEqual(self.scheduler.pop_due(), [2])
+        self.clock.now = 20
+        self.assertEqual(self.scheduler.pop_due(), [1])
+
+    def test_limit_per_tick(self):
+        """Test mỗi nhịp lấy tối đa `limit` chat, phần còn lại sang nhịp sau"""
+        for chat_id in range(5):
+            self.scheduler.start(chat_id, AUTO_SPIN_MIN_SECONDS)
+        self.clock.now = 100
+        self.assertEqual(self.scheduler.pop_due(limit=3), [0, 1, 2])
+        self.assertEqual(self.scheduler.pop_due(limit=3), [3, 4])
+
+    def test_stop_and_restart_invalidate_old_entries(self):
+        """Test tắt hoặc đổi chu kỳ làm mục cũ trong heap hết hiệu lực"""
+        self.scheduler.start(1, 10)
+        self.scheduler.start(1, 30)
+        self.scheduler.start(2, 10)
+        self.assertTrue(self.scheduler.stop(2))
+        self.assertFalse(self.scheduler.stop(2))
+
+        self.clock.now = 10
+        self.assertEqual(self.scheduler.pop_due(), [])
+        self.clock.now = 30
+        self.assertEqual(self.scheduler.pop_due(), [1])
+
+        with self.assertRaises(ValueError):
+            self.scheduler.start(3, AUTO_SPIN_MIN_SECONDS - 1)
+        self.assertNotIn(3, self.scheduler)
+
+    async def test_restore_from_backend(self):
+        """Test lịch đã lưu được nạp lại bởi scheduler mới (restart)"""
+        self.scheduler.start(1, 8, game_id="g1", started_by=7)
+        self.scheduler.start(2, 8)
+        await self.scheduler.flush_writes()
+        self.scheduler.stop(2)
+        self.assertEqual(await self.scheduler.flush_writes(), 1)
+
+        restarted = AutoSpinScheduler(backend=self.backend, clock=self.clock)
+        self.assertEqual(restarted.restore(), 1)
+        self.assertEqual(restarted.get(1)["game_id"], "g1")
+        self.assertEqual(restarted.get(1)["started_by"], 7)
+        self.clock.now = 8
+        self.assertEqual(restarted.pop_due(), [1])
+
+    async def test_writes_are_deferred_and_retried(self):
+        """Test bật/tắt chỉ ghi xuống backend khi flush; ghi lỗi thì giữ lại, không đè thay đổi mới hơn"""
+        class FailingBackend(MemoryBackend):
+            fail = False
+
+            def save_auto_spin(self, chat_id, schedule):
+                if self.fail:
+                    raise OSError("disk full")
+                super().save_auto_spin(chat_id, schedule)
+
+        backend = FailingBackend()
+        scheduler = AutoSpinScheduler(backend=backend, clock=self.clock)
+        scheduler.start(1, 8)
+        scheduler.start(2, 8)
+        self.assertEqual(backend.load_all_auto_spins(), {})
+
+        backend.fail = True
+        with self.assertRaises(OSError):
+            await scheduler.flush_writes()
+        self.assertEqual(scheduler.pending_writes(), 2)
+        scheduler.stop(2)
+
+        backend.fail = False
+        self.assertEqual(await scheduler.flush_writes(), 2)
+        self.assertEqual(list(backend.load_all_auto_spins()), [1])
+        self.assertEqual(scheduler.pending_writes(), 0)
+
+    def test_stop_drops_unannounced(self):
+        """Test tắt lịch bỏ luôn số chưa gửi được thông báo; chat không bật lịch không giữ gì"""
+        self.scheduler.start(1, 8, game_id="g1")
+        self.scheduler.set_unannounced(1, "g1", 3, [42])
+        self.scheduler.set_unannounced(2, "g2", 1, [7])
+        self.assertIsNone(self.scheduler.pop_unannounced(2))
+
+        self.scheduler.stop(1)
+        self.assertIsNone(self.scheduler.pop_unannounced(1))
+        self.scheduler.start(1, 8, game_id="g1")
+        self.scheduler.set_unannounced(1, "g1", 3, [42])
+        self.assertEqual(self.scheduler.pop_unannounced(1), ("g1", 3, [42]))
+
+
+if __name__ == '__main__':
+    unittest.main()
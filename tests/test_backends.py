@@ -0,0 +1,109 @@
+"""
+Test các backend lưu trữ: cùng một kịch bản phải cho cùng kết quả
+trên MemoryBackend, SQLiteBackend và ShardedSQLiteBackend.
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.bot.session_manager import SessionManager
+from src.bot.wheel import spin_wheel
+from src.db.backends import MemoryBackend, SQLiteBackend, ShardedSQLiteBackend
+
+
+class BackendContract:
+    """Kịch bản dùng chung; lớp con tạo backend trong make_backend()"""
+
+    def make_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self._tmp.name)
+        self.backend = self.make_backend()
+        self.backend.init()
+
+    def tearDown(self):
+        self.backend.close()
+        self._tmp.cleanup()
+
+    def test_session_round_trip_via_manager(self):
+        """Test SessionManager ghi/đọc session qua backend được inject"""
+        manager = SessionManager(backend=self.backend)
+        session = manager.create_session(-100, 1, 90)
+        session.add_participant(1, "A")
+        session.user_tickets = {1: "tim1"}
+        session.tickets = {"tim1": 1}
+        for _ in range(3):
+            spin_wheel(session)
+        manager.persist_session(-100)
+
+        reloaded = SessionManager(backend=self.backend).get_session(-100)
+        self.assertIsNotNone(reloaded)
+        self.assertEqual(reloaded.history, session.history)
+        self.assertEqual(reloaded.user_tickets, {1: "tim1"})
+        self.assertEqual(self.backend.count_spins(-100, session.id), 3)
+        self.assertEqual(self.backend.load_all_sessions(), {-100: self.backend.load_session(-100)})
+
+        manager.delete_session(-100)
+        self.assertIsNone(self.backend.load_session(-100))
+
+    def test_stats_results_and_rounds(self):
+        """Test stats, kết quả gần nhất và vòng chơi"""
+        self.backend.apply_stat_deltas(1, {"wins": {7: 5.0}}, {7: "A"})
+        self.backend.apply_stat_deltas(1, {"wins": {7: -2.5}, "participations": {7: 1.0}})
+        self.assertEqual(self.backend.load_stats(1)["wins"][7], {"count": 2.5, "name": "A"})
+        self.backend.reset_stats(1, "wins")
+        self.assertEqual(self.backend.load_stats(1)["wins"], {})
+
+        self.backend.save_last_result(1, {"game_name": "G"})
+        self.assertEqual(self.backend.load_last_result(1), {"game_name": "G"})
+        self.assertEqual(self.backend.load_all_last_results(), {1: {"game_name": "G"}})
+        self.backend.apply_stat_deltas(2, {"participations": {8: 1.0}})
+        self.assertEqual(
+            self.backend.load_all_stats([1, 2, 5]),
+            {1: self.backend.load_stats(1), 2: self.backend.load_stats(2), 5: {"wins": {}, "participations": {}}},
+        )
+
+        for chat_id in (1, 2, 3, -1001):
+            self.backend.save_active_round(chat_id, {"round_id": f"r{chat_id}"})
+        self.backend.delete_active_round_row(3)
+        self.assertEqual(set(self.backend.load_all_active_rounds()), {1, 2, -1001})
+
+        for chat_id in (1, 2, -1001):
+            self.backend.save_auto_spin(chat_id, {"interval": 8.0, "started_by": 7})
+        self.backend.save_auto_spin(2, {"interval": 15.0, "started_by": 7})
+        self.backend.delete_auto_spin(1)
+        schedules = self.backend.load_all_auto_spins()
+        self.assertEqual(set(schedules), {2, -1001})
+        self.assertEqual(schedules[2]["interval"], 15.0)
+
+        self.backend.save_game_record(1, "r1", {"game_name": "G"}, {7: {"name": "A", "token": 5.0}})
+        self.assertEqual(len(self.backend.load_round_games(1, "r1")), 1)
+        self.assertEqual(self.backend.load_round_ledger(1, "r1")[7]["token"], 5.0)
+
+
+class TestMemoryBackend(BackendContract, unittest.TestCase):
+    def make_backend(self):
+        return MemoryBackend()
+
+
+class TestSQLiteBackend(BackendContract, unittest.TestCase):
+    def make_backend(self):
+        return SQLiteBackend.from_path(self.tmp_path / "test.db")
+
+
+class TestShardedSQLiteBackend(BackendContract, unittest.TestCase):
+    def make_backend(self):
+        return ShardedSQLiteBackend(self.tmp_path / "test.db", 4)
+
+    def test_chats_spread_across_files(self):
+        """Test mỗi chat luôn nằm ở cùng một shard và các shard đều được dùng"""
+        indexes = {self.backend.shard_index(chat_id) for chat_id in range(-1000, 0)}
+        self.assertEqual(indexes, {0, 1, 2, 3})
+        self.assertEqual(self.backend.shard_index(-1001234), self.backend.shard_index(-1001234))
+        self.assertTrue(all(path.exists() for path in self.backend.paths))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Unit tests cho xử lý tuần tự theo chat (ChatSerializer)
+"""
+import asyncio
+import unittest
+
+from src.bot.chat_serializer import ChatSerializer, resolve_lock_chat
+
+GROUP_ID = -1001234
+PRIVATE_ID = 555
+
+
+class TestChatSerializer(unittest.IsolatedAsyncioTestCase):
+    """Test thứ tự trong một chat, song song giữa các chat và bộ đếm"""
+
+    async def test_same_chat_runs_in_order(self):
+        """Test các việc cùng chat chạy lần lượt, đúng thứ tự đến, không chồng nhau"""
+        serializer = ChatSerializer()
+        events = []
+
+        async def handle(n: int):
+            async with serializer.hold(1):
+                events.append(("start", n))
+                await asyncio.sleep(0.01 if n == 0 else 0)
+                events.append(("end", n))
+
+        await asyncio.gather(*(handle(n) for n in range(4)))
+
+        self.assertEqual(events, [(kind, n) for n in range(4) for kind in ("start", "end")])
+        stats = serializer.get_chat_stats(1)
+        self.assertEqual((stats["handled"], stats["max_depth"], stats["depth"]), (4, 4, 0))
+        self.assertGreater(stats["max_wait_ms"], 0)
+        self.assertFalse(serializer.is_busy(1))
+
+    async def test_other_chats_not_blocked(self):
+        """Test chat chậm không chặn chat khác; lỗi trong khối vẫn trả lock"""
+        serializer = ChatSerializer()
+        slow_started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow():
+            async with serializer.hold(1):
+                slow_started.set()
+                await release.wait()
+
+        task = asyncio.create_task(slow())
+        await slow_started.wait()
+        self.assertEqual(serializer.depth(1), 1)
+
+        async with serializer.hold(2):
+            self.assertTrue(serializer.is_busy(1))
+        with self.assertRaises(RuntimeError):
+            async with serializer.hold(2):
+                raise RuntimeError("lỗi handler")
+        self.assertFalse(serializer.is_busy(2))
+
+        release.set()
+        await task
+        stats = serializer.get_stats()
+        self.assertEqual((stats["chats"], stats["busy_chats"], stats["handled"]), (2, 0, 3))
+
+    async def test_remote_control_locks_target_group(self):
+        """Test nút điều khiển từ xa trong chat riêng chờ lệnh của nhóm đích, không chạy chồng"""
+        serializer = ChatSerializer()
+        events = []
+
+        async def handle(name: str, lock_chat: int):
+            async with serializer.hold(lock_chat):
+                events.append(("start", name))
+                await asyncio.sleep(0)
+                await asyncio.sleep(0)
+                events.append(("end", name))
+
+        remote = resolve_lock_chat(PRIVATE_ID, callback_data=f"cmd:quay:{GROUP_ID}")
+        group = resolve_lock_chat(GROUP_ID)
+        await asyncio.gather(handle("quay_tu_xa", remote), handle("kinh", group))
+
+        self.assertEqual(remote, GROUP_ID)
+        self.assertEqual(events, [
+            ("start", "quay_tu_xa"), ("end", "quay_tu_xa"), ("start", "kinh"), ("end", "kinh"),
+        ])
+        self.assertEqual(serializer.get_chat_stats(GROUP_ID)["max_depth"], 2)
+        self.assertIsNone(serializer.get_chat_stats(PRIVATE_ID))
+
+    async def test_idle_chats_are_bounded(self):
+        """Test số chat giữ bộ đếm có giới hạn: bỏ chat rảnh lâu nhất, không bỏ chat đang chạy"""
+        serializer = ChatSerializer(max_chats=3)
+        release = asyncio.Event()
+        started = asyncio.Event()
+
+        async def busy():
+            async with serializer.hold(0):
+                started.set()
+                await release.wait()
+
+        task = asyncio.create_task(busy())
+        await started.wait()
+        for chat_id in range(1, 6):
+            async with serializer.hold(chat_id):
+                pass
+        async with serializer.hold(4):
+            pass
+
+        self.assertEqual(len(serializer), 3)
+        self.assertTrue(serializer.is_busy(0))
+        self.assertIsNone(serializer.get_chat_stats(3))
+        self.assertEqual(serializer.get_chat_stats(4)["handled"], 2)
+        self.assertEqual(serializer.get_stats()["evicted"], 3)
+
+        release.set()
+        await task
+        self.assertEqual(len(serializer), 3)
+
+    def test_resolve_lock_chat(self):
+        """Test chọn chat giữ lock: nút bấm, reply nhập tên game, update thường"""
+        self.assertEqual(resolve_lock_chat(GROUP_ID, callback_data="cmd:quay"), GROUP_ID)
+        self.assertEqual(resolve_lock_chat(GROUP_ID, callback_data="lay_ve:do1"), GROUP_ID)
+        self.assertEqual(resolve_lock_chat(PRIVATE_ID, callback_data="cmd:quay:abc"), PRIVATE_ID)
+        pending = {"pending_action": "moi", "target_chat_id": GROUP_ID}
+        self.assertEqual(resolve_lock_chat(PRIVATE_ID, user_data=pending, reply_text=""), GROUP_ID)
+        self.assertEqual(
+            resolve_lock_chat(PRIVATE_ID, reply_text=f"🕹️ Game mới cho nhóm {GROUP_ID}"), GROUP_ID
+        )
+        # Không phải reply: target_chat_id đang chờ không áp dụng
+        self.assertEqual(resolve_lock_chat(PRIVATE_ID, user_data=pending), PRIVATE_ID)
+        self.assertIsNone(resolve_lock_chat(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Unit tests cho migration schema SQLite
+"""
+import json
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.db import migrations, sqlite_store
+from src.bot.wheel import create_wheel_session, spin_wheel
+
+
+def _step(report, version):
+    return next(step for step in report["steps"] if step["version"] == version)
+
+
+class TestMigrations(unittest.TestCase):
+    """Test runner migration trên DB mới và DB tạo trước khi có migration"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self._tmpdir.name) / "loto.db"
+
+    def tearDown(self):
+        self.manager.close_all()
+        self._tmpdir.cleanup()
+
+    def _columns(self, table):
+        return {row["name"] for row in self.manager.cursor().execute(f"PRAGMA table_info({table})")}
+
+    def test_fresh_db_reaches_latest(self):
+        """Test DB mới lên phiên bản mới nhất, chạy lại không còn bước nào"""
+        self.manager = sqlite_store.ConnectionManager(self.db_path)
+        report = migrations.run_migrations(manager=self.manager)
+
+        self.assertEqual(report["from_version"], 0)
+        self.assertEqual([s["version"] for s in report["steps"]], [m.version for m in migrations.MIGRATIONS])
+        self.assertEqual(migrations.get_schema_version(manager=self.manager), migrations.LATEST_VERSION)
+        self.assertIn("history_base", self._columns("sessions"))
+        self.assertEqual(migrations.run_migrations(manager=self.manager)["steps"], [])
+
+    def test_upgrade_with_backfill_and_dry_run(self):
+        """Test DB cũ: dry-run không đổi gì, chạy thật thì backfill theo lô"""
+        session = create_wheel_session(1, 10)
+        for _ in range(3):
+            spin_wheel(session)
+        parts = sqlite_store.split_session_dict(session.to_dict())
+
+        # DB do bản cũ tạo: chỉ có bảng gốc, chưa có schema_version
+        conn = sqlite3.connect(self.db_path)
+        for statement in migrations._BASELINE:
+            conn.execute(statement)
+        conn.execute(
+            "INSERT INTO sessions(chat_id, session_json, updated_at) VALUES (?, ?, ?)",
+            (1, sqlite_store.encode_meta(parts["meta"]), "2026-01-01T00:00:00"),
+        )
+        conn.executemany(
+            "INSERT INTO spins(chat_id, game_id, seq, number, ts) VALUES (?, ?, ?, ?, ?)",
+            [(1, session.id, *row) for row in parts["spins"]],
+        )
+        conn.execute(
+            "INSERT INTO sessions(chat_id, session_json, updated_at) VALUES (?, ?, ?)",
+            (2, json.dumps(create_wheel_session(1, 10).to_dict()), "2026-01-01T00:00:00"),
+        )
+        conn.commit()
+        conn.close()
+
+        self.manager = sqlite_store.ConnectionManager(self.db_path)
+        plan = migrations.run_migrations(manager=self.manager, dry_run=True)
+        self.assertEqual(plan["to_version"], migrations.LATEST_VERSION)
+        self.assertEqual(_step(plan, 3)["backfill_rows"], 2)
+        self.assertEqual(migrations.get_schema_version(manager=self.manager), 0)
+        self.assertNotIn("history_base", self._columns("sessions"))
+
+        report = migrations.run_migrations(manager=self.manager, batch_size=1)
+        self.assertEqual(_step(report, 3)["backfill_rows"], 2)
+        row = self.manager.cursor().execute("SELECT game_id, history_base FROM sessions WHERE chat_id = 1").fetchone()
+        self.assertEqual((row["game_id"], row["history_base"]), (session.id, 0))
+
+        loaded = sqlite_store.load_all_sessions(manager=self.manager)
+        self.assertEqual(loaded[1]["history"], session.history)
+        self.assertEqual(set(loaded), {1, 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Unit tests cho cache session (LRU + TTL, ghi xuống DB khi bỏ khỏi RAM)
+"""
+import unittest
+
+from src.bot.session_cache import SessionCache
+from src.bot.session_manager import SessionManager
+from src.bot.wheel import create_wheel_session, spin_wheel
+from src.db import sqlite_store
+from tests.test_session_manager import SessionManagerTestCase
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestSessionCache(unittest.TestCase):
+    """Test LRU, TTL và bộ đếm của SessionCache"""
+
+    def test_lru_and_counters(self):
+        """Test vượt max_size thì bỏ chat ít dùng nhất, đếm hit/miss/eviction"""
+        evicted = []
+        cache = SessionCache(max_size=2, on_evict=lambda chat_id, _: evicted.append(chat_id) or True)
+        for chat_id in (1, 2):
+            cache.put(chat_id, create_wheel_session(1, 10))
+        cache.get(1)  # 2 thành chat ít dùng nhất
+        cache.put(3, create_wheel_session(1, 10))
+
+        self.assertEqual(evicted, [2])
+        self.assertEqual(sorted(cache), [1, 3])
+        self.assertIsNone(cache.get(2))
+        stats = cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (1, 1, 1))
+        self.assertGreater(stats["memory_bytes"], 0)
+
+    def test_ttl_and_refusal(self):
+        """Test chat rảnh quá ttl bị bỏ; on_evict trả về False thì giữ lại"""
+        clock = FakeClock()
+        keep = {2}
+        cache = SessionCache(ttl=60, on_evict=lambda chat_id, _: chat_id not in keep, clock=clock)
+        for chat_id in (1, 2, 3):
+            cache.put(chat_id, create_wheel_session(1, 10))
+            clock.now += 10
+        clock.now = 75  # chat 1, 2 rảnh quá 60 giây, chat 3 chưa
+
+        self.assertEqual(cache.expire(), 1)
+        self.assertEqual(sorted(cache), [2, 3])
+        self.assertEqual(cache.get_stats()["refused"], 1)
+
+
+class TestSessionManagerCache(SessionManagerTestCase):
+    """Test SessionManager với cache có giới hạn"""
+
+    async def test_dirty_session_written_before_eviction(self):
+        """Test session còn thay đổi chưa ghi được lưu trước khi bỏ, rồi tự tải lại"""
+        manager = SessionManager(flush_interval=60, cache_size=2, cache_ttl=0)
+        await manager.start_writer()
+        session = manager.create_session(1, 1, 90)
+        spins = [spin_wheel(session) for _ in range(3)]
+        manager.persist_session(1)
+        self.assertIsNone(sqlite_store.load_session(1))
+
+        manager.create_session(2, 1, 90)
+        manager.create_session(3, 1, 90)  # chat 1 bị bỏ khỏi RAM
+
+        self.assertEqual(sqlite_store.load_session(1)["spin_count"], 3)
+        stats = manager.get_cache_stats()
+        self.assertEqual((stats["size"], stats["evictions"], stats["write_backs"]), (2, 1, 1))
+
+        reloaded = manager.get_session(1)
+        self.assertIsNot(reloaded, session)
+        self.assertEqual(reloaded.removed_numbers, spins)
+        await manager.stop_writer()
+
+
+    async def test_negative_cache_skips_db(self):
+        """Test chat không có session chỉ tra DB một lần; create_session xoá mục âm, preload không"""
+        manager = SessionManager(flush_interval=60)
+        sqlite_store.get_manager().reset_metrics()
+        for _ in range(5):
+            self.assertFalse(manager.has_session(1))
+            self.assertIsNone(manager.get_session(2))
+        calls = sqlite_store.get_db_metrics()["calls"]["load_session"]["calls"]
+        self.assertEqual(calls, 2)
+        self.assertEqual(manager.get_cache_stats()["negative_hits"], 8)
+
+        manager.create_session(1, 1, 90)
+        self.assertTrue(manager.has_session(1))
+        # Bản warm start có thể đã lỗi thời: chat đã biết là không có session được giữ nguyên
+        manager.preload({2: create_wheel_session(1, 10).to_dict()})
+        self.assertIsNone(manager.get_session(2))
+
+        manager.delete_session(1)
+        self.assertIsNone(manager.get_session(1))
+        self.assertEqual(manager.get_cache_stats()["negative_size"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Unit tests cho mã hoá nhị phân của session
+"""
+import json
+import unittest
+from datetime import datetime, timezone
+
+from src.bot.wheel import create_wheel_session, spin_wheel
+from src.models.session_codec import CODEC_VERSION, CodecError, decode_session, encode_session
+from src.models.wheel_session import WheelSession
+
+
+def make_session() -> WheelSession:
+    session = create_wheel_session(1, 90)
+    session.game_name = "Ván 1"
+    session.owner_id = 123456789
+    for i in range(8):
+        session.add_participant(1000 + i, f"Người chơi {i}")
+    session.tickets = {f"cam{i}": 1000 + i for i in range(8)}
+    session.user_tickets = {1000 + i: f"cam{i}" for i in range(8)}
+    session.waiting_numbers = {5: [(1001, "Người chơi 1")], 7: [(1002, "Người chơi 2")]}
+    session.winners = [{"user_id": 1001, "name": "Người chơi 1", "numbers": [1, 2, 3, 4, 5], "time": "2026-01-01T10:00:00"}]
+    for _ in range(30):
+        spin_wheel(session)
+    return session
+
+
+class TestSessionCodec(unittest.TestCase):
+    """Test encode/decode session"""
+
+    def test_round_trip(self):
+        """Test giải mã ra đúng session ban đầu và nhỏ hơn JSON"""
+        session = make_session()
+        raw = session.to_bytes()
+        restored = WheelSession.from_bytes(raw)
+
+        self.assertEqual(restored.to_dict(), session.to_dict())
+        self.assertLess(len(raw), len(json.dumps(session.to_dict(), ensure_ascii=False).encode()) / 3)
+
+    def test_extra_keys_kept(self):
+        """Test các khoá ngoài định dạng được giữ nguyên"""
+        data = create_wheel_session(1, 10).to_dict()
+        data["history_base"] = 3
+        self.assertEqual(decode_session(encode_session(data))["history_base"], 3)
+
+    def test_unknown_version_rejected(self):
+        """Test dữ liệu khác CODEC_VERSION không được đọc nhầm"""
+        raw = bytearray(encode_session(create_wheel_session(1, 10).to_dict()))
+        self.assertEqual(raw[2], CODEC_VERSION)
+        raw[2] = CODEC_VERSION + 1
+        with self.assertRaises(CodecError):
+            decode_session(bytes(raw))
+
+    def test_json_fallback(self):
+        """Test dữ liệu không biểu diễn được thì dùng JSON, và đọc được JSON cũ"""
+        session = create_wheel_session(1, 10)
+        session.created_at = datetime(2026, 1, 1, 10, 0, tzinfo=timezone.utc)  # codec chỉ lưu giờ không múi
+        with self.assertRaises(CodecError):
+            encode_session(session.to_dict())
+
+        raw = session.to_bytes()
+        self.assertEqual(json.loads(raw)["created_at"], "2026-01-01T10:00:00+00:00")
+        self.assertEqual(WheelSession.from_bytes(raw).created_at, session.created_at)
+
+
+if __name__ == '__main__':
+    unittest.main()
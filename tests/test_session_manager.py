@@ -0,0 +1,216 @@
+"""
+Unit tests cho SessionManager (cache RAM + ghi trễ xuống SQLite)
+"""
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.db import sqlite_store
+from src.bot.constants import stats, last_results
+from src.bot.session_manager import SessionManager
+from src.bot.warm_start import apply_warm_data, load_warm_data, warm_start
+from src.db.backends import MemoryBackend
+from src.bot.wheel import spin_wheel
+
+
+class SessionManagerTestCase(unittest.IsolatedAsyncioTestCase):
+    """Base class: mỗi test dùng một file DB tạm riêng"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._original_path = sqlite_store.get_manager().db_path
+        sqlite_store.configure(Path(self._tmpdir.name) / "loto.db")
+        sqlite_store.init_db()
+
+    def tearDown(self):
+        sqlite_store.configure(self._original_path)
+        self._tmpdir.cleanup()
+
+
+class TestWriteBehind(SessionManagerTestCase):
+    """Test hàng đợi ghi trễ"""
+
+    async def test_sync_fallback_without_writer(self):
+        """Test chưa start writer thì persist ghi ngay"""
+        manager = SessionManager()
+        manager.create_session(1, 1, 10)
+        self.assertIsNotNone(sqlite_store.load_session(1))
+
+    async def test_repeated_writes_are_merged(self):
+        """Test nhiều lần persist cùng chat được gộp thành một lần ghi"""
+        manager = SessionManager(flush_interval=60)
+        await manager.start_writer()
+        session = manager.create_session(1, 1, 10)
+        for _ in range(5):
+            spin_wheel(session)
+            manager.persist_session(1)
+
+        self.assertIsNone(sqlite_store.load_session(1))
+        await manager.flush()
+
+        stats = manager.get_writer_stats()
+        self.assertEqual(stats["rows_written"], 1)
+        self.assertEqual(stats["merged"], 5)
+        self.assertEqual(sqlite_store.load_session(1)["spin_count"], 5)
+        await manager.stop_writer()
+
+    async def test_threshold_triggers_flush(self):
+        """Test vượt ngưỡng dirty thì flush sớm"""
+        manager = SessionManager(flush_interval=60, max_dirty=3)
+        await manager.start_writer()
+        for chat_id in range(3):
+            manager.create_session(chat_id, 1, 10)
+        for _ in range(50):
+            if manager.get_writer_stats()["flushes"]:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(manager.get_writer_stats()["rows_written"], 3)
+        await manager.stop_writer()
+
+    async def test_stop_flushes_and_delete_wins(self):
+        """Test dừng writer thì flush hết, xoá sau lưu không bị hồi sinh"""
+        manager = SessionManager(flush_interval=60)
+        await manager.start_writer()
+        manager.create_session(1, 1, 10)
+        manager.create_session(2, 1, 10)
+        manager.delete_session(2)
+        self.assertIsNone(manager.get_session(2))
+
+        await manager.stop_writer()
+        self.assertIsNotNone(sqlite_store.load_session(1))
+        self.assertIsNone(sqlite_store.load_session(2))
+
+
+    async def test_flush_session_raises_on_backend_error(self):
+        """Test barrier của một chat ném lỗi khi backend ghi lỗi; session giữ nguyên và ghi lại được"""
+        class FailingBackend(MemoryBackend):
+            fail = False
+
+            def save_sessions_batch(self, writes):
+                if self.fail:
+                    raise OSError("disk full")
+                super().save_sessions_batch(writes)
+
+        backend = FailingBackend()
+        manager = SessionManager(flush_interval=60, backend=backend)
+        await manager.start_writer()
+        session = manager.create_session(1, 1, 10)
+        await manager.flush_session(1)
+        for _ in range(3):
+            spin_wheel(session)
+
+        backend.fail = True
+        with self.assertRaises(OSError):
+            await manager.flush_session(1)
+        self.assertIs(manager.get_session(1), session)
+        self.assertEqual(backend.count_spins(1, session.id, 0), 0)
+
+        backend.fail = False
+        await manager.flush_session(1)
+        self.assertEqual(backend.count_spins(1, session.id, 0), 3)
+        await manager.stop_writer()
+
+
+class TestUserIndex(SessionManagerTestCase):
+    """Test chỉ mục user -> chat cho inline query"""
+
+    async def test_index_follows_membership(self):
+        """Test chỉ mục theo người chơi, bắt đầu game, xoá và bỏ khỏi cache"""
+        manager = SessionManager(cache_size=2, cache_ttl=0)
+        for chat_id in (1, 2):
+            session = manager.create_session(chat_id, 1, 90)
+            session.owner_id = 100
+            session.add_participant(100, "Host")
+            session.add_participant(200 + chat_id, "P")
+        self.assertEqual(manager.get_sessions_containing_user(100), [])  # chưa bắt đầu
+
+        manager.get_session(1).started = True
+        manager.get_session(2).started = True
+        self.assertEqual([c for c, _ in manager.get_sessions_containing_user(100)], [1, 2])
+        self.assertEqual([c for c, _ in manager.get_sessions_containing_user(202)], [2])
+
+        manager.get_session(2).remove_participant(202)
+        manager.persist_session(2)
+        self.assertEqual(manager.get_sessions_containing_user(202), [])
+        manager.delete_session(1)
+        self.assertEqual([c for c, _ in manager.get_sessions_containing_user(100)], [2])
+
+        manager.create_session(3, 1, 90)
+        manager.create_session(4, 1, 90)  # chat 2 bị bỏ khỏi cache
+        self.assertEqual(manager.get_sessions_containing_user(100), [])
+        self.assertEqual(manager.check_user_index(), [])
+
+        manager.get_session(2)  # tải lại từ DB thì có lại trong chỉ mục
+        self.assertEqual([c for c, _ in manager.get_sessions_containing_user(100)], [2])
+        self.assertEqual(manager.check_user_index(), [])
+
+
+class TestWarmStart(SessionManagerTestCase):
+    """Test nạp sẵn cache khi khởi động"""
+
+    def tearDown(self):
+        for chat_id in (1, 2, 3):
+            stats.pop(chat_id, None)
+            last_results.pop(chat_id, None)
+        super().tearDown()
+
+    async def test_bulk_load_fills_caches(self):
+        """Test warm start nạp session/stats/kết quả mà không tải từng chat"""
+        writer = SessionManager()
+        for chat_id in (1, 2, 3):
+            session = writer.create_session(chat_id, 1, 90)
+            session.add_participant(chat_id * 10, f"P{chat_id}")
+            for _ in range(chat_id):
+                spin_wheel(session)
+            writer.persist_session(chat_id)
+        sqlite_store.apply_stat_deltas(2, {"wins": {20: 5.0}}, {20: "P2"})
+        sqlite_store.save_last_result(3, {"game_name": "G"})
+
+        manager = SessionManager()
+        cached = manager.get_session(1)  # đã có trong cache -> warm start giữ nguyên
+        sqlite_store.get_manager().reset_metrics()
+
+        report = await warm_start(manager)
+
+        self.assertEqual(report["sessions"], 2)
+        self.assertEqual(report["spins"], 6)
+        calls = sqlite_store.get_db_metrics()["calls"]
+        self.assertNotIn("load_session", calls)
+        self.assertEqual(calls["load_all_sessions"]["calls"], 1)
+
+        self.assertIs(manager.get_session(1), cached)
+        self.assertEqual(manager.get_session(3).history, writer.get_session(3).history)
+        self.assertEqual(stats[2]["wins"][20]["count"], 5.0)
+        self.assertEqual(last_results[3], {"game_name": "G"})
+        self.assertNotIn("load_session", sqlite_store.get_db_metrics()["calls"])
+
+    async def test_preload_skips_chats_changed_during_load(self):
+        """Test game kết thúc (hoặc tạo mới) trong lúc warm start đang tải không bị bản cũ ghi đè"""
+        backend = MemoryBackend()
+        manager = SessionManager(backend=backend)
+        await manager.start_writer()
+        for chat_id in (1, 2, 3):
+            manager.create_session(chat_id, 1, 90)
+            manager.persist_session(chat_id)
+        await manager.stop_writer()
+        manager.clear_all()
+
+        manager.begin_preload()
+        data = load_warm_data(backend, max_age_hours=0)
+        await manager.start_writer()
+        manager.get_session(1)
+        manager.delete_session(1)  # /ket_thuc trong lúc đang tải
+        fresh = manager.create_session(2, 1, 10)
+        await manager.stop_writer()
+        self.assertFalse(manager.has_session(1))
+
+        report = apply_warm_data(manager, data)
+        self.assertEqual(report["sessions"], 1)
+        self.assertFalse(manager.has_session(1))
+        self.assertIs(manager.get_session(2), fresh)
+        self.assertTrue(manager.has_session(3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+"""
+Unit tests cho trình mô phỏng simulate.py
+"""
+import unittest
+
+import simulate
+
+
+def _without_timing(report):
+    return {key: value for key, value in report.items() if key != "throughput"}
+
+
+class TestSimulate(unittest.TestCase):
+    """Test tái lập theo seed và dòng token zero-sum"""
+
+    def test_reproducible_and_zero_sum(self):
+        """Test cùng seed cho cùng kết quả, token cả bàn cộng lại bằng 0"""
+        report = simulate.simulate(300, 6, workers=1, seed=3, chunk_size=100)
+        again = simulate.simulate(300, 6, workers=1, seed=3, chunk_size=100)
+        self.assertEqual(_without_timing(report), _without_timing(again))
+
+        self.assertEqual(sum(report["winners_per_game"].values()), 300)
+        self.assertEqual(report["winners_per_game"].get("0", 0), 0)  # 90 số luôn đủ hàng
+        spins = report["spins_to_first_win"]
+        self.assertTrue(5 <= spins["min"] <= spins["p50"] <= spins["max"] <= 90)
+        self.assertAlmostEqual(report["throughput"]["spins"] / 300, spins["mean"], places=1)
+
+        total = simulate.merge([simulate.run_chunk(task) for task in simulate.make_tasks(300, 6, 3, 100, 5.0)])
+        self.assertAlmostEqual(sum(total["code_net"].values()), 0.0, places=6)
+
+    def test_invalid_players(self):
+        with self.assertRaises(ValueError):
+            simulate.simulate(10, 17, workers=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,286 @@
+"""
+Unit tests cho tầng lưu trữ SQLite
+"""
+import json
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.db import sqlite_store
+from src.bot.wheel import create_wheel_session, spin_wheel
+from src.bot.session_manager import session_write
+from src.models.spin_history import SpinHistory
+from src.models.wheel_session import WheelSession
+
+
+class SQLiteStoreTestCase(unittest.TestCase):
+    """Base class: mỗi test dùng một file DB tạm riêng"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._original_path = sqlite_store.get_manager().db_path
+        self.manager = sqlite_store.configure(Path(self._tmpdir.name) / "loto.db")
+        sqlite_store.init_db()
+
+    def tearDown(self):
+        sqlite_store.configure(self._original_path)
+        self._tmpdir.cleanup()
+
+
+class TestConnectionManager(SQLiteStoreTestCase):
+    """Test connection manager dùng chung"""
+
+    def test_pragmas_applied(self):
+        """Test WAL và các PRAGMA được cấu hình khi mở connection"""
+        conn = sqlite_store.get_connection()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0].lower(), "wal")
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+
+    def test_connection_reused(self):
+        """Test nhiều lần gọi chỉ mở một connection"""
+        init_commits = self.manager.commits
+        for chat_id in range(5):
+            sqlite_store.save_session(chat_id, create_wheel_session(1, 10).to_dict())
+            sqlite_store.load_session(chat_id)
+
+        metrics = sqlite_store.get_db_metrics()
+        self.assertEqual(metrics["connections_opened"], 1)
+        self.assertEqual(metrics["calls"]["save_session"]["calls"], 5)
+        self.assertEqual(metrics["calls"]["load_session"]["calls"], 5)
+        # Mỗi lần save_session một commit (init_db commit theo từng bước migration)
+        self.assertEqual(metrics["commits"], init_commits + 5)
+
+    def test_nested_transaction_commits_once(self):
+        """Test transaction lồng nhau chỉ commit ở ngoài cùng"""
+        before = self.manager.commits
+        with self.manager.transaction():
+            sqlite_store.save_session(1, create_wheel_session(1, 10).to_dict())
+            sqlite_store.save_session(2, create_wheel_session(1, 10).to_dict())
+        self.assertEqual(self.manager.commits, before + 1)
+
+    def test_rollback_on_error(self):
+        """Test transaction lỗi thì rollback toàn bộ"""
+        with self.assertRaises(RuntimeError):
+            with self.manager.transaction():
+                sqlite_store.save_session(1, create_wheel_session(1, 10).to_dict())
+                raise RuntimeError("boom")
+        self.assertIsNone(sqlite_store.load_session(1))
+
+    def test_commit_failure_rolls_back(self):
+        """Test COMMIT lỗi thì rollback, connection của thread vẫn dùng tiếp được"""
+        conn = self.manager.connection()
+        # Ràng buộc khoá ngoại hoãn tới lúc COMMIT: cách chắc chắn làm COMMIT lỗi
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("CREATE TABLE parent(id INTEGER PRIMARY KEY)")
+        conn.execute(
+            "CREATE TABLE child(parent_id INTEGER REFERENCES parent(id) DEFERRABLE INITIALLY DEFERRED)"
+        )
+        rollbacks = self.manager.rollbacks
+        with self.assertRaises(sqlite3.IntegrityError):
+            with self.manager.transaction() as cur:
+                sqlite_store.save_session(1, create_wheel_session(1, 10).to_dict())
+                cur.execute("INSERT INTO child(parent_id) VALUES (42)")
+
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(self.manager.rollbacks, rollbacks + 1)
+        self.assertIsNone(sqlite_store.load_session(1))
+        sqlite_store.save_session(2, create_wheel_session(1, 10).to_dict())
+        self.assertIsNotNone(sqlite_store.load_session(2))
+
+
+class TestRoundTrip(SQLiteStoreTestCase):
+    """Test lưu/tải dữ liệu qua các hàm module"""
+
+    def test_session_round_trip(self):
+        """Test save/load/delete session"""
+        session = create_wheel_session(1, 10)
+        session.game_name = "Ván 1"
+        session.add_participant(1, "A")
+        session.tickets = {"cam1": 1}
+        session.user_tickets = {1: "cam1"}
+        session.waiting_numbers = {7: [(1, "A")]}
+        session.winners = [{"user_id": 1, "name": "A", "numbers": [1, 2, 3, 4, 5], "time": "2026-01-01T10:00:00"}]
+        for _ in range(3):
+            spin_wheel(session)
+
+        sqlite_store.save_session(10, session.to_dict())
+        loaded = WheelSession.from_dict(sqlite_store.load_session(10))
+
+        self.assertEqual(loaded.game_name, "Ván 1")
+        self.assertEqual(loaded.participants, [{"user_id": 1, "name": "A"}])
+        self.assertEqual(loaded.user_tickets, {1: "cam1"})
+        self.assertEqual(loaded.waiting_numbers, {7: [(1, "A")]})
+        self.assertEqual(loaded.winners, session.winners)
+        self.assertEqual(loaded.history, session.history)
+        self.assertEqual(loaded.available_numbers, session.available_numbers)
+
+        sqlite_store.delete_session_row(10)
+        self.assertIsNone(sqlite_store.load_session(10))
+
+    def test_stats_round_trip(self):
+        """Test save/load stats"""
+        chat_stats = {
+            "wins": {1: {"count": 20.0, "name": "A"}},
+            "participations": {1: {"count": 1.0, "name": "A"}},
+        }
+        sqlite_store.save_stats(10, chat_stats)
+        self.assertEqual(sqlite_store.load_stats(10), chat_stats)
+
+    def test_apply_stat_deltas_upserts(self):
+        """Test cộng dồn delta bằng upsert, giữ nguyên user khác"""
+        sqlite_store.save_stats(10, {
+            "wins": {1: {"count": 5.0, "name": "A"}, 2: {"count": -5.0, "name": "B"}},
+            "participations": {},
+        })
+        sqlite_store.apply_stat_deltas(
+            10,
+            {"wins": {1: 10.0, 3: -5.0}, "participations": {1: 1.0, 3: 1.0}},
+            {1: "A mới", 3: "C"},
+        )
+        sqlite_store.apply_token_deltas(10, {2: 2.5})
+
+        loaded = sqlite_store.load_stats(10)
+        self.assertEqual(loaded["wins"][1], {"count": 15.0, "name": "A mới"})
+        self.assertEqual(loaded["wins"][2], {"count": -2.5, "name": "B"})
+        self.assertEqual(loaded["wins"][3], {"count": -5.0, "name": "C"})
+        self.assertEqual(loaded["participations"][3]["count"], 1.0)
+
+    def test_reset_and_delete_user_stats(self):
+        """Test reset theo loại và xoá một user"""
+        sqlite_store.apply_stat_deltas(10, {"wins": {1: 1.0, 2: 2.0}, "participations": {1: 1.0}})
+        sqlite_store.delete_user_stats(10, 2, "wins")
+        self.assertNotIn(2, sqlite_store.load_stats(10)["wins"])
+        sqlite_store.reset_stats(10, "wins")
+        loaded = sqlite_store.load_stats(10)
+        self.assertEqual(loaded["wins"], {})
+        self.assertEqual(loaded["participations"][1]["count"], 1.0)
+
+    def test_round_games_round_trip(self):
+        """Test lịch sử game được lưu và tải theo vòng, đúng thứ tự"""
+        for i in range(3):
+            sqlite_store.save_game_record(10, "r1", {
+                "game_name": f"G{i}",
+                "host_name": "Host",
+                "participants": [{"user_id": 1, "name": "A"}],
+                "winners": [{"user_id": 1, "name": "A"}] if i == 1 else [],
+                "numbers_drawn": 10 + i,
+                "ended_at": "2024-01-01T10:00:00",
+            })
+        sqlite_store.save_game_record(10, "r2", {"game_name": "khác"})
+
+        games = sqlite_store.load_round_games(10, "r1")
+        self.assertEqual([g["game_name"] for g in games], ["G0", "G1", "G2"])
+        self.assertEqual(games[1]["winners"], [{"user_id": 1, "name": "A"}])
+        self.assertEqual(games[2]["numbers_drawn"], 12)
+        self.assertEqual(sqlite_store.load_round_games(10, "r3"), [])
+
+    def test_round_ledger_accumulates_with_games(self):
+        """Test sổ token của vòng được cộng dồn cùng lúc với việc lưu game"""
+        game = {"game_name": "G", "participants": [], "winners": []}
+        sqlite_store.save_game_record(10, "r1", game, {1: {"name": "A", "token": 5.0}, 2: {"name": "B", "token": -5.0}})
+        sqlite_store.save_game_record(10, "r1", game, {1: {"name": "A2", "token": -5.0}, 2: {"name": "B", "token": 5.0}})
+        sqlite_store.apply_round_ledger_deltas(10, "r2", {1: {"name": "A", "token": 1.0}})
+
+        ledger = sqlite_store.load_round_ledger(10, "r1")
+        self.assertEqual(ledger, {1: {"name": "A2", "token": 0.0}, 2: {"name": "B", "token": 0.0}})
+        self.assertEqual(len(sqlite_store.load_round_games(10, "r1")), 2)
+        self.assertEqual(sqlite_store.load_round_ledger(10, "r2")[1]["token"], 1.0)
+
+
+class TestNormalizedSessions(SQLiteStoreTestCase):
+    """Test lưu session chuẩn hoá (spins append-only)"""
+
+    def test_incremental_write_only_appends_spin(self):
+        """Test ghi tăng dần: một lượt quay chỉ thêm một dòng spins"""
+        session = create_wheel_session(1, 90)
+        session.add_participant(1, "A")
+        write, state = sqlite_store.build_session_write(session.to_dict())
+        sqlite_store.save_sessions_batch([(5, write)])
+
+        spin_wheel(session)
+        write, state = sqlite_store.build_session_write(session.to_dict(), state)
+        self.assertEqual(len(write["spins"]), 1)
+        self.assertNotIn("participants", write)
+        sqlite_store.save_sessions_batch([(5, write)])
+
+        spins = sqlite_store.load_spins(5, session.id)
+        self.assertEqual([s["number"] for s in spins], [session.last_spin])
+        self.assertEqual(sqlite_store.count_spins(5, session.id), 1)
+
+    def test_write_from_spin_history(self):
+        """Test đường ghi lấy lượt mới từ ring buffer cho kết quả như đường dict"""
+        session = create_wheel_session(1, 90)
+        session.spin_history = SpinHistory(capacity=8)
+        for _ in range(12):  # ring buffer đã quay vòng
+            spin_wheel(session)
+        self.assertNotIn("history", session.to_dict(include_history=False))
+
+        expected, expected_state = sqlite_store.build_session_write(session.to_dict())
+        write, state = session_write(session)
+        self.assertEqual((write, state), (expected, expected_state))
+        self.assertEqual([s[0] for s in write["spins"]], list(range(5, 13)))
+
+        spin_wheel(session)
+        write, _ = session_write(session, state)
+        self.assertEqual(write["spins"], sqlite_store.build_session_write(session.to_dict(), state)[0]["spins"])
+        self.assertEqual([s[:2] for s in write["spins"]], [(13, session.last_spin)])
+
+    def test_spins_kept_after_delete(self):
+        """Test xoá session vẫn giữ lịch sử lượt quay, đọc được theo limit"""
+        session = create_wheel_session(1, 10)
+        for _ in range(5):
+            spin_wheel(session)
+        sqlite_store.save_session(3, session.to_dict())
+        sqlite_store.delete_session_row(3)
+
+        recent = sqlite_store.load_spins(3, session.id, limit=2)
+        self.assertEqual([s["number"] for s in recent], [h["number"] for h in session.history[-2:]])
+
+    def test_legacy_json_row_migrated(self):
+        """Test session JSON cũ được chuyển sang bảng chuẩn hoá khi tải"""
+        session = create_wheel_session(1, 10)
+        session.add_participant(2, "B")
+        spin_wheel(session)
+        legacy = session.to_dict()
+        del legacy["spin_seq"]
+        legacy["user_tickets"] = {"2": "do1"}
+        legacy["tickets"] = {"do1": 2}
+
+        with self.manager.transaction() as cur:
+            cur.execute(
+                "INSERT INTO sessions(chat_id, session_json, updated_at) VALUES (?, ?, ?)",
+                (7, json.dumps(legacy), "2026-01-01T00:00:00"),
+            )
+
+        loaded = sqlite_store.load_session(7)
+        self.assertEqual(loaded["user_tickets"], {2: "do1"})
+        self.assertEqual(loaded["history"], session.history)
+        self.assertEqual(sqlite_store.count_spins(7, session.id), 1)
+
+        row = self.manager.cursor().execute("SELECT session_json FROM sessions WHERE chat_id = 7").fetchone()
+        meta = sqlite_store.decode_meta(row[0])
+        self.assertEqual(meta["storage_version"], sqlite_store.SESSION_STORAGE_VERSION)
+        self.assertEqual(meta["history"], [])
+
+    def test_load_all_skips_corrupt_row(self):
+        """Test warm start bỏ qua dòng hỏng, không mở transaction ghi"""
+        session = create_wheel_session(1, 10)
+        spin_wheel(session)
+        sqlite_store.save_session(1, session.to_dict())
+        with self.manager.transaction() as cur:
+            cur.execute(
+                "INSERT INTO sessions(chat_id, session_json, updated_at) VALUES (?, ?, ?)",
+                (2, b"\xff\x00hong", "2026-01-01T00:00:00"),
+            )
+
+        commits = self.manager.commits
+        with self.assertLogs("src.db.sqlite_store", level="WARNING"):
+            loaded = sqlite_store.load_all_sessions()
+        self.assertEqual(set(loaded), {1})
+        self.assertEqual(loaded[1]["history"], session.history)
+        self.assertEqual(self.manager.commits, commits)
+
+
+if __name__ == '__main__':
+    unittest.main()
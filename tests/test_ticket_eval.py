@@ -0,0 +1,56 @@
+"""
+Unit tests cho bộ đánh giá vé hàng loạt
+"""
+import random
+import unittest
+
+from src.bot.wheel import create_wheel_session, spin_wheel
+from src.models.ticket_eval import evaluate_layouts, evaluate_session, has_numpy, is_winning_claim
+from src.models.ticket_layouts import TICKET_ROWS
+
+
+class TestTicketEval(unittest.TestCase):
+    """Test kết quả khớp với luật /kinh và giữa hai cách tính"""
+
+    def setUp(self):
+        random.seed(7)
+        self.session = create_wheel_session(1, 90)
+        self.session.user_tickets = {user_id: code for user_id, code in enumerate(TICKET_ROWS)}
+        for _ in range(45):
+            spin_wheel(self.session)
+
+    def test_agrees_with_check_rule(self):
+        """Test hàng đủ đúng bằng các hàng mà /kinh chấp nhận"""
+        results = evaluate_session(self.session, use_numpy=False)
+        self.assertEqual(len(results), len(TICKET_ROWS))
+        for result in results:
+            rows = TICKET_ROWS[result.code]
+            expected = tuple(
+                i for i, row in enumerate(rows)
+                if is_winning_claim(*self.session.match(list(row)), [])
+            )
+            self.assertEqual(result.complete_rows, expected)
+            drawn, not_drawn = self.session.match([n for row in rows for n in row])
+            self.assertEqual((result.matched, result.missing), (len(drawn), len(not_drawn)))
+
+    def test_empty_and_unknown_tickets(self):
+        """Test vé không có bố cục bị bỏ qua, chưa quay thì không có hàng đủ"""
+        session = create_wheel_session(1, 90)
+        session.user_tickets = {1: "cam1", 2: "tu_chon"}
+        results = evaluate_session(session, use_numpy=False)
+        self.assertEqual([(r.user_id, r.matched, r.missing, r.is_winner) for r in results], [(1, 0, 45, False)])
+
+    @unittest.skipUnless(has_numpy(), "cần NumPy")
+    def test_numpy_matches_python(self):
+        """Test bản NumPy cho cùng kết quả với bản Python thuần"""
+        self.assertEqual(
+            evaluate_session(self.session, use_numpy=True),
+            evaluate_session(self.session, use_numpy=False),
+        )
+        layouts = [TICKET_ROWS["vang1"], TICKET_ROWS["vang2"]]
+        drawn = self.session.drawn_sorted()
+        self.assertEqual(evaluate_layouts(layouts, drawn, True), evaluate_layouts(layouts, drawn, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
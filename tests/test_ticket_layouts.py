@@ -0,0 +1,65 @@
+"""
+Unit tests cho bố cục vé in sẵn và bộ đếm hàng
+"""
+import unittest
+
+from src.bot.constants import TICKET_CODES
+from src.bot.wheel import create_wheel_session, reset_session
+from src.models.ticket_layouts import NUMBER_INDEX, ROW_SIZE, TICKET_ROWS, RowTracker, ticket_row
+from src.models.wheel_session import WheelSession
+
+
+class TestTicketLayouts(unittest.TestCase):
+    """Test dữ liệu bố cục vé và phát hiện hàng đủ số"""
+
+    def test_layouts_cover_every_ticket(self):
+        """Test mỗi mã vé có 9 hàng x 5 số, hai vé cùng màu phủ đúng 1-90"""
+        self.assertEqual(set(TICKET_ROWS), set(TICKET_CODES))
+        for code, rows in TICKET_ROWS.items():
+            self.assertEqual(len(rows), 9, code)
+            for row in rows:
+                self.assertEqual(len(row), ROW_SIZE, code)
+                self.assertEqual(list(row), sorted(row), code)
+        for code in TICKET_CODES[::2]:
+            pair = code[:-1] + "2"
+            numbers = [n for rows in (TICKET_ROWS[code], TICKET_ROWS[pair]) for row in rows for n in row]
+            self.assertEqual(sorted(numbers), list(range(1, 91)), code)
+        self.assertEqual(set(NUMBER_INDEX), set(range(1, 91)))
+
+    def test_tracker_reports_row_on_last_number(self):
+        """Test hàng chỉ được báo đủ đúng lúc số cuối cùng của hàng ra"""
+        tracker = RowTracker()
+        row = ticket_row("cam1", 4)
+        for number in row[:-1]:
+            self.assertNotIn(("cam1", 4), tracker.hit(number))
+        self.assertIsNone(tracker.first_complete_row("cam1"))
+        self.assertIn(("cam1", 4), tracker.hit(row[-1]))
+        self.assertEqual(tracker.first_complete_row("cam1"), 4)
+        self.assertIn(("cam1", 4), tracker.completed_by(row[0]))
+        self.assertEqual(RowTracker(row).hits("cam1", 4), ROW_SIZE)
+
+    def test_session_rows_for_held_tickets(self):
+        """Test session chỉ báo vé có người giữ, dựng lại khi tải và xoá khi reset"""
+        session = create_wheel_session(1, 90)
+        session.tickets = {"do2": 7}
+        row = ticket_row("do2", 0)
+        for number in row[:-1]:
+            session.pool.remove(number)
+            session.mark_drawn(number)
+        self.assertEqual(session.completed_ticket_rows(list(row[:-1])), [])
+
+        session.pool.remove(row[-1])
+        session.mark_drawn(row[-1])
+        session.mark_drawn(row[-1])  # Quay trùng số không đếm lại
+        self.assertEqual(session.completed_ticket_rows([row[-1]]), [("do2", 0)])
+        self.assertEqual(session.row_tracker.hits("do2", 0), ROW_SIZE)
+
+        loaded = WheelSession.from_dict(session.to_dict())
+        self.assertEqual(loaded.row_tracker.first_complete_row("do2"), 0)
+
+        reset_session(session)
+        self.assertIsNone(session.row_tracker.first_complete_row("do2"))
+
+
+if __name__ == '__main__':
+    unittest.main()
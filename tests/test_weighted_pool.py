@@ -0,0 +1,111 @@
+"""
+Unit tests cho vòng quay giải thưởng có trọng số (bảng alias)
+"""
+import random
+import unittest
+from collections import Counter
+
+from src.bot.wheel import create_weighted_session, reset_session, spin_wheel
+from src.models.weighted_pool import AliasTable, WeightedDrawPool
+from src.models.wheel_session import WheelSession
+from src.utils.validators import parse_segments
+
+# Giá trị tới hạn chi-square với mức ý nghĩa 0.001 theo bậc tự do
+CHI2_CRITICAL_001 = {2: 13.816, 3: 16.266, 4: 18.467}
+
+
+def chi_square(counts: Counter, weights: list[float], samples: int) -> float:
+    total = sum(weights)
+    return sum(
+        (counts[i] - samples * w / total) ** 2 / (samples * w / total)
+        for i, w in enumerate(weights)
+    )
+
+
+class TestAliasTable(unittest.TestCase):
+    """Test phân phối của bảng alias"""
+
+    def test_matches_weights(self):
+        """Test tần suất rút khớp trọng số (chi-square, seed cố định)"""
+        weights = [1.0, 30.0, 5.0, 0.5, 13.5]
+        rng = random.Random(2026)
+        table = AliasTable(weights)
+        samples = 200_000
+        counts = Counter(table.sample(rng) for _ in range(samples))
+        self.assertLess(chi_square(counts, weights, samples), CHI2_CRITICAL_001[len(weights) - 1])
+
+    def test_rejects_bad_weights(self):
+        """Test không dựng được bảng rỗng hoặc tổng trọng số không dương"""
+        with self.assertRaises(ValueError):
+            AliasTable([])
+        with self.assertRaises(ValueError):
+            WeightedDrawPool(1, 2, [1.0, 0.0])
+        with self.assertRaises(ValueError):
+            WeightedDrawPool(1, 3, [1.0, 2.0])
+
+
+class TestWeightedDrawPool(unittest.TestCase):
+    """Test rút không hoàn lại và dựng lại bảng lười"""
+
+    def test_draw_without_replacement(self):
+        """Test rút hết không trùng, remove/load/reset giống DrawPool"""
+        pool = WeightedDrawPool(1, 50, [float(i) for i in range(1, 51)])
+        drawn = [pool.draw() for _ in range(50)]
+        self.assertEqual(sorted(drawn), list(range(1, 51)))
+        with self.assertRaises(IndexError):
+            pool.draw()
+
+        pool.reset()
+        self.assertTrue(pool.remove(7))
+        self.assertFalse(pool.remove(7))
+        self.assertEqual(pool.removed(), [7])
+        pool.load([3, 3, 9, 99])
+        self.assertEqual(pool.to_list(), [3, 9])
+        self.assertIn(pool.choice(), (3, 9))
+
+    def test_remaining_weights_after_removal(self):
+        """Test sau khi loại ô nặng nhất, các ô còn lại vẫn đúng tỉ lệ trọng số"""
+        random.seed(7)
+        weights = [100.0, 1.0, 2.0, 3.0]
+        pool = WeightedDrawPool(1, 4, weights)
+        pool.choice()  # dựng bảng với cả ô nặng
+        pool.remove(1)
+        samples = 60_000
+        counts = Counter(pool.choice() - 2 for _ in range(samples))
+        self.assertLess(chi_square(counts, weights[1:], samples), CHI2_CRITICAL_001[2])
+
+
+class TestWeightedSession(unittest.TestCase):
+    """Test session vòng quay giải thưởng"""
+
+    def test_spin_and_round_trip(self):
+        """Test spin_wheel rút theo ô, nhãn và trọng số được lưu/tải"""
+        ok, segments, _ = parse_segments("Jackpot:1, Voucher 50k:5, Chúc may mắn:30")
+        self.assertTrue(ok)
+        session = create_weighted_session(segments)
+        self.assertEqual(session.get_total_numbers(), 3)
+        number = spin_wheel(session)
+        self.assertIn(session.segment_label(number), ("Jackpot", "Voucher 50k", "Chúc may mắn"))
+
+        restored = WheelSession.from_bytes(session.to_bytes())
+        self.assertEqual(restored.segments, session.segments)
+        self.assertEqual(restored.available_numbers, session.available_numbers)
+        self.assertEqual(restored.pool.weights, (1.0, 5.0, 30.0))
+
+        reset_session(restored)
+        self.assertEqual(restored.get_remaining_count(), 3)
+        with self.assertRaises(ValueError):
+            restored.enable_shuffled_draw()
+        with self.assertRaises(ValueError):
+            create_weighted_session([])
+
+    def test_parse_segments(self):
+        """Test cú pháp nhãn:trọng_số, trọng số mặc định 1"""
+        self.assertEqual(parse_segments("A, B:2.5")[1], [("A", 1.0), ("B", 2.5)])
+        self.assertFalse(parse_segments("A:0")[0])
+        self.assertFalse(parse_segments("A:x")[0])
+        self.assertFalse(parse_segments(" , ")[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
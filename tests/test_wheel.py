@@ -1,14 +1,20 @@
 """
 Unit tests cho core wheel logic
 """
+import hashlib
 import unittest
+from src.models.draw_pool import DrawPool, SparseDrawPool, new_seed, seed_commitment, shuffled_order
+from src.models.session_codec import decode_session, encode_session
+from src.models.spin_history import SpinHistory, SpinRecord
 from src.models.wheel_session import WheelSession
 from src.bot.wheel import (
     create_wheel_session,
     spin_wheel,
+    spin_wheel_many,
     reset_session,
     set_remove_mode,
-    get_session_status
+    get_session_status,
+    clear_session,
 )
 
 
@@ -82,6 +88,22 @@ class TestSpinWheel(unittest.TestCase):
         with self.assertRaises(ValueError):
             spin_wheel(session)
 
+    def test_spin_wheel_many(self):
+        """Test quay nhiều số một lần, dừng khi hết số"""
+        session = create_wheel_session(1, 10, remove_after_spin=True)
+        numbers = spin_wheel_many(session, 4)
+        self.assertEqual(len(set(numbers)), 4)
+        self.assertEqual(session.spin_count, 4)
+        self.assertEqual(session.spin_history.numbers(), numbers)
+        self.assertEqual(session.last_spin, numbers[-1])
+
+        self.assertEqual(len(spin_wheel_many(session, 20)), 6)
+        self.assertTrue(session.is_empty())
+        with self.assertRaises(ValueError):
+            spin_wheel_many(session, 1)
+        with self.assertRaises(ValueError):
+            spin_wheel_many(create_wheel_session(1, 10), 0)
+
 
 class TestResetSession(unittest.TestCase):
     """Test reset session functionality"""
@@ -138,5 +160,203 @@ class TestGetSessionStatus(unittest.TestCase):
         self.assertFalse(status['is_empty'])
 
 
+
+class TestDrawPool(unittest.TestCase):
+    """Test pool số còn lại (swap-remove)"""
+
+    def test_draw_remove_and_reset(self):
+        """Test rút hết không trùng, kiểm tra còn/không và reset"""
+        pool = DrawPool(1, 10, available=[9, 2, 5, 5, 42])
+        self.assertEqual(pool.to_list(), [2, 5, 9])
+        self.assertIn(5, pool)
+        self.assertNotIn(3, pool)
+        self.assertTrue(pool.remove(5))
+        self.assertFalse(pool.remove(5))
+
+        pool.reset()
+        drawn = [pool.draw() for _ in range(10)]
+        self.assertEqual(sorted(drawn), list(range(1, 11)))
+        self.assertEqual(len(pool), 0)
+        with self.assertRaises(IndexError):
+            pool.draw()
+
+    def test_session_view_round_trip(self):
+        """Test available_numbers của session vẫn là list và lưu/tải được"""
+        session = create_wheel_session(1, 20)
+        for _ in range(5):
+            spin_wheel(session)
+        restored = WheelSession.from_dict(session.to_dict())
+        self.assertEqual(restored.available_numbers, session.available_numbers)
+        self.assertTrue(all(not restored.is_available(n) for n in session.removed_numbers))
+        self.assertEqual(restored.get_remaining_count(), 15)
+
+
+    def test_shuffled_draw_replayable(self):
+        """Test chế độ xáo trước: rút đúng thứ tự của seed, lưu/tải bằng seed + cursor"""
+        session = create_wheel_session(1, 90)
+        session.enable_shuffled_draw(seed=42)
+        drawn = [spin_wheel(session) for _ in range(10)]
+        self.assertEqual(drawn, shuffled_order(1, 90, 42)[:10])
+
+        data = session.to_dict()
+        self.assertEqual((data["draw_seed"], data["draw_cursor"]), (42, 10))
+        self.assertNotIn("available_numbers", data)
+        restored = WheelSession.from_dict(data)
+        self.assertEqual(restored.removed_numbers, drawn)
+        self.assertEqual(restored.drawn_sorted(), sorted(drawn))
+        self.assertEqual(spin_wheel(restored), shuffled_order(1, 90, 42)[10])
+
+        reset_session(session)
+        self.assertEqual(session.get_remaining_count(), 90)
+        self.assertIsNotNone(session.draw_seed)
+        with self.assertRaises(ValueError):
+            create_wheel_session(1, 10, remove_after_spin=False).enable_shuffled_draw()
+
+    def test_shuffled_seed_commitment(self):
+        """Test seed mặc định đủ lớn, mã cam kết khớp seed, seed lớn qua được codec"""
+        session = create_wheel_session(1, 90)
+        seed = session.enable_shuffled_draw()
+        self.assertGreater(seed.bit_length(), 64)
+        self.assertGreater(new_seed().bit_length(), 64)
+        self.assertEqual(seed_commitment(seed), hashlib.sha256(str(seed).encode("ascii")).hexdigest())
+
+        drawn = [spin_wheel(session) for _ in range(5)]
+        restored = WheelSession.from_dict(decode_session(encode_session(session.to_dict())))
+        self.assertEqual(restored.draw_seed, seed)
+        self.assertEqual(restored.removed_numbers, drawn)
+        self.assertEqual(spin_wheel(restored), shuffled_order(1, 90, seed)[5])
+
+    def test_shuffled_clear_round_trip(self):
+        """Test xoá sạch session đang xáo trước: bản lưu/tải khớp bản trong RAM"""
+        session = create_wheel_session(1, 10)
+        session.enable_shuffled_draw(seed=7)
+        spin_wheel(session)
+        clear_session(session)
+
+        restored = WheelSession.from_dict(session.to_dict())
+        self.assertIsNone(restored.draw_seed)
+        self.assertEqual(restored.removed_numbers, session.removed_numbers)
+        self.assertEqual(restored.available_numbers, [])
+
+
+class TestSparseDrawPool(unittest.TestCase):
+    """Test pool thưa cho khoảng lớn (chế độ xổ số)"""
+
+    def test_same_behaviour_as_dense(self):
+        """Test rút hết không trùng, remove/load/reset giống DrawPool"""
+        pool = SparseDrawPool(1, 10, available=[9, 2, 5, 5, 42])
+        self.assertEqual(pool.to_list(), [2, 5, 9])
+        self.assertTrue(pool.remove(5))
+        self.assertFalse(pool.remove(5))
+        self.assertNotIn(5, pool)
+
+        pool.reset()
+        drawn = [pool.draw() for _ in range(10)]
+        self.assertEqual(sorted(drawn), list(range(1, 11)))
+        with self.assertRaises(IndexError):
+            pool.draw()
+        with self.assertRaises(ValueError):
+            pool.shuffle(42)
+
+    def test_memory_follows_draws(self):
+        """Test khoảng 10^7 số: bộ nhớ theo số lượt rút, reset xoá sạch"""
+        pool = SparseDrawPool(1, 10_000_000)
+        drawn = [pool.draw() for _ in range(1000)]
+        self.assertEqual(len(set(drawn)), 1000)
+        self.assertEqual(len(pool), 10_000_000 - 1000)
+        self.assertLessEqual(len(pool._items), 2000)
+        self.assertEqual(sorted(pool.removed()), sorted(drawn))
+        self.assertTrue(all(n not in pool for n in drawn))
+
+        restored = SparseDrawPool(1, 10_000_000)
+        restored.load_removed(drawn)
+        self.assertEqual(len(restored), len(pool))
+        self.assertTrue(all(n not in restored for n in drawn))
+
+        pool.reset()
+        self.assertEqual((len(pool), len(pool._items)), (10_000_000, 0))
+
+    def test_raffle_session_round_trip(self):
+        """Test session khoảng lớn: lưu/tải theo số lượt rút, không theo khoảng"""
+        session = create_wheel_session(1, 1_000_000)
+        self.assertTrue(session.is_sparse)
+        self.assertFalse(create_wheel_session(1, 90).is_sparse)
+        drawn = [spin_wheel(session) for _ in range(50)]
+
+        data = session.to_dict()
+        self.assertNotIn("available_numbers", data)
+        raw = session.to_bytes()
+        self.assertLess(len(raw), 1000)
+        restored = WheelSession.from_bytes(raw)
+        self.assertEqual(restored.get_remaining_count(), 1_000_000 - 50)
+        self.assertEqual(restored.drawn_sorted(), sorted(drawn))
+        self.assertTrue(all(not restored.is_available(n) for n in drawn))
+
+        clear_session(session)
+        cleared = WheelSession.from_dict(session.to_dict())
+        self.assertTrue(cleared.is_empty())
+        with self.assertRaises(ValueError):
+            create_wheel_session(0, 10_000_000)
+
+
+class TestDrawnIndex(unittest.TestCase):
+    """Test chỉ mục số đã quay của session"""
+
+    def test_index_follows_spin_and_reset(self):
+        """Test spin cập nhật chỉ mục, reset xoá chỉ mục nhưng giữ lịch sử"""
+        session = create_wheel_session(1, 90)
+        drawn = [spin_wheel(session) for _ in range(10)]
+
+        self.assertEqual(session.drawn_sorted(), sorted(drawn))
+        self.assertTrue(all(session.is_drawn(n) for n in drawn))
+        self.assertFalse(session.is_drawn(91))
+        missing = next(n for n in range(1, 91) if n not in drawn)
+        self.assertEqual(session.match([drawn[0], missing, 0]), ([drawn[0]], [missing, 0]))
+
+        reset_session(session)
+        self.assertEqual(session.drawn_sorted(), [])
+        self.assertEqual(len(session.history), 10)
+
+    def test_index_persisted_and_rebuilt(self):
+        """Test chỉ mục được lưu cùng session; dữ liệu cũ thì dựng lại từ lịch sử"""
+        session = create_wheel_session(1, 20, remove_after_spin=False)
+        for _ in range(5):
+            spin_wheel(session)
+        data = session.to_dict()
+        self.assertEqual(WheelSession.from_dict(data).drawn_sorted(), session.drawn_sorted())
+
+        del data["drawn_numbers"]
+        expected = sorted({item["number"] for item in session.history})
+        self.assertEqual(WheelSession.from_dict(data).drawn_sorted(), expected)
+
+
+
+class TestSpinHistory(unittest.TestCase):
+    """Test lịch sử quay dạng ring buffer"""
+
+    def test_ring_buffer_evicts_oldest(self):
+        """Test khi đầy thì bỏ lượt cũ nhất, thứ tự vẫn đúng"""
+        history = SpinHistory(capacity=4)
+        for n in range(1, 7):
+            history.append(n, 1_700_000_000 + n)
+
+        self.assertEqual(len(history), 4)
+        self.assertEqual(history.numbers(), [3, 4, 5, 6])
+        self.assertEqual(history.recent_numbers(2), [5, 6])
+        self.assertEqual(history.recent(1), [SpinRecord(6, 1_700_000_006)])
+        self.assertEqual(history.last.number, 6)
+
+    def test_dict_view_round_trip(self):
+        """Test dạng dict cũ nạp lại được, lượt không có thời gian vẫn giữ"""
+        session = create_wheel_session(1, 90)
+        for _ in range(3):
+            spin_wheel(session)
+        items = session.history + [{"number": 7, "time": ""}]
+
+        restored = SpinHistory()
+        restored.load(items)
+        self.assertEqual(restored.to_dicts(), items)
+
+
 if __name__ == '__main__':
     unittest.main()